@@ -0,0 +1,134 @@
+""" Benchmark for trout_pattern_match._clean_data. Compares the alias table engine, which cleans each distinct name
+once, with the chain of replaces it replaced. Both run on synthetic location columns where a few hundred waters are
+spelled many different ways across a lot of rows.
+
+Run from the root of the repository:
+
+    python benchmarks/bench_clean_locations.py
+"""
+
+import os
+import sys
+import time
+import random
+import logging
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.snowflake_ import trout_pattern_match
+
+logging.disable(logging.CRITICAL)
+
+WATERS = [
+    "Eleven Mile Reservoir",
+    "11 Mile",
+    "11-mile res.",
+    "Cheeseman Reservoir",
+    "Chessman Canyon",
+    "Cheesman Canyon (Deckers)",
+    "Dream Stream",
+    "North Fork of South Platte River",
+    "Spinney",
+    "Spinney Reservoir",
+    "Spinney Mountain Res",
+    "Boyd Lake",
+    "Lon Hagler",
+    "Arthur Lake #2",
+    "Blue River",
+    "Lake John",
+    "Delaney Butte Ponds",
+    "Spinney.",
+    " spinney",
+    "Spinney Res!",
+    "11 Lakemile",
+    "Deckers (Cheesman Canyon)",
+]
+
+
+def synthetic_locations(row_count: int, distinct_count: int = 300, seed: int = 7):
+    generator = random.Random(seed)
+
+    names = WATERS + [
+        f"{generator.choice(['Upper', 'Lower', 'North'])} {generator.choice(WATERS)} {i}"
+        for i in range(distinct_count - len(WATERS))
+    ]
+
+    return pd.DataFrame({"location": [generator.choice(names) for _ in range(row_count)]})
+
+
+def legacy_clean_data(df: pd.DataFrame, cols: list) -> None:
+    """_clean_data before the alias table"""
+    for col in cols:
+        clean_col_name = col + "_clean"
+        df[clean_col_name] = df[col].str.lower()
+
+        df[clean_col_name] = df[clean_col_name].str.replace(
+            "(chessman|cheeseman)", "cheesman", regex=True
+        )
+
+        df[clean_col_name] = df[clean_col_name].str.replace(
+            "(lake|reservoir|pond|resevoir|reservior)", "", regex=True
+        )
+
+        df[clean_col_name] = df[clean_col_name].str.replace(
+            "(11 mile|11mile|11-mile)", "elevenmile", regex=True
+        )
+
+        df[clean_col_name] = df[clean_col_name].str.replace(
+            "(deckers|cheesman canyon|north fork south platte|dream stream)",
+            "south platte river",
+            regex=True,
+        )
+
+        df[clean_col_name] = df[clean_col_name].apply(
+            lambda x: "south platte river" if "south platte" in x.lower() else x
+        )
+
+        df[clean_col_name] = df[clean_col_name].replace(
+            ("spinney"), "spinney mountain", regex=False
+        )
+
+        df[clean_col_name] = df[clean_col_name].replace(
+            ("spinney "), "spinney mountain", regex=False
+        )
+
+        df[clean_col_name] = (
+            df[clean_col_name].str.replace("[^a0-zA9-Z ]", "", regex=True)
+        ).str.strip()
+
+
+def best_of(clean_function, df: pd.DataFrame, repeat: int = 3) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        clean_function(df, ["location"])
+        timings.append(time.perf_counter() - start)
+
+    return min(timings)
+
+
+def main(row_counts: tuple = (10_000, 100_000, 1_000_000)):
+    for row_count in row_counts:
+        df = synthetic_locations(row_count)
+
+        legacy_df = df.copy()
+        legacy_clean_data(legacy_df, ["location"])
+
+        trout_pattern_match._clean_data(df, ["location"])
+
+        assert (legacy_df.location_clean == df.location_clean.astype(object)).all()
+
+        legacy_seconds = best_of(legacy_clean_data, df)
+
+        alias_seconds = best_of(trout_pattern_match._clean_data, df)
+
+        print(
+            f"{row_count:>9} rows: replace chain {legacy_seconds:6.3f} s, "
+            f"alias table {alias_seconds:6.3f} s, {legacy_seconds / alias_seconds:5.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
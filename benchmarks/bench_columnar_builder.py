@@ -0,0 +1,108 @@
+""" Benchmark for turning parsed Fishing Atlas rows into a dataframe. Compares ColumnarRecordBuilder with the
+backfill and align_lists loop process_all_location_data used before. Both run on synthetic rows where some columns
+only show up now and then, the same way optional popup fields do.
+
+Run from the root of the repository:
+
+    python benchmarks/bench_columnar_builder.py
+"""
+
+import os
+import sys
+import time
+import random
+import logging
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.data_processing import clean_atlas_data
+
+logging.disable(logging.CRITICAL)
+
+REQUIRED_COLUMNS = [
+    "Fish Species ",
+    "Water",
+    "County",
+    "Ease of access",
+    "Elevation(ft)",
+    "Latitude",
+    "Longitude",
+]
+
+OPTIONAL_COLUMNS = ["Property name", "Boating", "Fishing pressure", "Stocked"]
+
+
+def synthetic_rows(row_count: int, seed: int = 7) -> list:
+    generator = random.Random(seed)
+
+    rows = []
+    for i in range(row_count):
+        row = {column: f" {column} {i}" for column in REQUIRED_COLUMNS}
+
+        for column in OPTIONAL_COLUMNS:
+            if generator.random() < 0.7:
+                row[column] = f" {column} {i}"
+
+        rows.append(row)
+
+    return rows
+
+
+def legacy_build(rows: list) -> dict:
+    """The loop in process_all_location_data before ColumnarRecordBuilder"""
+    clean_data = {}
+    for row in rows:
+        longest_value = 0
+        for k, v in row.items():
+            try:
+                clean_data[k].append(v)
+                longest_value = max(len(clean_data[k]), longest_value)
+            except KeyError:
+                clean_data[k] = ["NA"] * (longest_value - 1) + [v]
+
+        clean_data = clean_atlas_data.align_lists(clean_data)
+
+    return clean_data
+
+
+def builder_build(rows: list) -> dict:
+    builder = clean_atlas_data.ColumnarRecordBuilder()
+
+    for row in rows:
+        builder.add_row(row)
+
+    return builder.to_dict()
+
+
+def measure(build_function, rows: list) -> (float, float):
+    """Seconds and peak MiB allocated while building"""
+    tracemalloc.start()
+
+    start = time.perf_counter()
+    build_function(rows)
+    seconds = time.perf_counter() - start
+
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return seconds, peak / 1024 / 1024
+
+
+def main(row_counts: tuple = (10_000, 50_000, 100_000)):
+    for row_count in row_counts:
+        rows = synthetic_rows(row_count)
+
+        for name, build_function in (
+            ("align_lists", legacy_build),
+            ("columnar builder", builder_build),
+        ):
+            seconds, peak_mib = measure(build_function, rows)
+
+            print(
+                f"{row_count:>8} rows {name:>17}: {seconds:7.3f} s, peak {peak_mib:7.1f} MiB"
+            )
+
+
+if __name__ == "__main__":
+    main()
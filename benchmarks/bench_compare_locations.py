@@ -0,0 +1,110 @@
+""" Benchmark for scoring candidate links in trout_pattern_match. Compares the RapidFuzz engine, which scores each
+distinct pair of names once across every core, with the two recordlinkage string comparisons it replaced. Both score
+the links of a species block between synthetic awards and waters.
+
+Run from the root of the repository:
+
+    python benchmarks/bench_compare_locations.py
+"""
+
+import os
+import sys
+import time
+import random
+import logging
+
+import numpy as np
+import pandas as pd
+import recordlinkage
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.snowflake_ import trout_pattern_match
+
+logging.disable(logging.CRITICAL)
+
+SPECIES = ["Brook", "Brown", "Rainbow", "Cutthroat (Native)", "Lake", "Tiger"]
+
+
+def synthetic_frames(award_count: int, water_count: int, seed: int = 7):
+    generator = random.Random(seed)
+
+    waters = [
+        "".join(generator.choice("abcdefghijklmnopqrstuvwxyz ") for _ in range(12))
+        for _ in range(water_count // 4)
+    ]
+
+    master_angler_df = pd.DataFrame(
+        {
+            "location": [generator.choice(waters)[:10] for _ in range(award_count)],
+            "species_clean": [generator.choice(SPECIES) for _ in range(award_count)],
+        },
+        index=pd.Index(range(award_count), name="master_angler_award_id"),
+    )
+
+    species_df = pd.DataFrame(
+        {
+            "water": [generator.choice(waters) for _ in range(water_count)],
+            "main_species": [generator.choice(SPECIES) for _ in range(water_count)],
+        },
+        index=pd.Index(range(water_count), name="all_species_id"),
+    )
+
+    trout_pattern_match._clean_data(master_angler_df, ["location"])
+    trout_pattern_match._clean_data(species_df, ["water"])
+
+    indexer = recordlinkage.Index()
+    indexer.block("species_clean", "main_species")
+
+    return indexer.index(master_angler_df, species_df), master_angler_df, species_df
+
+
+def recordlinkage_compare(candidate_links, master_angler_df, species_df):
+    """The comparison _pattern_match_data ran before the RapidFuzz engine"""
+    compare = recordlinkage.Compare()
+
+    compare.string(
+        "location_clean", "water_clean", method="jarowinkler", label="jaro_comparison"
+    )
+    compare.string(
+        "location_clean",
+        "water_clean",
+        method="damerau_levenshtein",
+        label="levenshtein_comparison",
+    )
+
+    return compare.compute(candidate_links, master_angler_df, species_df)
+
+
+def timed(compare_function, *args):
+    start = time.perf_counter()
+    compare_vectors = compare_function(*args)
+
+    return compare_vectors, time.perf_counter() - start
+
+
+def main(sizes: tuple = ((500, 500), (2_000, 1_000), (5_000, 2_000))):
+    for award_count, water_count in sizes:
+        frames = synthetic_frames(award_count, water_count)
+
+        recordlinkage_vectors, recordlinkage_seconds = timed(
+            recordlinkage_compare, *frames
+        )
+
+        rapidfuzz_vectors, rapidfuzz_seconds = timed(
+            trout_pattern_match._compare_locations, *frames
+        )
+
+        assert np.allclose(
+            recordlinkage_vectors.to_numpy(),
+            rapidfuzz_vectors[recordlinkage_vectors.columns].to_numpy(),
+        )
+
+        print(
+            f"{len(frames[0]):>9} links: recordlinkage {recordlinkage_seconds:7.3f} s, "
+            f"rapidfuzz {rapidfuzz_seconds:7.3f} s, {recordlinkage_seconds / rapidfuzz_seconds:6.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+""" Benchmark for the load half of the ELT on the local DuckDB storage. Writes synthetic Fishing Atlas and Master Angler
+data through SnowflakeDfWriter, then runs the combine_trout_tables and match_fishing_data procedures against it and
+times each step. Nothing here talks to Snowflake so it can run in CI.
+
+Run from the root of the repository:
+
+    python benchmarks/bench_local_elt.py
+"""
+
+import os
+import sys
+import time
+import toml
+import random
+import logging
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.snowflake_ import combine_trout_data, snowflake_writer, trout_pattern_match
+from src.snowflake_.session_pool import SessionPool
+from src.snowflake_.storage import DuckDBStorage
+
+logging.disable(logging.CRITICAL)
+
+SETUP_FILE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "snowflake_setup.toml",
+)
+
+SPECIES = ["Brook", "Brown", "Rainbow", "Cutthroat (Native)", "Lake", "Tiger"]
+
+WATERS = [
+    "Arthur Lake",
+    "Boyd Lake",
+    "Eleven Mile Reservoir",
+    "Cheesman Reservoir",
+    "South Platte River",
+    "Spinney Mountain Reservoir",
+    "Blue River",
+    "Lake John",
+]
+
+
+def synthetic_atlas_tables(rows_per_species: int, seed: int = 7) -> dict:
+    generator = random.Random(seed)
+
+    tables = {}
+    for species in SPECIES:
+        waters = [
+            f"{generator.choice(WATERS)} {i % 500}" for i in range(rows_per_species)
+        ]
+
+        tables[f"STORAGE_DATABASE.CPW_DATA.Trout: {species}"] = pd.DataFrame(
+            {
+                "Fish Species ": [f"{species} Trout"] * rows_per_species,
+                "Water": waters,
+                "County": ["Park"] * rows_per_species,
+                "Property name": waters,
+                "Ease of access": ["Easy"] * rows_per_species,
+                "Boating": ["Yes"] * rows_per_species,
+                "Fishing pressure": ["High"] * rows_per_species,
+                "Stocked": ["No"] * rows_per_species,
+                "Elevation(ft)": [generator.randint(5000, 12000) for _ in waters],
+                "Latitude": [generator.uniform(37, 41) for _ in waters],
+                "Longitude": [generator.uniform(-109, -102) for _ in waters],
+            }
+        )
+
+    return tables
+
+
+def synthetic_awards(row_count: int, seed: int = 7) -> pd.DataFrame:
+    generator = random.Random(seed)
+
+    return pd.DataFrame(
+        {
+            "angler": [f"Angler {i}" for i in range(row_count)],
+            "species": [f"{generator.choice(SPECIES)} Trout" for _ in range(row_count)],
+            "length": [generator.randint(16, 40) for _ in range(row_count)],
+            "location": [
+                f"{generator.choice(WATERS)} {generator.randint(0, 499)}"
+                for _ in range(row_count)
+            ],
+            "date": pd.to_datetime(
+                [f"2023-{generator.randint(4, 9):02d}-01" for _ in range(row_count)]
+            ),
+            "released": [generator.choice(["Yes", "No"]) for _ in range(row_count)],
+        }
+    )
+
+
+def timed(step: str, function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    print(f"{step:>28}: {time.perf_counter() - start:7.3f} s")
+
+    return result
+
+
+def main(
+    rows_per_species: int = 1_000,
+    award_count: int = 2_000,
+    processes: int = os.cpu_count(),
+):
+    storage = DuckDBStorage()
+
+    writer = snowflake_writer.SnowflakeDfWriter(pool=SessionPool(storage.session))
+
+    setup_file = toml.load(SETUP_FILE)
+
+    with writer.pool.session() as session:
+        for table in setup_file["tables"]:
+            session.sql(table["ddl"]).collect()
+
+    print(
+        f"{len(SPECIES)} species x {rows_per_species} atlas rows, {award_count} awards"
+    )
+
+    timed(
+        "write_tables",
+        writer.write_tables,
+        synthetic_atlas_tables(rows_per_species),
+        True,
+        True,
+    )
+
+    # main.py loads the atlas tables through the stage, the upload errors are returned rather than raised
+    stage_results = timed(
+        "write_tables stage",
+        writer.write_tables,
+        synthetic_atlas_tables(rows_per_species),
+        True,
+        True,
+        snowflake_writer.DEFAULT_MAX_WORKERS,
+        setup_file["stage"]["fully_qualified_name"],
+    )
+
+    for result in stage_results.values():
+        if result["error"] is not None:
+            raise result["error"]
+
+    timed(
+        "write_upsert",
+        writer.write_upsert,
+        synthetic_awards(award_count),
+        "STORAGE_DATABASE.CPW_DATA.MASTER_ANGLER_AWARD",
+        ["angler", "species", "length", "location", "date"],
+    )
+
+    with writer.pool.session() as session:
+        timed("combine_trout_tables", combine_trout_data.combine_trout_tables, session)
+
+        timed("match_fishing_data", trout_pattern_match.match_fishing_data, session)
+
+        timed(
+            f"match_fishing_data {processes} procs",
+            trout_pattern_match.match_fishing_data,
+            session,
+            processes,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+""" Benchmark for process_master_angler_data. Compares the bulk tab seperated read with the row by row split it
+replaced on synthetic dumps covering several years of Master Angler awards, one page per year.
+
+Run from the root of the repository:
+
+    python benchmarks/bench_master_angler_parse.py
+"""
+
+import os
+import sys
+import time
+import random
+import logging
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.data_processing import clean_master_angler_data
+
+logging.disable(logging.CRITICAL)
+
+SPECIES = ["Catfish", "Walleye", "Trout: Brown", "Trout: Rainbow", "Bluegill", "Pike"]
+
+LOCATIONS = ["Lon Hagler", "Boyd Lake", "Chatfield", "Eleven Mile", "Wash Park"]
+
+MONTHS = ["April", "May", "June", "July", "August", "September"]
+
+
+def synthetic_pages(years: int, rows_per_year: int, seed: int = 7) -> list:
+    """One page per year, like MasterAnglerScraper returns. About 1 in 200 rows is cut short."""
+    generator = random.Random(seed)
+
+    pages = []
+    for year in range(2024 - years, 2024):
+        rows = []
+        for i in range(rows_per_year):
+            row = [
+                f"Angler {i}",
+                generator.choice(SPECIES),
+                str(generator.randint(10, 45)),
+                generator.choice(LOCATIONS),
+                f"{generator.choice(MONTHS)}\\{year}",
+                generator.choice(["Yes", "No"]),
+            ]
+
+            if generator.random() < 0.005:
+                row = row[: generator.randint(1, 5)]
+
+            rows.append("\t".join(row))
+
+        pages.append("\n".join(rows))
+
+    return pages
+
+
+def legacy_process_master_angler_data(raw_data: list) -> pd.DataFrame:
+    """process_master_angler_data before the bulk read"""
+    all_raw_data = []
+    for page_result in raw_data:
+        all_raw_data += page_result.split("\n")
+
+    parsed_data = {
+        "Angler": [],
+        "Species": [],
+        "Length": [],
+        "Location": [],
+        "Date": [],
+        "Released": [],
+    }
+    for row in all_raw_data:
+        split_row = row.split("\t")
+
+        if len(split_row) == 6:
+            parsed_data["Angler"].append(split_row[0])
+            parsed_data["Species"].append(split_row[1])
+            parsed_data["Length"].append(split_row[2])
+            parsed_data["Location"].append(split_row[3])
+            parsed_data["Date"].append(split_row[4])
+            parsed_data["Released"].append(split_row[5])
+
+    return pd.DataFrame(parsed_data)
+
+
+def best_of(function, raw_data: list, repeat: int = 5) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(raw_data)
+        timings.append(time.perf_counter() - start)
+
+    return min(timings)
+
+
+def main(dumps: tuple = ((5, 2_000), (10, 10_000), (20, 25_000))):
+    for years, rows_per_year in dumps:
+        raw_data = synthetic_pages(years, rows_per_year)
+
+        assert legacy_process_master_angler_data(raw_data).equals(
+            clean_master_angler_data.process_master_angler_data(raw_data)
+        )
+
+        legacy_seconds = best_of(legacy_process_master_angler_data, raw_data)
+
+        bulk_seconds = best_of(
+            clean_master_angler_data.process_master_angler_data, raw_data
+        )
+
+        print(
+            f"{years:>3} years x {rows_per_year:>6} rows: row by row {legacy_seconds:6.3f} s, "
+            f"bulk read {bulk_seconds:6.3f} s, {legacy_seconds / bulk_seconds:4.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
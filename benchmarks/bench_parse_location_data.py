@@ -0,0 +1,103 @@
+""" Microbenchmark for parsing Fishing Atlas popup text. Compares the single pass tokenizer in clean_atlas_data with
+the findall / replace / sub chain it replaced.
+
+Run from the root of the repository:
+
+    python benchmarks/bench_parse_location_data.py
+"""
+
+import os
+import re
+import sys
+import timeit
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.data_processing import clean_atlas_data
+
+logging.disable(logging.CRITICAL)
+
+DATA_DIRECTORY = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tests", "data"
+)
+
+
+def legacy_parse_location_data(information_substring: str, coordinates: str) -> list:
+    """parse_location_data before it was rewritten as a single pass"""
+    raw_species_data = re.findall(
+        "Fish species:.*Ease", information_substring, re.DOTALL
+    )[0]
+    raw_species_data = raw_species_data.replace("\nEase", "")
+    raw_species_data = raw_species_data.replace("\n", ",")
+    raw_species_data = re.sub("[a-zA-Z]+:", "", raw_species_data)
+    clean_species_data = raw_species_data.replace("Fish ,", "Fish Species :")
+    clean_fishing_data = [clean_species_data]
+
+    raw_fishing_information_no_species = re.sub(
+        "Fish species:.*Ease", "Ease", information_substring, flags=re.DOTALL
+    )
+    raw_fishing_information_no_species = raw_fishing_information_no_species.replace(
+        "Driving directions", ""
+    )
+    for raw_data_point in raw_fishing_information_no_species.split("\n"):
+        if raw_data_point and ":" in raw_data_point:
+            clean_fishing_data.append(raw_data_point)
+
+    latitude_pattern = re.compile(r"Latitude: (\d+\.\d+) ([NS])")
+    clean_fishing_data.append(latitude_pattern.search(coordinates).group(0))
+    longitude_pattern = re.compile(r"Longitude: (-?\d+\.\d+) ([EW])")
+    clean_fishing_data.append(longitude_pattern.search(coordinates).group(0))
+
+    return clean_fishing_data
+
+
+def legacy_parse_location_fields(information_substring: str, coordinates: str) -> dict:
+    """What process_all_location_data did with the list before the field dictionary came straight from the parser"""
+    row = {}
+    for data_point in legacy_parse_location_data(information_substring, coordinates):
+        k, v = data_point.split(":")
+        row[k] = v
+
+    return row
+
+
+def main(number: int = 20_000):
+    with open(os.path.join(DATA_DIRECTORY, "parse_location.txt"), "r") as file:
+        information_substring = file.read()
+
+    with open(os.path.join(DATA_DIRECTORY, "parse_coordinates.txt"), "r") as file:
+        coordinates = file.read()
+
+    assert legacy_parse_location_data(
+        information_substring, coordinates
+    ) == clean_atlas_data.parse_location_data(information_substring, coordinates)
+
+    candidates = {
+        "legacy list": legacy_parse_location_data,
+        "single pass list": clean_atlas_data.parse_location_data,
+        "legacy field dict": legacy_parse_location_fields,
+        "single pass field dict": clean_atlas_data.parse_location_fields,
+    }
+
+    results = {}
+    for name, parse_function in candidates.items():
+        seconds = min(
+            timeit.repeat(
+                lambda: parse_function(information_substring, coordinates),
+                number=number,
+                repeat=5,
+            )
+        )
+
+        results[name] = seconds / number * 1_000_000
+
+        print(f"{name:>24}: {results[name]:6.2f} us per record")
+
+    print(
+        f"field dict speedup: {results['legacy field dict'] / results['single pass field dict']:.2f}x"
+    )
+
+
+if __name__ == "__main__":
+    main()
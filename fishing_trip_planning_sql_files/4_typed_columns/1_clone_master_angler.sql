@@ -0,0 +1 @@
+create temp table STORAGE_DATABASE.CPW_DATA.MASTER_ANGLER_AWARD_TEMP clone STORAGE_DATABASE.CPW_DATA.MASTER_ANGLER_AWARD
\ No newline at end of file
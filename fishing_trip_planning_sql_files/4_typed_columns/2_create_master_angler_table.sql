@@ -0,0 +1,23 @@
+-- The existing ids are copied over, new awards have to be numbered after them
+EXECUTE IMMEDIATE $$
+DECLARE
+	next_id INTEGER;
+	create_table VARCHAR;
+BEGIN
+	SELECT COALESCE(MAX(master_angler_award_id) + 1, 0) INTO :next_id FROM STORAGE_DATABASE.CPW_DATA.MASTER_ANGLER_AWARD_TEMP;
+
+	create_table := 'create or replace table STORAGE_DATABASE.CPW_DATA.MASTER_ANGLER_AWARD (
+    master_angler_award_id NUMBER(38,0) autoincrement start ' || next_id || ' increment by 1,
+	"angler" VARCHAR(1000),
+	"species" VARCHAR(100),
+	"length" NUMBER(2, 0),
+	"location" VARCHAR(100),
+	"date" DATE,
+	"released" VARCHAR(3)
+)';
+
+	EXECUTE IMMEDIATE create_table;
+
+	RETURN 'MASTER_ANGLER_AWARD ids start at ' || next_id;
+END;
+$$
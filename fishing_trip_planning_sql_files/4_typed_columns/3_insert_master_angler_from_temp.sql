@@ -0,0 +1,18 @@
+INSERT INTO STORAGE_DATABASE.CPW_DATA.MASTER_ANGLER_AWARD (
+	master_angler_award_id,
+	"angler",
+	"species",
+	"length",
+	"location",
+	"date",
+	"released"
+)
+SELECT
+	master_angler_award_id,
+	"angler",
+	"species",
+	"length",
+	"location",
+	TRY_TO_DATE(REPLACE(TRIM("date"), '\\', '/'), 'MMMM/YYYY'),
+	"released"
+from STORAGE_DATABASE.CPW_DATA.MASTER_ANGLER_AWARD_TEMP
\ No newline at end of file
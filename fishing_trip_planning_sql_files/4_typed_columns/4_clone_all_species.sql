@@ -0,0 +1 @@
+create temp table STORAGE_DATABASE.CPW_DATA.ALL_SPECIES_TEMP clone STORAGE_DATABASE.CPW_DATA.ALL_SPECIES
\ No newline at end of file
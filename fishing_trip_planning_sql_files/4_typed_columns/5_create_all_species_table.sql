@@ -0,0 +1,29 @@
+-- The existing ids are copied over, new waters have to be numbered after them
+EXECUTE IMMEDIATE $$
+DECLARE
+	next_id INTEGER;
+	create_table VARCHAR;
+BEGIN
+	SELECT COALESCE(MAX("all_species_id") + 1, 0) INTO :next_id FROM STORAGE_DATABASE.CPW_DATA.ALL_SPECIES_TEMP;
+
+	create_table := 'create or replace table STORAGE_DATABASE.CPW_DATA.ALL_SPECIES (
+    "all_species_id" NUMBER(38,0) autoincrement start ' || next_id || ' increment by 1,
+	"main_species" varchar(100),
+	"fish_species" varchar(100),
+	"water" varchar(100),
+	"county" varchar(100),
+	"property_name" varchar(100),
+	"ease_of_access" varchar(100),
+	"boating" varchar(100),
+	"fishing_pressure" varchar(100),
+	"stocked" varchar(100),
+	"elevation(ft)" NUMBER(5, 0),
+	"latitude" FLOAT,
+	"longitude" FLOAT
+)';
+
+	EXECUTE IMMEDIATE create_table;
+
+	RETURN 'ALL_SPECIES ids start at ' || next_id;
+END;
+$$
@@ -0,0 +1,31 @@
+INSERT INTO STORAGE_DATABASE.CPW_DATA.ALL_SPECIES (
+	"all_species_id",
+	"main_species",
+	"fish_species",
+	"water",
+	"county",
+	"property_name",
+	"ease_of_access",
+	"boating",
+	"fishing_pressure",
+	"stocked",
+	"elevation(ft)",
+	"latitude",
+	"longitude"
+)
+SELECT
+	"all_species_id",
+	"main_species",
+	"fish_species",
+	"water",
+	"county",
+	"property_name",
+	"ease_of_access",
+	"boating",
+	"fishing_pressure",
+	"stocked",
+	TRY_TO_NUMBER(REPLACE(TRIM("elevation(ft)"), ',', '')),
+	-- " 38.60092 N" -> 38.60092, west longitudes already carry the minus sign
+	TRY_TO_DOUBLE(SPLIT_PART(TRIM("latitude"), ' ', 1)),
+	TRY_TO_DOUBLE(SPLIT_PART(TRIM("longitude"), ' ', 1))
+from STORAGE_DATABASE.CPW_DATA.ALL_SPECIES_TEMP
\ No newline at end of file
@@ -0,0 +1,10 @@
+DELETE FROM STORAGE_DATABASE.CPW_DATA.MASTER_ANGLER_AWARD
+WHERE master_angler_award_id IN (
+	SELECT
+		master_angler_award_id
+	FROM STORAGE_DATABASE.CPW_DATA.MASTER_ANGLER_AWARD
+	QUALIFY ROW_NUMBER() OVER (
+		PARTITION BY "angler", "species", "length", "location", "date"
+		ORDER BY master_angler_award_id
+	) > 1
+)
\ No newline at end of file
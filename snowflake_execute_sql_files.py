@@ -42,7 +42,8 @@ max_sprint_folder_path = glob.glob(max_sprint_folder_search_pattern)[0]
 
 max_sprint_folder_name = os.path.basename(max_sprint_folder_path)
 
-sprint_sql_files = os.listdir(max_sprint_folder_path)
+# Files run in the order of their numeric prefix, later files depend on tables the earlier ones create
+sprint_sql_files = sorted(os.listdir(max_sprint_folder_path), key=lambda file_name: int(file_name.split("_", 1)[0]))
 
 # Create a database connection
 builder_obj = Session.builder.configs({
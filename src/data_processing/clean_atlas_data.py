@@ -54,8 +54,12 @@ added to maintain that requirement.
 import sys
 import logging
 import re
+from itertools import repeat
+
 import pandas as pd
 
+from . import schema
+
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s [%(filename)s] [%(funcName)20s()] [%(levelname)s] - %(message)s",
@@ -63,6 +67,20 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+_SPECIES_START = "Fish species:"
+
+_SPECIES_END = "Ease"
+
+# Category in front of a species name, Example: "Trout:" in "Trout: Cutthroat"
+_SPECIES_CATEGORY_PATTERN = re.compile("[a-zA-Z]+:")
+
+# A line with a colon, split at the first colon. Lines without one are not datapoints
+_FIELD_PATTERN = re.compile(r"^([^:\n]*):(.*)$", re.MULTILINE)
+
+_LATITUDE_PATTERN = re.compile(r"Latitude: (\d+\.\d+) ([NS])")
+
+_LONGITUDE_PATTERN = re.compile(r"Longitude: (-?\d+\.\d+) ([EW])")
+
 
 def split_location_data(full_location_string: str) -> (str, str):
     """Fishing data for each location has multiple sections of data. Only interested in two chunks of text.
@@ -109,6 +127,66 @@ def split_location_data(full_location_string: str) -> (str, str):
     )
 
 
+def tokenize_location_data(information_substring: str, coordinates: str) -> list:
+    """Splits the location data into (key, value) datapoints in one pass of precompiled patterns. The species
+    lines between "Fish species:" and "Ease of access" become a single "Fish Species " datapoint, every other
+    line with a colon is split at its first colon and the latitude and longitude are pulled out of the coordinates.
+
+    :param information_substring: substring of datapoints for a given body of water, see parse_location_data
+    :param coordinates: substring with the coordinates of the body of water
+
+    :return: list of (key, value). Example: [('Fish Species ', ' Cutthroat, Golden'), ('Water', ' Arthur Lake'), ...]
+    """
+    species_start = information_substring.find(_SPECIES_START)
+
+    species_end = information_substring.rfind(_SPECIES_END)
+
+    if species_start == -1 or species_end < species_start:
+        raise ValueError(
+            "Location data does not have a species list followed by Ease of access"
+        )
+
+    # "\nTrout: Cutthroat\nTrout: Golden\n" -> " Cutthroat, Golden"
+    species_lines = information_substring[
+        species_start + len(_SPECIES_START) : species_end
+    ]
+
+    if species_lines.endswith("\n"):
+        species_lines = species_lines[:-1]
+
+    species = _SPECIES_CATEGORY_PATTERN.sub("", species_lines[1:].replace("\n", ","))
+
+    fields = [("Fish Species ", species)]
+
+    fields += _FIELD_PATTERN.findall(
+        (
+            information_substring[:species_start] + information_substring[species_end:]
+        ).replace("Driving directions", "")
+    )
+
+    for coordinate_pattern in (_LATITUDE_PATTERN, _LONGITUDE_PATTERN):
+        key, _, value = coordinate_pattern.search(coordinates).group(0).partition(":")
+
+        fields.append((key, value))
+
+    return fields
+
+
+def parse_location_fields(information_substring: str, coordinates: str) -> dict:
+    """Same as parse_location_data but the datapoints come back as a dictionary.
+
+    :return: the data as a dictionary. Example..
+
+        {
+            'Fish Species ': ' Cutthroat, Golden',
+            'Water': ' Arthur Lake',
+            ...
+            'Longitude': ' -106.32702 W'
+        }
+    """
+    return dict(tokenize_location_data(information_substring, coordinates))
+
+
 def parse_location_data(information_substring: str, coordinates: str) -> list:
     """With location data and the coordinate substrings, the desired data will be parsed into a list.
     Each element in a list will represent a datapoint about the location and text values will resember a dictionary
@@ -145,51 +223,10 @@ def parse_location_data(information_substring: str, coordinates: str) -> list:
             'Longitude: -106.32702 W'
         ]
     """
-    # Process species data seperately
-    raw_species_data = re.findall(
-        "Fish species:.*Ease", information_substring, re.DOTALL
-    )[0]
-
-    raw_species_data = raw_species_data.replace("\nEase", "")
-
-    raw_species_data = raw_species_data.replace("\n", ",")
-
-    raw_species_data = re.sub("[a-zA-Z]+:", "", raw_species_data)
-
-    clean_species_data = raw_species_data.replace("Fish ,", "Fish Species :")
-
-    clean_fishing_data = [clean_species_data]
-
-    # Process rest of location data
-    raw_fishing_information_no_species = re.sub(
-        "Fish species:.*Ease", "Ease", information_substring, flags=re.DOTALL
-    )
-
-    raw_fishing_information_no_species = raw_fishing_information_no_species.replace(
-        "Driving directions", ""
-    )
-
-    for raw_data_point in raw_fishing_information_no_species.split("\n"):
-        if raw_data_point and ":" in raw_data_point:
-            clean_fishing_data.append(raw_data_point)
-
-        elif raw_data_point and ":" not in raw_data_point:
-            logger.debug(f"Element {raw_data_point} does not contain a :")
-
-    # Process Coordinates
-    latitude_pattern = re.compile(r"Latitude: (\d+\.\d+) ([NS])")
-
-    lat_match = latitude_pattern.search(coordinates).group(0)
-
-    clean_fishing_data.append(lat_match)
-
-    longitude_pattern = re.compile(r"Longitude: (-?\d+\.\d+) ([EW])")
-
-    long_match = longitude_pattern.search(coordinates).group(0)
-
-    clean_fishing_data.append(long_match)
-
-    return clean_fishing_data
+    return [
+        key + ":" + value
+        for key, value in tokenize_location_data(information_substring, coordinates)
+    ]
 
 
 def align_lists(clean_data: dict) -> None:
@@ -225,60 +262,110 @@ def align_lists(clean_data: dict) -> None:
     return clean_data
 
 
-def process_all_location_data(raw_data: list) -> pd.DataFrame:
-    """This function will parse a list of strings into a pandas dataframe. Each element will need
-    to be parsed then added to a final dictionary. Once the final dictionary is complete it will be turned into
-    a pandas dataframe.
+def parse_raw_record(all_location_data: str):
+    """Parses the text scraped for a single location into a row.
 
-    :raw_data: list of strings where each element represents text scrapped from a website for a specific location.
-    """
-    clean_data = {}
-    for all_location_data in raw_data:
-        if "Loading..." in all_location_data:
-            logger.warning(
-                "Data did not load for: {}".format(all_location_data.split("XXXX")[1])
-            )
-            continue
+    :param all_location_data: text scrapped from a website for a specific location
 
-        raw_location_fishing_information, raw_coordinates = split_location_data(
-            all_location_data
+    :return: column name -> value, Example: {'Fish Species ': ' Cutthroat, Golden', 'Water': ' Arthur Lake', ...}.
+             None if the location did not load or could not be split
+    """
+    if "Loading..." in all_location_data:
+        logger.warning(
+            "Data did not load for: {}".format(all_location_data.split("XXXX")[1])
         )
+        return None
 
-        if not raw_location_fishing_information:
-            continue
-
-        clean_fishing_data = parse_location_data(
-            raw_location_fishing_information, raw_coordinates
-        )
+    raw_location_fishing_information, raw_coordinates = split_location_data(
+        all_location_data
+    )
 
-        # Store the data into a dictionary
-        longest_value = 0
+    if not raw_location_fishing_information:
+        return None
 
-        for data_point in clean_fishing_data:
-            k, v = data_point.split(":")
+    return parse_location_fields(raw_location_fishing_information, raw_coordinates)
 
-            try:
-                clean_data[k].append(v)
 
-                longest_value = len(clean_data[k])
+class ColumnarRecordBuilder:
+    """Collects rows that do not all have the same columns and turns them into equal length columns. The schema
+    grows as new columns show up, a column is only filled in with nulls when it gets its next value or when the
+    dataframe is made. Adding a row costs the number of values in it plus any rows the column skipped, so building
+    the columns is linear in the size of the final table.
 
-            except KeyError:
-                # Adding a column while other rows have been populated require NA values
-                # to be backfilled to keep all arrays in the dictionary the same length.
-                # Approach assumes that new columns will never be the first element in clean_fishing_information
-                if longest_value > 1:
-                    clean_data[k] = ["NA"] * (longest_value - 1) + [v]
+        builder = ColumnarRecordBuilder()
+        builder.add_row({"Water": "Arthur Lake", "Boating": "None"})
+        builder.add_row({"Water": "Boyd Lake"})
+        builder.to_dict()  # {"Water": ["Arthur Lake", "Boyd Lake"], "Boating": ["None", "NA"]}
+    """
 
+    def __init__(self, fill_value="NA"):
+        """
+        :param fill_value: value for rows that do not have a column
+        """
+        self.fill_value = fill_value
+        self.row_count = 0
+        # Columns are kept in the order they first showed up
+        self.columns = {}
+
+    def add_row(self, row: dict) -> None:
+        """Adds a row, columns that have not been seen before are added to the schema"""
+        for k, v in row.items():
+            column = self.columns.get(k)
+
+            if column is None:
+                if self.row_count:
                     logger.debug(
-                        f"Key {k} initialed after data has been entered. Backfilling {longest_value-1} rows."
+                        f"Key {k} initialed after data has been entered. {self.row_count} rows will be filled."
                     )
-                else:
-                    clean_data[k] = [v]
 
-                    logger.debug(
-                        f"Experienced Key error for first entry. Resolving by creating a new Key for {k}"
-                    )
+                column = self.columns[k] = []
+
+            skipped_rows = self.row_count - len(column)
+
+            if skipped_rows:
+                column.extend(repeat(self.fill_value, skipped_rows))
+
+            column.append(v)
+
+        self.row_count += 1
+
+    def to_dict(self) -> dict:
+        """Fills the end of every column that is short so they all have a value for every row"""
+        for column in self.columns.values():
+            column.extend(repeat(self.fill_value, self.row_count - len(column)))
+
+        return self.columns
+
+    def to_dataframe(self) -> pd.DataFrame:
+        return pd.DataFrame(self.to_dict())
+
+
+def process_all_location_data(raw_data: list, cache=None) -> pd.DataFrame:
+    """This function will parse a list of strings into a pandas dataframe. Each element will need
+    to be parsed then added to a ColumnarRecordBuilder. Once every element is added it will be turned into
+    a pandas dataframe with the column types in schema.ATLAS_SCHEMA.
+
+    :raw_data: list of strings where each element represents text scrapped from a website for a specific location.
+    :cache: optional RawPageCache, records that were parsed on an earlier run are taken from it instead of parsed again
+    """
+    builder = ColumnarRecordBuilder()
+    for all_location_data in raw_data:
+        if cache is None:
+            row = parse_raw_record(all_location_data)
+        else:
+            key = cache.key(all_location_data)
+
+            row = cache.parsed_row(key)
+
+            if row is None:
+                row = parse_raw_record(all_location_data)
+
+                if row is not None:
+                    cache.store(key, all_location_data, row)
+
+        if row is None:
+            continue
 
-        clean_data = align_lists(clean_data)
+        builder.add_row(row)
 
-    return pd.DataFrame(clean_data)
+    return schema.apply_schema(builder.to_dataframe(), schema.ATLAS_SCHEMA)
@@ -5,6 +5,10 @@ where it can then be writted into a snowflake table or passed to other processin
 import sys
 import logging
 import pandas as pd
+import pyarrow as pa
+from pyarrow import csv as pa_csv
+
+from . import schema
 from snowflake.snowpark import Session
 
 logging.basicConfig(
@@ -14,54 +18,89 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+MASTER_ANGLER_COLUMNS = ["Angler", "Species", "Length", "Location", "Date", "Released"]
+
+# Rows per dataframe yielded by iter_master_angler_batches
+DEFAULT_BATCH_SIZE = 10_000
+
 
 def process_master_angler_data(raw_data: list) -> pd.DataFrame:
     """Given data stored as a list, it will be turned into a pandas
-    dataframe.
+    dataframe. The pages are joined into one buffer, rows without exactly six tab seperated fields are filtered out
+    and the rest are read in one go by the pyarrow csv reader.
 
     :param raw_data: a list of elements that take on the format. Example: ["John\t Catfish\t 23\t Wash Park\t June/2023 \t Yes"]
                     Notably, the results will be an element of n number results seperated by new lines.
 
-    :return: the data as a pandas dataframe. Example:
+    :return: the data as a pandas dataframe with the column types in schema.MASTER_ANGLER_SCHEMA. Example:
              ___________________________________________________________
             |Angler |Species    |Length |Location   |Date      |Released|
             |-----------------------------------------------------------|
-            |John   |Catfish    |23     |Wash Park  |June/2023 |Yes     |
+            |John   |Catfish    |23     |Wash Park  |2023-06-01|Yes     |
             |___________________________________________________________|
     """
-    all_raw_data = []
-    for page_result in raw_data:
-        all_raw_data += page_result.split("\n")
-
-    parsed_data = {
-        "Angler": [],
-        "Species": [],
-        "Length": [],
-        "Location": [],
-        "Date": [],
-        "Released": [],
-    }
-    for row in all_raw_data:
-        split_row = row.split("\t")
-
-        if len(split_row) == 6:
-            parsed_data["Angler"].append(split_row[0])
-            parsed_data["Species"].append(split_row[1])
-            parsed_data["Length"].append(split_row[2])
-            parsed_data["Location"].append(split_row[3])
-            parsed_data["Date"].append(split_row[4])
-            parsed_data["Released"].append(split_row[5])
-
-        else:
-            if len(split_row[0]) > 0:
-                logging.warning(
-                    f"Incomplete record with {len(split_row)} item(s). Length of first element: {len(split_row[0])}"
-                )
-
-    processed_data = pd.DataFrame(parsed_data)
+    raw_buffer = "\n".join(raw_data)
+
+    def warn_incomplete_record(row) -> str:
+        first_element = row.text.split("\t")[0]
+
+        if len(first_element) > 0:
+            logging.warning(
+                f"Incomplete record with {row.actual_columns} item(s). Length of first element: {len(first_element)}"
+            )
+
+        return "skip"
+
+    if raw_buffer.strip("\n"):
+        processed_data = pa_csv.read_csv(
+            pa.py_buffer(raw_buffer.encode("utf-8")),
+            # Single threaded so incomplete records are logged in the order they show up
+            read_options=pa_csv.ReadOptions(
+                column_names=MASTER_ANGLER_COLUMNS, use_threads=False
+            ),
+            parse_options=pa_csv.ParseOptions(
+                delimiter="\t",
+                quote_char=False,
+                invalid_row_handler=warn_incomplete_record,
+            ),
+            convert_options=pa_csv.ConvertOptions(
+                column_types={column: pa.string() for column in MASTER_ANGLER_COLUMNS},
+                strings_can_be_null=False,
+                quoted_strings_can_be_null=False,
+            ),
+        ).to_pandas()
+    else:
+        processed_data = pd.DataFrame(columns=MASTER_ANGLER_COLUMNS, dtype=str)
+
+    raw_data_elements = sum(page_result.count("\n") + 1 for page_result in raw_data)
 
     logging.info(
-        f"Number of elements in raw_data={len(all_raw_data)}. Number of rows in dataframe {len(processed_data)}"
+        f"Number of elements in raw_data={raw_data_elements}. Number of rows in dataframe {len(processed_data)}"
     )
 
-    return processed_data
+    return schema.apply_schema(processed_data, schema.MASTER_ANGLER_SCHEMA)
+
+
+def iter_master_angler_batches(raw_data, batch_size: int = DEFAULT_BATCH_SIZE):
+    """Streaming version of process_master_angler_data. Pages are pulled from any iterable, such as
+    MasterAnglerScraper.iter_pages, and a dataframe is yielded once roughly batch_size rows have come in. Only one
+    batch is held at a time so memory does not grow with the number of awards.
+
+    :param raw_data: iterable of page text in the format process_master_angler_data takes
+    :param batch_size: number of rows to collect before a dataframe is yielded
+
+    :return: generator of dataframes, each in the format process_master_angler_data returns
+    """
+    batch_pages, batch_rows = [], 0
+    for page_result in raw_data:
+        batch_pages.append(page_result)
+
+        batch_rows += page_result.count("\n") + 1
+
+        if batch_rows >= batch_size:
+            yield process_master_angler_data(batch_pages)
+
+            batch_pages, batch_rows = [], 0
+
+    if batch_pages:
+        yield process_master_angler_data(batch_pages)
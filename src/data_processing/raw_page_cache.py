@@ -0,0 +1,166 @@
+""" A local content addressed cache of the raw text scraped for each Fishing Atlas location. Each raw record is
+stored under the sha256 of its text, along with the row it was parsed into.
+
+    raw_page_cache/
+        manifest.json
+        objects/
+            3f/3f9a...e1.txt
+
+The manifest keeps the parsed row of each cached record and, for every table, the keys of the records that were
+last uploaded to it. That allows two shortcuts on the next run
+
+    - process_all_location_data only parses records it has not seen before
+    - diff tells which records are new and which are gone since the last upload, so only those have to be written
+
+Records are evicted least recently used first once there are more than max_entries.
+"""
+
+import os
+import sys
+import json
+import hashlib
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(filename)s] [%(funcName)20s()] [%(levelname)s] - %(message)s",
+    stream=sys.stdout,
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 50_000
+
+
+class RawPageCache:
+    def __init__(self, directory: str, max_entries: int = DEFAULT_MAX_ENTRIES):
+        """
+        :param directory: folder for the manifest and raw records, it is created if it does not exist
+        :param max_entries: number of records kept before the least recently used are evicted
+        """
+        self.directory = directory
+        self.max_entries = max_entries
+        self.manifest_path = os.path.join(directory, "manifest.json")
+
+        os.makedirs(os.path.join(directory, "objects"), exist_ok=True)
+
+        self.manifest = {"entries": {}, "uploads": {}, "clock": 0}
+
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, "r", encoding="utf-8") as manifest_file:
+                self.manifest = json.load(manifest_file)
+
+    @staticmethod
+    def key(raw_record: str) -> str:
+        """Content address of a raw record, the location name and the location data are both part of the text"""
+        return hashlib.sha256(raw_record.encode("utf-8")).hexdigest()
+
+    def _object_path(self, key: str) -> str:
+        return os.path.join(self.directory, "objects", key[:2], key + ".txt")
+
+    def _touch(self, key: str) -> None:
+        self.manifest["clock"] += 1
+        self.manifest["entries"][key]["last_used"] = self.manifest["clock"]
+
+    def parsed_row(self, key: str):
+        """Returns the parsed row of a cached record, or None if the record has not been parsed before"""
+        if key not in self.manifest["entries"]:
+            return None
+
+        self._touch(key)
+
+        return self.manifest["entries"][key]["row"]
+
+    def store(self, key: str, raw_record: str, row: dict) -> None:
+        """Adds a raw record and the row it was parsed into"""
+        object_path = self._object_path(key)
+
+        if not os.path.exists(object_path):
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+
+            with open(object_path, "w", encoding="utf-8") as object_file:
+                object_file.write(raw_record)
+
+        self.manifest["entries"][key] = {"row": row}
+
+        self._touch(key)
+
+    def rows(self, keys: list):
+        """Parsed rows for a list of keys, or None if any of them is no longer in the cache"""
+        rows = [self.parsed_row(key) for key in keys]
+
+        return None if any(row is None for row in rows) else rows
+
+    def diff(self, table_name: str, raw_data: list) -> (list, list):
+        """Compares scraped records to what was last uploaded to a table.
+
+        :param table_name: the table the records are written to
+        :param raw_data: raw records from the scraper
+
+        :return: the raw records that are new and the keys of uploaded records that are no longer scraped. A changed
+                 record shows up in both since its key changes with its text.
+        """
+        uploaded_keys = set(self.manifest["uploads"].get(table_name, []))
+
+        scraped_keys = {self.key(raw_record): raw_record for raw_record in raw_data}
+
+        added_records = [
+            raw_record
+            for key, raw_record in scraped_keys.items()
+            if key not in uploaded_keys
+        ]
+
+        removed_keys = sorted(uploaded_keys.difference(scraped_keys))
+
+        logger.info(
+            f"{table_name}: {len(added_records)} new or changed records, {len(removed_keys)} removed records"
+        )
+
+        return added_records, removed_keys
+
+    def has_uploaded(self, table_name: str) -> bool:
+        """True once records have been uploaded to the table"""
+        return table_name in self.manifest["uploads"]
+
+    def mark_uploaded(self, table_name: str, raw_data: list) -> None:
+        """Saves the records that are now in the table"""
+        self.manifest["uploads"][table_name] = sorted(
+            {self.key(raw_record) for raw_record in raw_data}
+        )
+
+    def forget_upload(self, table_name: str) -> None:
+        """For a table that was written from somewhere else, the next upload to it is a rewrite instead of a diff"""
+        self.manifest["uploads"].pop(table_name, None)
+
+    def evict(self) -> None:
+        """Removes the least recently used records until there are at most max_entries"""
+        entries = self.manifest["entries"]
+
+        evict_count = len(entries) - self.max_entries
+
+        if evict_count <= 0:
+            return
+
+        evicted_keys = sorted(entries, key=lambda key: entries[key]["last_used"])[
+            :evict_count
+        ]
+
+        for key in evicted_keys:
+            del entries[key]
+
+            if os.path.exists(self._object_path(key)):
+                os.remove(self._object_path(key))
+
+        logger.info(f"Evicted {len(evicted_keys)} records from the raw page cache")
+
+    def save(self) -> None:
+        """Evicts old records and writes the manifest. The manifest is replaced in one step so a crash can not
+        leave half of it on disk.
+        """
+        self.evict()
+
+        temporary_path = self.manifest_path + ".tmp"
+
+        with open(temporary_path, "w", encoding="utf-8") as manifest_file:
+            json.dump(self.manifest, manifest_file)
+
+        os.replace(temporary_path, self.manifest_path)
@@ -0,0 +1,116 @@
+""" Column types for the cleaned Master Angler and Fishing Atlas dataframes. The cleaners parse everything as text,
+this turns the columns into what they actually hold before they are written.
+
+    Length          "23"            -> 23                       Int8
+    Elevation(ft)   " 1,000"        -> 1000                     Int32
+    Latitude        " 38.60092 N"   -> 38.60092                 float64
+    Longitude       " -106.32702 W" -> -106.32702               float64
+    Date            "July\\2023"     -> 2023-07-01               datetime64
+    Species, County, Boating...     -> category
+
+Values that can not be parsed become nulls. Columns that are not in a schema, or that are missing from the
+dataframe, are left alone.
+"""
+
+import sys
+import logging
+import pandas as pd
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(filename)s] [%(funcName)20s()] [%(levelname)s] - %(message)s",
+    stream=sys.stdout,
+)
+logger = logging.getLogger(__name__)
+
+# Bumped whenever a column type changes so tables written with the old types are rewritten instead of patched
+SCHEMA_VERSION = 2
+
+# NUMBER(2, 0) in MASTER_ANGLER_AWARD
+_MAXIMUM_LENGTH = 99
+
+_COORDINATE_PATTERN = r"(-?\d+(?:\.\d+)?)\s*([NSEW]?)"
+
+
+def to_category(series: pd.Series) -> pd.Series:
+    """Low cardinality text, each distinct value is only stored once"""
+    return series.astype("category")
+
+
+def to_length(series: pd.Series) -> pd.Series:
+    """Fish length in inches. Example: "23" -> 23"""
+    lengths = pd.to_numeric(series.str.strip(), errors="coerce").round()
+
+    out_of_range = lengths.notna() & ~lengths.between(0, _MAXIMUM_LENGTH)
+
+    if out_of_range.any():
+        logger.warning(
+            f"{out_of_range.sum()} length(s) do not fit in NUMBER(2, 0) and were nulled"
+        )
+
+    return lengths.mask(out_of_range).astype("Int8")
+
+
+def to_elevation(series: pd.Series) -> pd.Series:
+    """Elevation in feet with the thousands separator dropped. Example: " 1,000" -> 1000"""
+    return (
+        pd.to_numeric(series.str.replace(",", "").str.strip(), errors="coerce")
+        .round()
+        .astype("Int32")
+    )
+
+
+def to_coordinate(series: pd.Series) -> pd.Series:
+    """Decimal degrees, south and west are negative. Example: " -106.32702 W" -> -106.32702"""
+    parts = series.str.extract(_COORDINATE_PATTERN)
+
+    degrees = pd.to_numeric(parts[0], errors="coerce")
+
+    # The atlas already writes west longitudes with a minus sign, only flip the ones that do not have it
+    flip = parts[1].isin(["S", "W"]) & (degrees > 0)
+
+    return degrees.mask(flip, -degrees).astype("float64")
+
+
+def to_month(series: pd.Series) -> pd.Series:
+    """The month an award was caught in as a date on the first of the month. Example: "July\\2023" -> 2023-07-01"""
+    return pd.to_datetime(
+        series.str.replace("\\", "/").str.strip(), format="%B/%Y", errors="coerce"
+    )
+
+
+MASTER_ANGLER_SCHEMA = {
+    "Species": to_category,
+    "Length": to_length,
+    "Location": to_category,
+    "Date": to_month,
+    "Released": to_category,
+}
+
+ATLAS_SCHEMA = {
+    "Fish Species ": to_category,
+    "County": to_category,
+    "Property name": to_category,
+    "Ease of access": to_category,
+    "Boating": to_category,
+    "Fishing pressure": to_category,
+    "Stocked": to_category,
+    "Elevation(ft)": to_elevation,
+    "Latitude": to_coordinate,
+    "Longitude": to_coordinate,
+}
+
+
+def apply_schema(df: pd.DataFrame, schema: dict) -> pd.DataFrame:
+    """Converts the columns of a text dataframe to their types.
+
+    :param df: dataframe from one of the cleaners, every column is text
+    :param schema: column name -> function that converts the column. Example: MASTER_ANGLER_SCHEMA
+
+    :return: the same dataframe with converted columns
+    """
+    for column, convert in schema.items():
+        if column in df.columns:
+            df[column] = convert(df[column].astype(str))
+
+    return df
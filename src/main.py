@@ -1,16 +1,145 @@
-from web_scrapers import master_angler, colorado_fishing_atlas
-from data_processing import clean_master_angler_data, clean_atlas_data
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+
+from web_scrapers import (
+    master_angler,
+    colorado_fishing_atlas,
+    scrape_journal,
+    atlas_feature_service,
+)
+from data_processing import (
+    clean_master_angler_data,
+    clean_atlas_data,
+    raw_page_cache,
+    schema,
+)
 from snowflake_ import snowflake_writer
 
-raw_data = master_angler.MasterAnglerScraper().execute()
+# Columns that identify a location in the species tables
+ATLAS_KEY_COLUMNS = ["Water", "Latitude", "Longitude"]
 
-df = clean_master_angler_data.process_master_angler_data(raw_data)
+# Master Angler rows written to snowflake at a time while the rest are still being scraped
+MASTER_ANGLER_BATCH_SIZE = 10_000
+
+# MASTER_ANGLER_AWARD has lower case column names
+MASTER_ANGLER_COLUMN_MAP = {
+    column: column.lower() for column in clean_master_angler_data.MASTER_ANGLER_COLUMNS
+}
+
+# An award is the same award if all of these match, rescraped awards are updated instead of added again
+MASTER_ANGLER_KEY_COLUMNS = ["angler", "species", "length", "location", "date"]
+
+# Species tables that are rewritten share one upload to this stage, see snowflake_setup.toml
+ATLAS_STAGE = "STORAGE_DATABASE.CPW_DATA.TEST_STAGE"
+
+# "scraper" clicks through the atlas map popups, "feature_service" asks the atlas' ArcGIS query endpoint for the
+# features of each species instead
+ATLAS_FETCH_MODE = "scraper"
+
+
+def upload_name(fully_qualified_name: str) -> str:
+    """Name a table's upload is recorded under in the raw page cache. Tables uploaded with older column types are
+    not patched, they are rewritten with the current ones.
+    """
+    return f"{fully_qualified_name} v{schema.SCHEMA_VERSION}"
+
+
+def write_atlas_delta(
+    raw_species_data: list,
+    fully_qualified_name: str,
+    cache: raw_page_cache.RawPageCache,
+) -> bool:
+    """Writes a species table by only sending the locations that changed since the last upload.
+
+    :return: False when the table has to be rewritten instead. That is the case for the first upload to a table,
+             or one where the removed rows are no longer cached.
+    """
+    added_records, removed_keys = cache.diff(
+        upload_name(fully_qualified_name), raw_species_data
+    )
+
+    removed_rows = cache.rows(removed_keys)
+
+    if (
+        not cache.has_uploaded(upload_name(fully_qualified_name))
+        or removed_rows is None
+    ):
+        return False
+
+    if added_records or removed_keys:
+        snowflake_writer.SnowflakeDfWriter().write_delta(
+            added_df=clean_atlas_data.process_all_location_data(added_records, cache),
+            removed_df=schema.apply_schema(
+                pd.DataFrame(removed_rows, columns=ATLAS_KEY_COLUMNS),
+                schema.ATLAS_SCHEMA,
+            ),
+            fully_qualified_table_name=fully_qualified_name,
+            key_columns=ATLAS_KEY_COLUMNS,
+        )
+
+    cache.mark_uploaded(upload_name(fully_qualified_name), raw_species_data)
+
+    return True
+
+
+def write_master_angler() -> dict:
+    """Scrapes the Master Angler awards, cleaning and merging them into the table in batches as they come in.
+    Only awards that are new or changed since the last run are moved.
+
+    :return: {"inserted": rows inserted, "updated": rows updated}
+    """
+    master_angler_pages = master_angler.MasterAnglerScraper(
+        fetch_mode="http"
+    ).iter_pages()
+
+    writer = snowflake_writer.SnowflakeDfWriter()
+
+    totals = {"inserted": 0, "updated": 0}
+    for df in clean_master_angler_data.iter_master_angler_batches(
+        master_angler_pages, batch_size=MASTER_ANGLER_BATCH_SIZE
+    ):
+        counts = writer.write_upsert(
+            df,
+            fully_qualified_table_name="STORAGE_DATABASE.CPW_DATA.MASTER_ANGLER_AWARD",
+            key_columns=MASTER_ANGLER_KEY_COLUMNS,
+            column_map=MASTER_ANGLER_COLUMN_MAP,
+        )
+
+        totals = {key: totals[key] + counts[key] for key in totals}
+
+    return totals
+
+
+def write_atlas_feature_service(
+    species_list: list, cache: raw_page_cache.RawPageCache
+) -> int:
+    """Fetches every species from the atlas feature service and rewrites their tables. The features come back as
+    structured fields, so there are no popup records to journal or parse.
+
+    :return: number of species tables written
+    """
+    client = atlas_feature_service.AtlasFeatureServiceClient()
+
+    results = snowflake_writer.SnowflakeDfWriter().write_tables(
+        {
+            f"STORAGE_DATABASE.CPW_DATA.{species}": schema.apply_schema(
+                client.fetch_species_dataframe(species), schema.ATLAS_SCHEMA
+            )
+            for species in species_list
+        },
+        overwrite=True,
+        auto_create_table=True,
+        stage=ATLAS_STAGE,
+    )
+
+    # The cached uploads no longer describe the tables, the next scraper run rewrites them
+    for fully_qualified_name in results:
+        cache.forget_upload(upload_name(fully_qualified_name))
+
+    cache.save()
+
+    return sum(result["error"] is None for result in results.values())
 
-snowflake_writer.SnowflakeDfWriter().write_table(
-    df=df,
-    fully_qualified_table_name="STORAGE_DATABASE.CPW_DATA.MASTER_ANGLER_AWARD",
-    overwrite=False,
-)
 
 fish_species = [
     "Trout: Brook",
@@ -25,14 +154,59 @@ fish_species = [
     "Trout: Unspecified",
 ]
 
-for species in fish_species:
-    fully_qualified_name = f"STORAGE_DATABASE.CPW_DATA.{species}"
+# Scraped features are journaled so a failed run picks up where it stopped when rerun
+journal = scrape_journal.ScrapeJournal("atlas_scrape_journal.jsonl")
 
-    # Need to make the species scraper work the same way
-    raw_species_data = colorado_fishing_atlas.fishing_atlas_scraper(species).execute()
+# Raw records and what was uploaded last time, so unchanged locations are not parsed or written again
+cache = raw_page_cache.RawPageCache("raw_page_cache")
 
-    df = clean_atlas_data.process_all_location_data(raw_species_data)
+with ThreadPoolExecutor(max_workers=1) as executor:
+    # The Master Angler upload runs next to the atlas instead of before it
+    master_angler_future = executor.submit(write_master_angler)
 
-    snowflake_writer.SnowflakeDfWriter().write_table(
-        df=df, fully_qualified_table_name=fully_qualified_name, overwrite=True
-    )
+    if ATLAS_FETCH_MODE == "feature_service":
+        written_species = write_atlas_feature_service(fish_species, cache)
+    else:
+        # Species whose table only needs a delta are written as soon as they are scraped, the rest are rewritten
+        # together at the end
+        written_species, rewrites = 0, {}
+        for species, raw_species_data in colorado_fishing_atlas.FishingAtlasScraperPool(
+            fish_species, journal=journal
+        ).iter_species():
+            fully_qualified_name = f"STORAGE_DATABASE.CPW_DATA.{species}"
+
+            if write_atlas_delta(raw_species_data, fully_qualified_name, cache):
+                written_species += 1
+
+                # Saved after every table so a failed run never sends the same delta twice
+                cache.save()
+            else:
+                rewrites[fully_qualified_name] = raw_species_data
+
+        results = snowflake_writer.SnowflakeDfWriter().write_tables(
+            {
+                fully_qualified_name: clean_atlas_data.process_all_location_data(
+                    raw_species_data, cache
+                )
+                for fully_qualified_name, raw_species_data in rewrites.items()
+            },
+            overwrite=True,
+            auto_create_table=True,
+            stage=ATLAS_STAGE,
+        )
+
+        for fully_qualified_name, result in results.items():
+            if result["error"] is None:
+                cache.mark_uploaded(
+                    upload_name(fully_qualified_name), rewrites[fully_qualified_name]
+                )
+
+                written_species += 1
+
+        cache.save()
+
+    master_angler_future.result()
+
+# Only start fresh next time once every species made it into snowflake
+if written_species == len(fish_species):
+    journal.clear()
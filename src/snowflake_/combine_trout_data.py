@@ -2,6 +2,7 @@
 """
 
 import sys
+import uuid
 import logging
 from snowflake.snowpark import Session
 import pandas as pd
@@ -16,68 +17,193 @@ logging.basicConfig(
 logger = logging.getLogger("STORAGE_DATABASE.CPW_DATA.LOG_OUTPUTS")
 
 
-def combine_trout_tables(session: Session) -> str:
-    """Once all the data is in Snowflake all of it will be combined into one table. This process will create
-    a new table to store all the data, add a main species column do note the primary species for each row, and insert
-    the data from each species table.
-    """
-    truncate_result = session.sql(
-        "truncate STORAGE_DATABASE.CPW_DATA.ALL_SPECIES"
-    ).collect()
+# Column in each Trout table -> column in ALL_SPECIES
+ALL_SPECIES_COLUMNS = {
+    "Fish Species ": "fish_species",
+    "Water": "water",
+    "County": "county",
+    "Property name": "property_name",
+    "Ease of access": "ease_of_access",
+    "Boating": "boating",
+    "Fishing pressure": "fishing_pressure",
+    "Stocked": "stocked",
+    "Elevation(ft)": "elevation(ft)",
+    "Latitude": "latitude",
+    "Longitude": "longitude",
+}
 
-    logger.info(
-        f"Truncated {truncate_result[0][0]} rows from STORAGE_DATABASE.CPW_DATA.ALL_SPECIES"
-    )
 
-    infomation_schema_df = session.sql(
+def _trout_table_columns(session: Session) -> dict:
+    """Finds every Trout table and its columns with one information_schema query.
+
+    :return: table name -> set of column names. Example: {"Trout: Brook": {"Water", "County", ...}}
+    """
+    columns_df = session.sql(
         """
     SELECT
-        TABLE_NAME
-    FROM storage_database.information_schema.TABLES
+        TABLE_NAME,
+        COLUMN_NAME
+    FROM storage_database.information_schema.COLUMNS
     WHERE
-        TABLE_NAME like 'Trout%' 
+        TABLE_NAME like 'Trout%'
         AND TABLE_SCHEMA = 'CPW_DATA'
+    ORDER BY TABLE_NAME
     """
     ).to_pandas()
 
-    # Start inserting all the data and populate the Main Species column
-    for table_name in infomation_schema_df.TABLE_NAME:
-        logger.info(f"Beginning table: {table_name}")
+    return {
+        table_name: set(table_df.COLUMN_NAME)
+        for table_name, table_df in columns_df.groupby("TABLE_NAME", sort=True)
+    }
 
-        insert_statement = f"""
-        INSERT INTO STORAGE_DATABASE.CPW_DATA.ALL_SPECIES (
-            "main_species",
-            "fish_species",
-            "water",
-            "county",
-            "property_name",
-            "ease_of_access",
-            "boating",
-            "fishing_pressure",
-            "stocked",
-            "elevation(ft)",
-            "latitude",
-            "longitude"
+
+def _build_insert_statement(table_columns: dict, target_table: str) -> str:
+    """One INSERT that reads every Trout table, stacked with UNION ALL. Columns a table does not have, like an
+    optional popup field that never showed up for that species, are inserted as nulls.
+    """
+    target_columns = ",\n            ".join(
+        f'"{column}"' for column in ["main_species", *ALL_SPECIES_COLUMNS.values()]
+    )
+
+    selects = []
+    for table_name, columns in table_columns.items():
+        main_species = table_name.replace("Trout: ", "").replace("'", "''")
+
+        select_columns = ",\n            ".join(
+            [f"'{main_species}' as \"main_species\""]
+            + [
+                f'"{column}"' if column in columns else f'NULL as "{column}"'
+                for column in ALL_SPECIES_COLUMNS
+            ]
         )
 
+        selects.append(
+            f"""
         select
-            '{table_name.replace("Trout: ", "")}' as "main_species",
-            "Fish Species ",
-            "Water",
-            "County",
-            "Property name",
-            "Ease of access",
-            "Boating",
-            "Fishing pressure",
-            "Stocked",
-            "Elevation(ft)",
-            "Latitude",
-            "Longitude"
+            {select_columns}
+        FROM STORAGE_DATABASE.CPW_DATA."{table_name}"
+        """
+        )
+
+    union_of_selects = "UNION ALL".join(selects)
+
+    return f"""
+        INSERT INTO {target_table} (
+            {target_columns}
+        )
+        {union_of_selects}
+        """
+
+
+def _source_row_counts(session: Session, table_names: list) -> dict:
+    """Rows in each Trout table from one query. Example: {"Brook": 120, "Brown": 340}"""
+    count_statement = "\n        UNION ALL\n".join(
+        f"""
+        SELECT
+            '{table_name.replace("Trout: ", "").replace("'", "''")}' as "main_species",
+            COUNT(*) as "row_count"
         FROM STORAGE_DATABASE.CPW_DATA."{table_name}"
         """
+        for table_name in table_names
+    )
+
+    return {
+        main_species: row_count
+        for main_species, row_count in session.sql(count_statement).collect()
+    }
+
 
-        table_insert_result = session.sql(insert_statement).collect()
+def _validate_shadow_table(
+    session: Session, shadow_table: str, inserted_rows: int, source_counts: dict
+) -> dict:
+    """Checks the shadow table holds every row of every Trout table before it replaces ALL_SPECIES.
 
-        logger.info(f"Wrote {table_insert_result[0][0]} rows from table: {table_name}")
+    :return: main species -> rows in the shadow table
+    """
+    shadow_counts = {
+        main_species: row_count
+        for main_species, row_count in session.sql(
+            f"""
+        SELECT
+            "main_species",
+            COUNT(*)
+        FROM {shadow_table}
+        GROUP BY "main_species"
+        """
+        ).collect()
+    }
+
+    if inserted_rows == 0:
+        raise ValueError("The Trout tables are empty, ALL_SPECIES was not replaced")
+
+    if sum(shadow_counts.values()) != inserted_rows:
+        raise ValueError(
+            f"{shadow_table} has {sum(shadow_counts.values())} rows but {inserted_rows} were inserted"
+        )
+
+    mismatched = {
+        main_species: (shadow_counts.get(main_species, 0), row_count)
+        for main_species, row_count in source_counts.items()
+        if shadow_counts.get(main_species, 0) != row_count
+    }
+
+    # A Trout table that was written to while the shadow table was built ends up here, the next run picks it up
+    if mismatched:
+        raise ValueError(
+            f"Row counts in {shadow_table} do not match their Trout tables (shadow, source): {mismatched}"
+        )
+
+    return shadow_counts
+
+
+def combine_trout_tables(session: Session) -> str:
+    """Once all the data is in Snowflake all of it will be combined into one table. This process will add a main
+    species column to note the primary species for each row, and rebuild ALL_SPECIES with the data from every species
+    table.
+
+    The rows are loaded into a shadow copy of ALL_SPECIES first. Only once its row counts match the Trout tables is it
+    swapped with ALL_SPECIES, which is a single metadata change. Readers keep seeing the old rows until the swap and
+    never an empty or half loaded table. If anything fails ALL_SPECIES is left as it was.
+    """
+    table_columns = _trout_table_columns(session)
+
+    if not table_columns:
+        logger.warning("No Trout tables were found, ALL_SPECIES was left as is")
+
+        return "No Trout tables to combine."
+
+    # Unique per run so two runs at once do not load into each other's shadow table
+    shadow_table = (
+        f"STORAGE_DATABASE.CPW_DATA.ALL_SPECIES_SHADOW_{uuid.uuid4().hex[:8].upper()}"
+    )
+
+    session.sql(
+        f"CREATE OR REPLACE TABLE {shadow_table} LIKE STORAGE_DATABASE.CPW_DATA.ALL_SPECIES"
+    ).collect()
+
+    try:
+        insert_result = session.sql(
+            _build_insert_statement(table_columns, shadow_table)
+        ).collect()
+
+        source_counts = _source_row_counts(session, list(table_columns))
+
+        shadow_counts = _validate_shadow_table(
+            session, shadow_table, insert_result[0][0], source_counts
+        )
+
+        session.sql(
+            f"ALTER TABLE STORAGE_DATABASE.CPW_DATA.ALL_SPECIES SWAP WITH {shadow_table}"
+        ).collect()
+    finally:
+        # After the swap this holds the old rows of ALL_SPECIES
+        session.sql(f"DROP TABLE IF EXISTS {shadow_table}").collect()
+
+    for main_species, row_count in sorted(shadow_counts.items()):
+        logger.info(f"Wrote {row_count} rows from table: Trout: {main_species}")
+
+    logger.info(
+        f"Swapped {insert_result[0][0]} rows from {len(table_columns)} tables into ALL_SPECIES"
+    )
 
     return "Successfully Completed Proceedure. For more info view logs."
@@ -0,0 +1,205 @@
+""" A small pool of Snowflake sessions so a run authenticates once per connection instead of once per write.
+
+    pool = SessionPool(create_session, max_size=4)
+
+    with pool.session() as session:
+        session.sql("select 1").collect()
+
+A session goes back to the pool when the with block ends. Sessions that sat idle longer than idle_timeout_seconds are
+closed instead of reused. Sessions that sat idle for a while are health checked with a cheap query before they are
+handed out. If the check fails, the session is thrown away and another one is used. When max_size sessions are
+already in use, callers wait for one to come back.
+
+The session factory is any callable that returns a new session, so tests can pass in a fake one. get_session_pool
+returns the pool shared by the whole process.
+"""
+
+import sys
+import time
+import atexit
+import logging
+import threading
+from contextlib import contextmanager
+
+logging.getLogger("snowflake.connector").setLevel(logging.WARNING)
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(filename)s] [%(funcName)20s()] [%(levelname)s] - %(message)s",
+    stream=sys.stdout,
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_SIZE = 4
+
+# Snowflake expires idle sessions after 4 hours, give up on them well before that
+DEFAULT_IDLE_TIMEOUT_SECONDS = 15 * 60
+
+# Sessions used more recently than this are handed out without a health check
+DEFAULT_HEALTH_CHECK_AFTER_SECONDS = 60
+
+
+def run_health_check(session) -> bool:
+    """Default health check, a session is healthy if it can run a query"""
+    try:
+        session.sql("select 1").collect()
+    except Exception as e:
+        logger.warning(f"Session failed its health check: {e}")
+
+        return False
+
+    return True
+
+
+class SessionPool:
+    def __init__(
+        self,
+        session_factory,
+        max_size: int = DEFAULT_MAX_SIZE,
+        idle_timeout_seconds: float = DEFAULT_IDLE_TIMEOUT_SECONDS,
+        health_check=run_health_check,
+        health_check_after_seconds: float = DEFAULT_HEALTH_CHECK_AFTER_SECONDS,
+        clock=time.monotonic,
+    ):
+        """
+        :param session_factory: callable that returns a new, connected session
+        :param max_size: max number of sessions open at once, in use or idle
+        :param idle_timeout_seconds: idle sessions older than this are closed instead of reused
+        :param health_check: callable(session) that returns False when the session can not be used anymore
+        :param health_check_after_seconds: sessions idle for longer than this are health checked before reuse
+        :param clock: returns the current time in seconds, tests pass their own
+        """
+        self.session_factory = session_factory
+        self.max_size = max(1, max_size)
+        self.idle_timeout_seconds = idle_timeout_seconds
+        self.health_check = health_check
+        self.health_check_after_seconds = health_check_after_seconds
+        self.clock = clock
+
+        # (session, time it was returned), the most recently returned session is at the end
+        self.idle_sessions = []
+        self.open_sessions = 0
+        self.condition = threading.Condition()
+
+    def _close(self, session) -> None:
+        try:
+            session.close()
+        except Exception as e:
+            logger.debug(f"Error closing session: {e}")
+
+    def _take_idle_session(self):
+        """Pops idle sessions until a usable one is found. Must be called while holding the condition.
+
+        :return: a session, or None when there are no usable idle sessions
+        """
+        while self.idle_sessions:
+            session, returned_at = self.idle_sessions.pop()
+
+            idle_seconds = self.clock() - returned_at
+
+            if idle_seconds > self.idle_timeout_seconds:
+                logger.debug(f"Closing session that was idle for {idle_seconds:.0f}s")
+            elif idle_seconds <= self.health_check_after_seconds or self.health_check(
+                session
+            ):
+                return session
+
+            self.open_sessions -= 1
+            self._close(session)
+
+        return None
+
+    def acquire(self, timeout: float = None):
+        """Takes a session from the pool, creating one if none are idle and the pool is not full.
+
+        :param timeout: seconds to wait for a session when the pool is full, None waits forever
+        """
+        with self.condition:
+            while True:
+                session = self._take_idle_session()
+
+                if session is not None:
+                    return session
+
+                if self.open_sessions < self.max_size:
+                    self.open_sessions += 1
+                    break
+
+                if not self.condition.wait(timeout):
+                    raise TimeoutError(
+                        f"No session was returned to the pool within {timeout}s"
+                    )
+
+        # Connecting is slow, do it without holding the lock
+        try:
+            session = self.session_factory()
+        except Exception:
+            with self.condition:
+                self.open_sessions -= 1
+                self.condition.notify()
+            raise
+
+        logger.info(f"Opened session {self.open_sessions} of {self.max_size}")
+
+        return session
+
+    def release(self, session, healthy: bool = True) -> None:
+        """Returns a session to the pool.
+
+        :param healthy: False closes the session instead, for example after it raised a connection error
+        """
+        with self.condition:
+            if healthy:
+                self.idle_sessions.append((session, self.clock()))
+            else:
+                self.open_sessions -= 1
+                self._close(session)
+
+            self.condition.notify()
+
+    @contextmanager
+    def session(self, timeout: float = None):
+        """Context manager that takes a session and gives it back when the block ends. If the block raises, the
+        session is health checked before it goes back so a dropped connection is not handed out again.
+        """
+        session = self.acquire(timeout)
+
+        try:
+            yield session
+        except BaseException:
+            self.release(session, healthy=self.health_check(session))
+            raise
+        else:
+            self.release(session)
+
+    def close_all(self) -> None:
+        """Closes every idle session, sessions that are in use still go back to the pool when released."""
+        with self.condition:
+            for session, _ in self.idle_sessions:
+                self._close(session)
+
+            self.open_sessions -= len(self.idle_sessions)
+            self.idle_sessions = []
+
+
+_shared_pool = None
+
+_shared_pool_lock = threading.Lock()
+
+
+def get_session_pool(session_factory, **pool_settings) -> SessionPool:
+    """Returns the pool shared by the whole process, creating it on the first call. Later calls get the same pool
+    and their arguments are ignored. Idle sessions are closed when the process exits.
+
+    :param session_factory: callable that returns a new, connected session
+    :param pool_settings: keyword arguments passed on to SessionPool
+    """
+    global _shared_pool
+
+    with _shared_pool_lock:
+        if _shared_pool is None:
+            _shared_pool = SessionPool(session_factory, **pool_settings)
+
+            atexit.register(_shared_pool.close_all)
+
+        return _shared_pool
@@ -1,14 +1,23 @@
 """ Provides functions to write pandas data into snowflake and automates the connection to the database.
-Additionally can be used to connect to the db for SQL queries using the build_session function
+Additionally can be used to connect to the db for SQL queries using the build_session function, or by borrowing a
+session from the shared pool with SnowflakeDfWriter().pool.session()
 """
 
 import os
 import sys
 import json
+import time
+import uuid
 import logging
+import tempfile
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 from snowflake.snowpark import Session
 import pandas as pd
 
+from .session_pool import SessionPool, get_session_pool
+from .storage import create_session_factory
+
 logging.getLogger("snowflake.connector").setLevel(logging.WARNING)
 
 logging.basicConfig(
@@ -18,10 +27,38 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Tables uploaded at the same time by write_tables, each one holds a session from the pool while it uploads
+DEFAULT_MAX_WORKERS = 4
+
+# Rows per parquet file when tables share a stage upload
+DEFAULT_CHUNK_ROWS = 100_000
+
+# Created once in the stage's schema so COPY INTO reads parquet dates and timestamps as dates and timestamps
+STAGE_FILE_FORMAT_NAME = "ELT_PARQUET_FORMAT"
+
+
+@lru_cache(maxsize=None)
+def read_config(config_file_path: str) -> dict:
+    """Reads the config file that contains our credentials, only the first call for a path touches the disk"""
+    with open(config_file_path, "r") as config_file:
+        return json.load(config_file)
+
+
+def create_session() -> Session:
+    """Opens a new session with the credentials in config.json, used by the shared session pool. A config with
+    "backend": "duckdb" opens a local DuckDB session instead, see storage.py
+    """
+    config_file_path = os.path.join(os.getcwd(), "config.json")
+
+    return create_session_factory(dict(read_config(config_file_path)))()
+
 
 class SnowflakeDfWriter:
-    def __init__(self):
-        self.builder_object = self.build_session()
+    def __init__(self, pool: SessionPool = None):
+        """
+        :param pool: sessions to write with, defaults to the pool shared by the whole process
+        """
+        self.pool = pool if pool is not None else get_session_pool(create_session)
 
     def open_config(self):
         """Opens the config file that contains our credentials."""
@@ -29,11 +66,8 @@ class SnowflakeDfWriter:
 
         config_file_path = os.path.join(current_directory, "config.json")
 
-        # Open and read the json file
-        with open(config_file_path, "r") as config_file:
-            config_data = json.load(config_file)
-
-        return config_data
+        # Copied so callers can change it without changing the cached config
+        return dict(read_config(config_file_path))
 
     def build_session(self, add_args: dict = {}) -> Session.SessionBuilder:
         """Builds and returns a session builder object to connect to snowflake
@@ -59,25 +93,29 @@ class SnowflakeDfWriter:
         df: pd.DataFrame,
         fully_qualified_table_name: str,
         overwrite: bool = False,
+        auto_create_table: bool = False,
     ):
         """Given a dataframe and location, this function will write the table to snowflake
 
         :param df: a pandas dataframe
         :param fully_qualified_table_name: the location to write the table. Must be in format database.schema.table_name
         :param overwrite: If this is True it will truncate and load the data. If False it will append the data.
+        :param auto_create_table: If this is True the table is created from the dataframe's column types. Combined
+                                  with overwrite the table is replaced so it picks up new column types.
         """
         database, schema, table = fully_qualified_table_name.split(".")
 
-        with self.builder_object.create() as session:
+        with self.pool.session() as session:
             result = session.write_pandas(
                 df,
                 table_name=table,
                 database=database,
                 schema=schema,
                 parallel=4,
-                auto_create_table=False,
+                auto_create_table=auto_create_table,
                 overwrite=overwrite,
                 table_type="",
+                use_logical_type=True,
             )
 
             table_name = result.table_name
@@ -86,77 +124,451 @@ class SnowflakeDfWriter:
 
         return None
 
+    def write_tables(
+        self,
+        tables: dict,
+        overwrite: bool = False,
+        auto_create_table: bool = False,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        stage: str = None,
+    ) -> dict:
+        """Writes many dataframes at once, each table is uploaded in its own thread with a session from the pool.
+        A table that fails does not stop the others, its error is returned with the results.
+
+        With a stage every dataframe is first written to compressed parquet files in one local folder and all of
+        them go up in a single PUT. Each table is then loaded from its own files with COPY INTO, so the uploads
+        share one transfer instead of write_pandas staging every table on its own.
+
+        :param tables: fully qualified table name -> dataframe. Example: {"STORAGE_DATABASE.CPW_DATA.Trout: Brook": df}
+        :param overwrite: If this is True every table is truncated before it is loaded
+        :param auto_create_table: If this is True every table is created from its dataframe's column types
+        :param max_workers: number of tables loaded at the same time
+        :param stage: optional fully qualified stage name to share. Example: STORAGE_DATABASE.CPW_DATA.TEST_STAGE
+
+        :return: fully qualified table name -> {"rows": rows written, "seconds": time taken, "error": None or exception}
+        """
+        if not tables:
+            return {}
+
+        start = time.perf_counter()
+
+        with tempfile.TemporaryDirectory() as local_directory:
+            if stage is not None:
+                stage_path = self._put_tables_in_stage(tables, stage, local_directory)
+
+            with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+                if stage is None:
+                    futures = {
+                        fully_qualified_table_name: executor.submit(
+                            self._timed_load,
+                            self._write_pandas,
+                            df,
+                            fully_qualified_table_name,
+                            overwrite,
+                            auto_create_table,
+                        )
+                        for fully_qualified_table_name, df in tables.items()
+                    }
+                else:
+                    futures = {
+                        fully_qualified_table_name: executor.submit(
+                            self._timed_load,
+                            self._copy_into_table,
+                            stage_path,
+                            f"table_{i}_",
+                            fully_qualified_table_name,
+                            overwrite,
+                            auto_create_table,
+                        )
+                        for i, fully_qualified_table_name in enumerate(tables)
+                    }
+
+                results = {
+                    fully_qualified_table_name: future.result()
+                    for fully_qualified_table_name, future in futures.items()
+                }
+
+            if stage is not None:
+                with self.pool.session() as session:
+                    session.sql(f"REMOVE {stage_path}").collect()
+
+        for fully_qualified_table_name, result in results.items():
+            if result["error"] is None:
+                logger.info(
+                    f"Wrote {result['rows']} rows to {fully_qualified_table_name} in {result['seconds']:.1f}s"
+                )
+            else:
+                logger.error(
+                    f"Failed to write {fully_qualified_table_name} after {result['seconds']:.1f}s: {result['error']}"
+                )
+
+        logger.info(
+            f"Wrote {sum(result['rows'] for result in results.values())} rows to {len(tables)} tables "
+            f"in {time.perf_counter() - start:.1f}s"
+        )
+
+        return results
 
-def combine_trout_tables(session):
-    """Once all the data is in Snowflake all of it will be combined into one table. This process will create
-    a new table to store all the data, add a main species column do note the primary species for each row, and insert
-    the data from each species table.
-    """
-    infomation_schema_df = session.sql(
+    def _timed_load(self, load_function, *args) -> dict:
+        """Runs load_function(session, *args) with a session from the pool and times it, errors are returned
+        instead of raised
         """
-    SELECT
-        TABLE_NAME
-    FROM storage_database.information_schema.TABLES
-    WHERE
-        TABLE_NAME like 'Trout%' 
-        AND TABLE_SCHEMA = 'CPW_DATA'
-    """
-    ).to_pandas()
+        start = time.perf_counter()
 
-    # Find all the column names we will encounter and their datatype
-    ddl_dict = {"Main Species": "VARCHAR(250)"}
-    tables_dict = {}
-    for table in infomation_schema_df.TABLE_NAME.to_list():
-        desc_table_query = session.sql(
-            f'DESC TABLE STORAGE_DATABASE.CPW_DATA."{table}"'
+        try:
+            with self.pool.session() as session:
+                rows = load_function(session, *args)
+
+            error = None
+        except Exception as e:
+            rows, error = 0, e
+
+        return {"rows": rows, "seconds": time.perf_counter() - start, "error": error}
+
+    def _write_pandas(
+        self,
+        session,
+        df: pd.DataFrame,
+        fully_qualified_table_name: str,
+        overwrite: bool,
+        auto_create_table: bool,
+    ) -> int:
+        database, schema, table = fully_qualified_table_name.split(".")
+
+        session.write_pandas(
+            df,
+            table_name=table,
+            database=database,
+            schema=schema,
+            parallel=4,
+            auto_create_table=auto_create_table,
+            overwrite=overwrite,
+            table_type="",
+            use_logical_type=True,
+        )
+
+        return len(df)
+
+    def _put_tables_in_stage(
+        self, tables: dict, stage: str, local_directory: str
+    ) -> str:
+        """Writes every dataframe to parquet files named table_<n>_<chunk>.parquet and uploads all of them with
+        one PUT.
+
+        :return: the stage folder the files were put in. Example: @STORAGE_DATABASE.CPW_DATA.TEST_STAGE/elt_3f9a.../
+        """
+        for i, df in enumerate(tables.values()):
+            for chunk_number, chunk_start in enumerate(
+                range(0, max(len(df), 1), DEFAULT_CHUNK_ROWS)
+            ):
+                df.iloc[chunk_start : chunk_start + DEFAULT_CHUNK_ROWS].to_parquet(
+                    os.path.join(local_directory, f"table_{i}_{chunk_number}.parquet"),
+                    compression="snappy",
+                    index=False,
+                )
+
+        stage_path = f"@{stage}/elt_{uuid.uuid4().hex}/"
+
+        with self.pool.session() as session:
+            database, schema, _ = stage.split(".")
+
+            session.sql(
+                f"CREATE FILE FORMAT IF NOT EXISTS {database}.{schema}.{STAGE_FILE_FORMAT_NAME} "
+                "TYPE = PARQUET USE_LOGICAL_TYPE = TRUE"
+            ).collect()
+
+            put_results = session.file.put(
+                os.path.join(local_directory, "*.parquet"),
+                stage_path,
+                parallel=8,
+                auto_compress=False,
+                overwrite=True,
+            )
+
+        logger.info(f"Put {len(put_results)} parquet files in {stage_path}")
+
+        return stage_path
+
+    def _copy_into_table(
+        self,
+        session,
+        stage_path: str,
+        file_prefix: str,
+        fully_qualified_table_name: str,
+        overwrite: bool,
+        auto_create_table: bool,
+    ) -> int:
+        """Loads one table from its parquet files in the stage.
+
+        :return: number of rows loaded
+        """
+        database, schema, table = fully_qualified_table_name.split(".")
+
+        file_format = f"{database}.{schema}.{STAGE_FILE_FORMAT_NAME}"
+
+        table_name = f'{database}.{schema}."{table}"'
+
+        if auto_create_table:
+            session.sql(
+                f"""
+            CREATE {"OR REPLACE" if overwrite else ""} TABLE {"" if overwrite else "IF NOT EXISTS"} {table_name}
+            USING TEMPLATE (
+                SELECT ARRAY_AGG(OBJECT_CONSTRUCT(*)) WITHIN GROUP (ORDER BY ORDER_ID)
+                FROM TABLE(
+                    INFER_SCHEMA(
+                        LOCATION => '{stage_path}',
+                        FILE_FORMAT => '{file_format}',
+                        FILES => '{file_prefix}0.parquet'
+                    )
+                )
+            )
+            """
+            ).collect()
+        elif overwrite:
+            session.sql(f"TRUNCATE TABLE {table_name}").collect()
+
+        copy_results = session.sql(
+            f"""
+        COPY INTO {table_name}
+        FROM '{stage_path}'
+        PATTERN = '.*{file_prefix}[0-9]+[.]parquet'
+        FILE_FORMAT = (FORMAT_NAME = '{file_format}')
+        MATCH_BY_COLUMN_NAME = CASE_SENSITIVE
+        """
         ).collect()
 
-        desc_table_df = pd.DataFrame(desc_table_query)
+        # A copy that found no files returns a single status row without rows_loaded
+        return sum(row.as_dict().get("rows_loaded", 0) for row in copy_results)
 
-        tables_dict[table] = desc_table_df
+    def write_upsert(
+        self,
+        df: pd.DataFrame,
+        fully_qualified_table_name: str,
+        key_columns: list,
+        column_map: dict = None,
+    ) -> dict:
+        """Inserts rows that are not in the table yet and updates the ones that are, so writing the same data
+        twice does not add duplicates. The batch is loaded into a temporary table and merged on the key columns,
+        duplicate keys within the batch are only merged once.
+
+        :param df: rows to write
+        :param fully_qualified_table_name: the location to write the table. Must be in format database.schema.table_name
+        :param key_columns: table columns that identify a row. Example: ["angler", "species", "length", "location", "date"]
+        :param column_map: optional dataframe column -> table column, for tables whose names differ from the dataframe
 
-        for row in desc_table_df.itertuples():
-            ddl_dict[row.name] = row.type
+        :return: {"inserted": rows inserted, "updated": rows updated}
+        """
+        if column_map:
+            df = df.rename(columns=column_map)
 
-    # Create the table for all data
-    name_and_dtype = [
-        f'"{column}" {data_type}' for column, data_type in ddl_dict.items() if column
-    ]
+        if not len(df):
+            return {"inserted": 0, "updated": 0}
 
-    name_and_dtype_with_syntax = ",\n\t".join(name_and_dtype)
+        database, schema, table = fully_qualified_table_name.split(".")
 
-    create_statement = f"""
-    create or replace table STORAGE_DATABASE.CPW_DATA.ALL_SPECIES (
-        {name_and_dtype_with_syntax}
-    )
-    """
+        batch_table = f"{table}_UPSERT_BATCH"
 
-    creation_result = session.sql(create_statement).collect()
+        value_columns = [column for column in df.columns if column not in key_columns]
 
-    logger.info(f"Result for creating species data: {creation_result[0]}")
+        key_condition = " AND ".join(
+            f'EQUAL_NULL(target."{column}", batch."{column}")' for column in key_columns
+        )
+
+        partition_columns = ", ".join(f'"{column}"' for column in key_columns)
 
-    # Start inserting all the data and populate the Main Species column
-    for table_name, table_df in tables_dict.items():
-        table_df["name_with_quotes"] = '"' + table_df.name + '"'
+        insert_columns = ", ".join(f'"{column}"' for column in df.columns)
 
-        table_columns = table_df.loc[
-            table_df.name.str.len() > 0
-        ].name_with_quotes.to_list()
+        insert_values = ", ".join(f'batch."{column}"' for column in df.columns)
 
-        table_columns_with_syntax = ",\n\t".join(table_columns)
+        update_clause = ""
+        if value_columns:
+            changed_condition = " OR ".join(
+                f'NOT EQUAL_NULL(target."{column}", batch."{column}")'
+                for column in value_columns
+            )
+
+            update_columns = ", ".join(
+                f'"{column}" = batch."{column}"' for column in value_columns
+            )
+
+            update_clause = f"WHEN MATCHED AND ({changed_condition}) THEN UPDATE SET {update_columns}"
+
+        with self.pool.session() as session:
+            session.write_pandas(
+                df,
+                table_name=batch_table,
+                database=database,
+                schema=schema,
+                auto_create_table=True,
+                overwrite=True,
+                table_type="temporary",
+                use_logical_type=True,
+            )
 
-        insert_statement = f"""
-        INSERT INTO STORAGE_DATABASE.CPW_DATA.ALL_SPECIES (
-            "Main Species",
-            {table_columns_with_syntax}
+            merge_result = session.sql(
+                f"""
+            MERGE INTO {database}.{schema}."{table}" AS target
+            USING (
+                SELECT *
+                FROM {database}.{schema}."{batch_table}"
+                QUALIFY ROW_NUMBER() OVER (PARTITION BY {partition_columns} ORDER BY {partition_columns}) = 1
+            ) AS batch
+            ON {key_condition}
+            {update_clause}
+            WHEN NOT MATCHED THEN INSERT ({insert_columns}) VALUES ({insert_values})
+            """
+            ).collect()
+
+        # Snowflake leaves out the updated count when the merge has no update clause
+        counts = {
+            "inserted": merge_result[0][0],
+            "updated": merge_result[0][1] if update_clause else 0,
+        }
+
+        logger.info(
+            f"Merged {len(df)} rows into {table}: {counts['inserted']} inserted, {counts['updated']} updated"
         )
 
+        return counts
+
+    def write_delta(
+        self,
+        added_df: pd.DataFrame,
+        removed_df: pd.DataFrame,
+        fully_qualified_table_name: str,
+        key_columns: list,
+    ):
+        """Applies only what changed since the last upload instead of rewriting the whole table. Removed rows
+        are matched on the key columns and deleted, then the added rows are appended.
+
+        :param added_df: rows to append
+        :param removed_df: rows to delete, only the key columns are used
+        :param fully_qualified_table_name: the location to write the table. Must be in format database.schema.table_name
+        :param key_columns: columns that identify a row. Example: ["Water", "Latitude", "Longitude"]
+        """
+        database, schema, table = fully_qualified_table_name.split(".")
+
+        with self.pool.session() as session:
+            if len(removed_df):
+                removed_table = f"{table}_REMOVED_ROWS"
+
+                session.write_pandas(
+                    removed_df[key_columns],
+                    table_name=removed_table,
+                    database=database,
+                    schema=schema,
+                    auto_create_table=True,
+                    overwrite=True,
+                    table_type="temporary",
+                )
+
+                key_condition = " AND ".join(
+                    f'target."{column}" = removed."{column}"' for column in key_columns
+                )
+
+                delete_result = session.sql(
+                    f"""
+                DELETE FROM {database}.{schema}."{table}" AS target
+                USING {database}.{schema}."{removed_table}" AS removed
+                WHERE {key_condition}
+                """
+                ).collect()
+
+                logger.info(f"Deleted {delete_result[0][0]} rows from {table}")
+
+            if len(added_df):
+                session.write_pandas(
+                    added_df,
+                    table_name=table,
+                    database=database,
+                    schema=schema,
+                    parallel=4,
+                    auto_create_table=False,
+                    overwrite=False,
+                    table_type="",
+                    use_logical_type=True,
+                )
+
+                logger.info(f"Appended {len(added_df)} rows to {table}")
+
+        return None
+
+
+def combine_trout_tables(session):
+    """Once all the data is in Snowflake all of it will be combined into one table. This process will create
+    a new table to store all the data, add a main species column do note the primary species for each row, and insert
+    the data from each species table. The table is created and filled by one CREATE TABLE AS statement so it is
+    replaced all at once.
+    """
+    columns_df = session.sql(
+        """
+    SELECT
+        TABLE_NAME,
+        COLUMN_NAME,
+        DATA_TYPE
+    FROM storage_database.information_schema.COLUMNS
+    WHERE
+        TABLE_NAME like 'Trout%'
+        AND TABLE_SCHEMA = 'CPW_DATA'
+    ORDER BY TABLE_NAME, ORDINAL_POSITION
+    """
+    ).to_pandas()
+
+    if columns_df.empty:
+        logger.warning("No Trout tables were found, ALL_SPECIES was left as is")
+
+        return None
+
+    # Find all the column names we will encounter and their datatype
+    ddl_dict = {}
+    for row in columns_df.itertuples():
+        ddl_dict.setdefault(row.COLUMN_NAME, row.DATA_TYPE)
+
+    # Tables missing one of the columns fill it with nulls so every select lines up
+    selects = []
+    for table_name, table_df in columns_df.groupby("TABLE_NAME", sort=True):
+        table_columns = set(table_df.COLUMN_NAME)
+
+        select_columns = ",\n\t".join(
+            [f"'{table_name.replace('Trout: ', '')}' as \"Main Species\""]
+            + [
+                (
+                    f'"{column}"'
+                    if column in table_columns
+                    else f'CAST(NULL AS {data_type}) as "{column}"'
+                )
+                for column, data_type in ddl_dict.items()
+            ]
+        )
+
+        selects.append(
+            f"""
         select
-            '{table_name.replace("Trout: ", "")}' as "Main Species",
-            {table_columns_with_syntax}
+            {select_columns}
         FROM STORAGE_DATABASE.CPW_DATA."{table_name}"
         """
+        )
+
+    union_of_selects = "UNION ALL".join(selects)
 
-        table_insert_result = session.sql(insert_statement).collect()
+    creation_result = session.sql(
+        f"""
+    create or replace table STORAGE_DATABASE.CPW_DATA.ALL_SPECIES as
+    {union_of_selects}
+    """
+    ).collect()
+
+    logger.info(f"Result for creating species data: {creation_result[0]}")
+
+    species_counts = session.sql(
+        """
+    SELECT
+        "Main Species",
+        COUNT(*)
+    FROM STORAGE_DATABASE.CPW_DATA.ALL_SPECIES
+    GROUP BY "Main Species"
+    """
+    ).collect()
 
-        logger.info(f"Wrote {table_insert_result[0][0]} rows from table: {table_name}")
+    for main_species, row_count in species_counts:
+        logger.info(f"Wrote {row_count} rows from table: Trout: {main_species}")
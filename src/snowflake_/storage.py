@@ -0,0 +1,565 @@
+""" The pipeline only needs a small part of snowflake.snowpark.Session, so anything that offers the same methods can
+stand in for it. SnowflakeDfWriter, combine_trout_data and trout_pattern_match are written against this subset
+
+    session.sql(query).collect()            -> list of rows, rows can be read by position, name or attribute
+    session.sql(query).to_pandas()          -> pandas dataframe
+    session.sql(query).to_arrow()           -> pyarrow table
+    session.sql(query).to_pandas_batches()  -> generator of pandas dataframes
+    session.write_pandas(df, table_name, database=..., schema=..., auto_create_table=..., overwrite=..., table_type=...)
+    session.file.put(local_files, "@DATABASE.SCHEMA.STAGE/folder/")
+    session.close()
+
+DuckDBStorage is a local backend with that interface. Each database is attached under the same name it has in
+Snowflake, so fully qualified names like STORAGE_DATABASE.CPW_DATA."Trout: Brook" work unchanged. The handful of
+Snowflake only statements the pipeline sends are translated before they run. Stages are folders on disk, so files put
+in a stage can be loaded with COPY INTO. That way the whole ELT can be run and benchmarked without a Snowflake account.
+
+    storage = DuckDBStorage("fishing.duckdb")
+
+    with storage.session() as session:
+        session.sql("select 1").collect()
+
+Pick the backend in config.json with "backend": "duckdb" and an optional "database_path", see create_session_factory.
+"""
+
+import os
+import re
+import sys
+import glob
+import shutil
+import logging
+import tempfile
+import threading
+from typing import Protocol
+
+import duckdb
+import pandas as pd
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(filename)s] [%(funcName)20s()] [%(levelname)s] - %(message)s",
+    stream=sys.stdout,
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_DATABASES = {"STORAGE_DATABASE": ["CPW_DATA"]}
+
+# Rows per dataframe from to_pandas_batches
+DEFAULT_BATCH_ROWS = 100_000
+
+_INFORMATION_SCHEMA_PATTERN = re.compile(r"\b\w+\.information_schema\.", re.IGNORECASE)
+
+_DESC_TABLE_PATTERN = re.compile(r"^\s*DESC(?:RIBE)?\s+TABLE\s+", re.IGNORECASE)
+
+_NUMBER_PATTERN = re.compile(r"\bNUMBER\s*\(", re.IGNORECASE)
+
+# master_angler_award_id NUMBER(38,0) autoincrement start 0 increment by 1
+_AUTOINCREMENT_PATTERN = re.compile(
+    r'("[^"]+"|\w+)\s+NUMERIC\s*\(\s*38\s*,\s*0\s*\)\s+autoincrement\s+start\s+(\d+)\s+increment\s+by\s+(\d+)',
+    re.IGNORECASE,
+)
+
+_CREATE_TABLE_PATTERN = re.compile(
+    r"create\s+(?:or\s+replace\s+)?(?:temp\w*\s+)?table\s+(?:if\s+not\s+exists\s+)?(\w+)\.(\w+)\.(\"[^\"]+\"|\w+)",
+    re.IGNORECASE,
+)
+
+_SWAP_PATTERN = re.compile(
+    r"^\s*ALTER\s+TABLE\s+(\w+)\.(\w+)\.(\"[^\"]+\"|\w+)\s+SWAP\s+WITH\s+(?:\w+\.\w+\.)?(\"[^\"]+\"|\w+)\s*;?\s*$",
+    re.IGNORECASE,
+)
+
+_LIKE_PATTERN = re.compile(
+    r"^\s*CREATE\s+(?:OR\s+REPLACE\s+)?TABLE\s+(\w+\.\w+\.(?:\"[^\"]+\"|\w+))\s+LIKE\s+(\w+)\.(\w+)\.(\"[^\"]+\"|\w+)\s*;?\s*$",
+    re.IGNORECASE,
+)
+
+# CREATE TABLE CPW_DATA.ALL_SPECIES(... as DuckDB stores it in duckdb_tables()
+_STORED_TABLE_NAME_PATTERN = re.compile(
+    r'^CREATE TABLE (?:"[^"]*"|\w+)\.(?:"[^"]*"|\w+)'
+)
+
+_FILE_FORMAT_PATTERN = re.compile(
+    r"^\s*CREATE\s+(?:OR\s+REPLACE\s+)?FILE\s+FORMAT\s", re.IGNORECASE
+)
+
+# CREATE TABLE ... USING TEMPLATE (... INFER_SCHEMA(LOCATION => '@stage/folder/', ..., FILES => 'file.parquet'))
+_USING_TEMPLATE_PATTERN = re.compile(
+    r"^\s*(CREATE\s+(?:OR\s+REPLACE\s+)?TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?\w+\.\w+\.(?:\"[^\"]+\"|\w+))\s+USING\s+TEMPLATE\b"
+    r".*?LOCATION\s*=>\s*'([^']+)'.*?FILES\s*=>\s*'([^']+)'",
+    re.IGNORECASE | re.DOTALL,
+)
+
+_COPY_INTO_PATTERN = re.compile(
+    r"^\s*COPY\s+INTO\s+(\w+\.\w+\.(?:\"[^\"]+\"|\w+))\s+FROM\s+'([^']+)'\s+PATTERN\s*=\s*'([^']+)'",
+    re.IGNORECASE,
+)
+
+_REMOVE_PATTERN = re.compile(r"^\s*REMOVE\s+'?(@[^'\s;]+)'?\s*;?\s*$", re.IGNORECASE)
+
+_MERGE_TARGET_PATTERN = re.compile(
+    r"^\s*MERGE\s+INTO\s+(\w+\.\w+\.(?:\"[^\"]+\"|\w+))", re.IGNORECASE
+)
+
+
+class StorageResult(Protocol):
+    def collect(self) -> list: ...
+
+    def to_pandas(self) -> pd.DataFrame: ...
+
+
+class StorageSession(Protocol):
+    """The part of snowflake.snowpark.Session the pipeline uses"""
+
+    def sql(self, query: str) -> StorageResult: ...
+
+    def write_pandas(self, df: pd.DataFrame, table_name: str, **kwargs): ...
+
+    def close(self) -> None: ...
+
+
+class LocalRow(tuple):
+    """A result row that can be read like a snowpark Row: row[0], row["name"], row.name or row.as_dict()"""
+
+    def __new__(cls, values, fields):
+        row = super().__new__(cls, values)
+        row._fields = tuple(fields)
+        return row
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return tuple.__getitem__(self, self._fields.index(key))
+
+        return tuple.__getitem__(self, key)
+
+    def __getattr__(self, name):
+        try:
+            return tuple.__getitem__(self, self._fields.index(name))
+        except ValueError:
+            raise AttributeError(name) from None
+
+    def as_dict(self) -> dict:
+        return dict(zip(self._fields, self))
+
+
+class LocalResult:
+    """Lazy result of LocalSession.sql, the query runs when one of the methods is called like in snowpark"""
+
+    def __init__(self, session, query: str):
+        self.session = session
+        self.query = query
+
+    def collect(self) -> list:
+        relation = self.session.execute(self.query)
+
+        if relation.description is None:
+            return []
+
+        fields = [column[0] for column in relation.description]
+
+        return [LocalRow(values, fields) for values in relation.fetchall()]
+
+    def to_pandas(self) -> pd.DataFrame:
+        return self.session.execute(self.query).df()
+
+    def to_arrow(self):
+        return self.session.execute(self.query).to_arrow_table()
+
+    def to_pandas_batches(self, batch_rows: int = DEFAULT_BATCH_ROWS):
+        reader = self.session.execute(self.query).to_arrow_reader(batch_rows)
+
+        for batch in reader:
+            yield batch.to_pandas()
+
+
+class LocalWriteResult:
+    def __init__(self, table_name: str):
+        self.table_name = table_name
+
+
+class LocalFileOperation:
+    """session.file of a DuckDBSession, files are put in the stage's folder"""
+
+    def __init__(self, session):
+        self.session = session
+
+    def put(
+        self,
+        local_file_name: str,
+        stage_location: str,
+        overwrite: bool = False,
+        **kwargs,
+    ) -> list:
+        """Copies local files into a stage the way snowpark's file.put uploads them. Arguments that only matter to
+        Snowflake such as parallel or auto_compress are ignored.
+
+        :param local_file_name: path of the files, may be a glob. Example: /tmp/elt/*.parquet
+        :param stage_location: stage and folder to put them in. Example: @STORAGE_DATABASE.CPW_DATA.TEST_STAGE/elt/
+        """
+        stage_folder = self.session.stage_folder(stage_location)
+
+        os.makedirs(stage_folder, exist_ok=True)
+
+        put_results = []
+
+        for local_file in sorted(glob.glob(local_file_name)):
+            file_name = os.path.basename(local_file)
+
+            if overwrite or not os.path.exists(os.path.join(stage_folder, file_name)):
+                shutil.copyfile(local_file, os.path.join(stage_folder, file_name))
+                status = "UPLOADED"
+            else:
+                status = "SKIPPED"
+
+            put_results.append(
+                LocalRow((file_name, file_name, status), ("source", "target", "status"))
+            )
+
+        return put_results
+
+
+class DuckDBSession:
+    """A snowpark like session on a DuckDB connection, see the module docstring for what it supports"""
+
+    def __init__(self, connection, lock: threading.Lock, stage_directory: str):
+        """
+        :param connection: a cursor of the DuckDBStorage connection, every session of a storage sees the same data
+        :param lock: DuckDB connections are not safe to use from several threads, statements of a session are run one
+                     at a time
+        :param stage_directory: folder that holds a folder for every stage of the storage
+        """
+        self.connection = connection
+        self.lock = lock
+        self.stage_directory = stage_directory
+        self.temporary_tables = []
+        self.file = LocalFileOperation(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def stage_folder(self, stage_path: str) -> str:
+        """Local folder of a stage path. Example: @STORAGE_DATABASE.CPW_DATA.TEST_STAGE/elt/ is the elt folder in the
+        STORAGE_DATABASE.CPW_DATA.TEST_STAGE folder of the storage's stage directory
+        """
+        stage, _, folder = stage_path.lstrip("@").partition("/")
+
+        return os.path.join(self.stage_directory, stage.upper(), *folder.split("/"))
+
+    def translate(self, query: str) -> list:
+        """Rewrites the Snowflake only syntax the pipeline uses into DuckDB statements.
+
+        :return: list of statements to run, the result of the last one is the result of the query
+        """
+        swap = _SWAP_PATTERN.match(query)
+
+        if swap:
+            database, schema, table, other_table = swap.groups()
+
+            swap_table = f'"{table.strip(chr(34))}_SWAP_TEMP"'
+
+            # Renamed tables stay in their schema so only the first one is qualified
+            return [
+                f"ALTER TABLE {database}.{schema}.{table} RENAME TO {swap_table}",
+                f"ALTER TABLE {database}.{schema}.{other_table} RENAME TO {table}",
+                f"ALTER TABLE {database}.{schema}.{swap_table} RENAME TO {other_table}",
+            ]
+
+        like = _LIKE_PATTERN.match(query)
+
+        if like:
+            new_table, database, schema, table = like.groups()
+
+            # Copy the definition of the table, column defaults such as autoincrement included
+            table_ddl = self.connection.execute(
+                "SELECT sql FROM duckdb_tables() WHERE database_name = ? AND schema_name = ? AND table_name = ?",
+                [database, schema, table.strip(chr(34))],
+            ).fetchone()[0]
+
+            return [
+                _STORED_TABLE_NAME_PATTERN.sub(
+                    lambda match: f"CREATE OR REPLACE TABLE {new_table}", table_ddl
+                )
+            ]
+
+        if _FILE_FORMAT_PATTERN.match(query):
+            # Parquet files are read with their own types, there is nothing to create
+            return ["SELECT 'File format successfully created.' AS status"]
+
+        using_template = _USING_TEMPLATE_PATTERN.match(query)
+
+        if using_template:
+            create_table, stage_path, file_name = using_template.groups()
+
+            parquet_file = os.path.join(self.stage_folder(stage_path), file_name)
+
+            return [
+                f"{create_table} AS SELECT * FROM read_parquet('{parquet_file}') LIMIT 0"
+            ]
+
+        copy_into = _COPY_INTO_PATTERN.match(query)
+
+        if copy_into:
+            table, stage_path, pattern = copy_into.groups()
+
+            stage_folder = self.stage_folder(stage_path)
+
+            parquet_files = (
+                [
+                    os.path.join(stage_folder, file_name)
+                    for file_name in sorted(os.listdir(stage_folder))
+                    if re.fullmatch(pattern, file_name)
+                ]
+                if os.path.isdir(stage_folder)
+                else []
+            )
+
+            # Like Snowflake, a copy without files returns a single status row
+            if not parquet_files:
+                return ["SELECT 'Copy executed with 0 files processed.' AS status"]
+
+            files = ", ".join(f"'{parquet_file}'" for parquet_file in parquet_files)
+
+            return [
+                f"INSERT INTO {table} BY NAME SELECT * FROM read_parquet([{files}])",
+                f"SELECT filename AS file, 'LOADED' AS status, COUNT(*) AS rows_loaded "
+                f"FROM read_parquet([{files}], filename = true) GROUP BY filename ORDER BY filename",
+            ]
+
+        query = _INFORMATION_SCHEMA_PATTERN.sub("information_schema.", query)
+
+        query = _DESC_TABLE_PATTERN.sub("DESCRIBE ", query)
+
+        query = _NUMBER_PATTERN.sub("NUMERIC(", query)
+
+        statements = []
+
+        autoincrement = _AUTOINCREMENT_PATTERN.search(query)
+
+        if autoincrement:
+            database, schema, table = _CREATE_TABLE_PATTERN.search(query).groups()
+
+            column, start, increment = autoincrement.groups()
+
+            sequence = f'{database}.{schema}."{table.strip(chr(34))}_{column.strip(chr(34))}_seq"'
+
+            statements.append(
+                f"CREATE SEQUENCE IF NOT EXISTS {sequence} START {start} INCREMENT BY {increment} MINVALUE {start}"
+            )
+
+            query = _AUTOINCREMENT_PATTERN.sub(
+                lambda match: f"{match.group(1)} BIGINT DEFAULT nextval('{sequence}')",
+                query,
+            )
+
+        # Snowflake allows a trailing comma at the end of a column list
+        query = re.sub(r",\s*\)\s*;?\s*$", "\n)", query)
+
+        return statements + [query]
+
+    def execute(self, query: str):
+        """Runs a query and returns the DuckDB relation of its last statement"""
+        with self.lock:
+            remove = _REMOVE_PATTERN.match(query)
+
+            if remove:
+                return self._remove_stage_files(remove.group(1))
+
+            statements = self.translate(query)
+
+            merge_target = _MERGE_TARGET_PATTERN.match(statements[-1])
+
+            for statement in statements[:-1]:
+                self.connection.execute(statement)
+
+            if merge_target:
+                return self._execute_merge(statements[-1], merge_target.group(1))
+
+            relation = self.connection.execute(statements[-1])
+
+            if "information_schema." in statements[-1]:
+                # Snowflake returns unquoted names in upper case
+                relation = self.connection.from_df(relation.df()).project(
+                    ", ".join(
+                        f'"{column[0]}" AS "{column[0].upper()}"'
+                        for column in relation.description
+                    )
+                )
+
+            return relation
+
+    def _execute_merge(self, statement: str, target_table: str):
+        """Snowflake reports merges as (number of rows inserted, number of rows updated), DuckDB only gives the
+        total so the inserts are counted from the table size.
+        """
+        rows_before = self.connection.execute(
+            f"SELECT COUNT(*) FROM {target_table}"
+        ).fetchone()[0]
+
+        rows_merged = self.connection.execute(statement).fetchone()[0]
+
+        rows_after = self.connection.execute(
+            f"SELECT COUNT(*) FROM {target_table}"
+        ).fetchone()[0]
+
+        inserted = rows_after - rows_before
+
+        return self.connection.execute(
+            f'SELECT {inserted} AS "number of rows inserted", {rows_merged - inserted} AS "number of rows updated"'
+        )
+
+    def _remove_stage_files(self, stage_path: str):
+        """Deletes the files in a stage folder, returns the names of the removed files like REMOVE does"""
+        stage_folder = self.stage_folder(stage_path)
+
+        removed_files = (
+            sorted(os.listdir(stage_folder)) if os.path.isdir(stage_folder) else []
+        )
+
+        shutil.rmtree(stage_folder, ignore_errors=True)
+
+        return self.connection.execute(
+            "SELECT UNNEST(?::VARCHAR[]) AS name, 'removed' AS result", [removed_files]
+        )
+
+    def sql(self, query: str) -> LocalResult:
+        return LocalResult(self, query)
+
+    def write_pandas(
+        self,
+        df: pd.DataFrame,
+        table_name: str,
+        database: str = None,
+        schema: str = None,
+        auto_create_table: bool = False,
+        overwrite: bool = False,
+        table_type: str = "",
+        **kwargs,
+    ) -> LocalWriteResult:
+        """Bulk loads a dataframe the way snowpark's write_pandas does. Columns are matched by name, arguments
+        that only matter to Snowflake such as parallel or use_logical_type are ignored.
+        """
+        qualified_table = f'{database}.{schema}."{table_name}"'
+
+        # Categories would become enums, appending a batch with other categories would then fail
+        df = df.astype(
+            {
+                column: "object"
+                for column, dtype in df.dtypes.items()
+                if isinstance(dtype, pd.CategoricalDtype)
+            }
+        )
+
+        with self.lock:
+            self.connection.register("write_pandas_df", df)
+
+            try:
+                if auto_create_table and overwrite:
+                    self.connection.execute(
+                        f"CREATE OR REPLACE TABLE {qualified_table} AS SELECT * FROM write_pandas_df"
+                    )
+                elif auto_create_table:
+                    self.connection.execute(
+                        f"CREATE TABLE IF NOT EXISTS {qualified_table} AS SELECT * FROM write_pandas_df LIMIT 0"
+                    )
+                    self.connection.execute(
+                        f"INSERT INTO {qualified_table} BY NAME SELECT * FROM write_pandas_df"
+                    )
+                else:
+                    if overwrite:
+                        self.connection.execute(f"DELETE FROM {qualified_table}")
+
+                    self.connection.execute(
+                        f"INSERT INTO {qualified_table} BY NAME SELECT * FROM write_pandas_df"
+                    )
+            finally:
+                self.connection.unregister("write_pandas_df")
+
+        # DuckDB temporary tables can not live in an attached database, drop them with the session instead
+        if table_type in ("temp", "temporary") and qualified_table not in (
+            self.temporary_tables
+        ):
+            self.temporary_tables.append(qualified_table)
+
+        return LocalWriteResult(table_name)
+
+    def close(self) -> None:
+        with self.lock:
+            for qualified_table in self.temporary_tables:
+                self.connection.execute(f"DROP TABLE IF EXISTS {qualified_table}")
+
+            self.temporary_tables = []
+
+            self.connection.close()
+
+
+class DuckDBStorage:
+    def __init__(
+        self, database_path: str = ":memory:", databases: dict = DEFAULT_DATABASES
+    ):
+        """
+        :param database_path: DuckDB file that every database is stored in, ":memory:" keeps it in memory
+        :param databases: database name -> schema names to create. Example: {"STORAGE_DATABASE": ["CPW_DATA"]}
+        """
+        self.database_path = database_path
+        self.connection = duckdb.connect()
+        self.lock = threading.Lock()
+        self.stage_directory = tempfile.mkdtemp(prefix="duckdb_stages_")
+
+        for database, schemas in databases.items():
+            if database_path == ":memory:":
+                self.connection.execute(f"ATTACH ':memory:' AS {database}")
+            else:
+                self.connection.execute(
+                    f"ATTACH '{database_path}.{database.lower()}' AS {database}"
+                )
+
+            for schema in schemas:
+                self.connection.execute(
+                    f"CREATE SCHEMA IF NOT EXISTS {database}.{schema}"
+                )
+
+        # Snowflake's null safe equality
+        self.connection.execute(
+            "CREATE OR REPLACE MACRO equal_null(a, b) AS a IS NOT DISTINCT FROM b"
+        )
+
+    def session(self) -> DuckDBSession:
+        """A new session on the storage, usable as a session factory for SessionPool"""
+        return DuckDBSession(self.connection.cursor(), self.lock, self.stage_directory)
+
+    def close(self) -> None:
+        self.connection.close()
+
+        shutil.rmtree(self.stage_directory, ignore_errors=True)
+
+
+_storages = {}
+
+
+def create_session_factory(config: dict):
+    """Returns a callable that opens a session on the backend named in the config.
+
+    :param config: the contents of config.json. "backend": "duckdb" uses DuckDBStorage with the optional
+                   "database_path", anything else connects to Snowflake with the rest of the config.
+    """
+    if config.get("backend") == "duckdb":
+        database_path = config.get("database_path", ":memory:")
+
+        # Sessions on the same path have to share one storage to see the same data
+        if database_path not in _storages:
+            _storages[database_path] = DuckDBStorage(database_path)
+
+        return _storages[database_path].session
+
+    from snowflake.snowpark import Session
+
+    connection_parameters = {
+        key: value
+        for key, value in config.items()
+        if key not in ("backend", "database_path")
+    }
+
+    return Session.builder.configs(connection_parameters).create
@@ -1,10 +1,17 @@
 """
 """
 
+import re
 import sys
 import logging
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import pandas as pd
+import pyarrow as pa
 import recordlinkage
+from rapidfuzz import process
+from rapidfuzz.distance import DamerauLevenshtein, JaroWinkler
 from snowflake.snowpark import Session
 
 logging.getLogger("snowflake.connector").setLevel(logging.WARNING)
@@ -17,146 +24,578 @@ logging.basicConfig(
 logger = logging.getLogger("STORAGE_DATABASE.CPW_DATA.LOG_OUTPUTS")
 
 
+# Spellings that are rewritten wherever they show up in a name. Words like lake are dropped so "Boyd Lake" and
+# "Boyd Reservoir" clean to the same name. Each entry is applied in turn, in this order, so a dropped word can join the
+# alias of a later entry: "11 lakemile" -> "11 mile" -> "elevenmile"
+SPELLING_ALIASES = {
+    "cheesman": ["chessman", "cheeseman"],
+    "": ["lake", "reservoir", "pond", "resevoir", "reservior"],
+    "elevenmile": ["11 mile", "11mile", "11-mile"],
+}
+
+# A name that mentions one of these, after the spellings are fixed, is that water no matter what else it says
+WATER_ALIASES = {
+    "south platte river": [
+        "south platte",
+        "deckers",
+        "cheesman canyon",
+        "north fork south platte",
+        "dream stream",
+    ],
+}
+
+# Names that are exactly one of these once the spellings are fixed. This is checked before punctuation and spaces are
+# removed, like it always has been, so "Spinney Reservoir" -> "spinney " is spinney mountain while "Spinney." and
+# " spinney" stay spinney. Changing that would change which waters the awards match
+EXACT_ALIASES = {
+    "spinney mountain": ["spinney", "spinney "],
+}
+
+# Everything outside these characters is removed, the ranges are kept as they have always been so cleaned names
+# stay the same between runs
+_REMOVED_CHARACTERS = re.compile("[^a0-zA9-Z ]")
+
+
+def _compile_aliases(aliases: dict) -> (re.Pattern, dict):
+    """Turns an alias table into one regex that matches any alias and a lookup from alias to canonical name.
+    Longer aliases are tried first so "cheeseman canyon" is not cut short by "cheeseman".
+    """
+    lookup = {
+        alias: canonical_name
+        for canonical_name, alias_list in aliases.items()
+        for alias in alias_list
+    }
+
+    pattern = re.compile(
+        "|".join(re.escape(alias) for alias in sorted(lookup, key=len, reverse=True))
+    )
+
+    return pattern, lookup
+
+
+_SPELLING_PATTERNS = [
+    _compile_aliases({canonical_name: alias_list})
+    for canonical_name, alias_list in SPELLING_ALIASES.items()
+]
+
+_WATER_PATTERN, _WATER_LOOKUP = _compile_aliases(WATER_ALIASES)
+
+_EXACT_LOOKUP = {
+    alias: canonical_name
+    for canonical_name, alias_list in EXACT_ALIASES.items()
+    for alias in alias_list
+}
+
+
+def _normalize_location(location: str) -> str:
+    """Cleans one name. Example: "Cheeseman Canyon" -> "south platte river", "11 Mile Reservoir" -> "elevenmile" """
+    location = location.lower()
+
+    for spelling_pattern, spelling_lookup in _SPELLING_PATTERNS:
+        location = spelling_pattern.sub(
+            lambda match: spelling_lookup[match.group(0)], location
+        )
+
+    water_match = _WATER_PATTERN.search(location)
+
+    if water_match:
+        return _WATER_LOOKUP[water_match.group(0)]
+
+    if location in _EXACT_LOOKUP:
+        return _EXACT_LOOKUP[location]
+
+    return _REMOVED_CHARACTERS.sub("", location).strip()
+
+
 def _clean_data(df: pd.DataFrame, cols=[str]) -> None:
     """Before comparing text values it is important that there is some cleaning
     done to improve the success rate of fuzzy matching. This function will lowercase all
-    strings then remove non characters such as periods and hashtags.
+    strings, replace known aliases of a water with one name then remove non characters such as periods and hashtags.
+
+    Each distinct name is only cleaned once and the result is mapped back to the rows, so the work grows with the
+    number of distinct locations rather than rows. The cleaned columns are categorical.
 
-    :param session: live connection to snowflake database
     :param df: current dataframe with columns to clean
     :param cols: one or more columns to cleaning within the dataframe
     """
     for col in cols:
-        clean_col_name = col + "_clean"
-        df[clean_col_name] = df[col].str.lower()
+        codes, distinct_names = pd.factorize(df[col])
 
-        df[clean_col_name] = df[clean_col_name].str.replace(
-            "(chessman|cheeseman)", "cheesman", regex=True
+        clean_codes, clean_names = pd.factorize(
+            np.array(
+                [_normalize_location(name) for name in distinct_names], dtype=object
+            )
         )
 
-        df[clean_col_name] = df[clean_col_name].str.replace(
-            "(lake|reservoir|pond|resevoir|reservior)", "", regex=True
+        # Missing names have a code of -1 and stay missing
+        df[col + "_clean"] = pd.Categorical.from_codes(
+            np.where(codes >= 0, clean_codes[codes], -1), categories=clean_names
         )
 
-        df[clean_col_name] = df[clean_col_name].str.replace(
-            "(11 mile|11mile|11-mile)", "elevenmile", regex=True
-        )
+    logger.info("Cleaned Columns")
 
-        df[clean_col_name] = df[clean_col_name].str.replace(
-            "(deckers|cheesman canyon|north fork south platte|dream stream)",
-            "south platte river",
-            regex=True,
-        )
 
-        df[clean_col_name] = df[clean_col_name].apply(
-            lambda x: "south platte river" if "south platte" in x.lower() else x
-        )
+# Score column -> similarity between 0 and 1, the same measures recordlinkage's jarowinkler and damerau_levenshtein
+# string comparisons use
+SIMILARITY_SCORERS = {
+    "jaro_comparison": JaroWinkler.normalized_similarity,
+    "levenshtein_comparison": DamerauLevenshtein.normalized_similarity,
+}
 
-        df[clean_col_name] = df[clean_col_name].replace(
-            ("spinney"), "spinney mountain", regex=False
-        )
+# Threads used to score, -1 uses every core
+DEFAULT_WORKERS = -1
 
-        df[clean_col_name] = df[clean_col_name].replace(
-            ("spinney "), "spinney mountain", regex=False
-        )
+OUTPUT_TABLE = "PATTERN_MATCH_OUTPUT"
 
-        df[clean_col_name] = (
-            df[clean_col_name].str.replace("[^a0-zA9-Z ]", "", regex=True)
-        ).str.strip()
+# Identifies a water across rebuilds of ALL_SPECIES, its all_species_id changes every time
+WATER_HASH = 'HASH("main_species", "water", "property_name")'
 
-    logger.info("Cleaned Columns")
+# Processes that score awards at once, 1 scores in the procedure's own process
+DEFAULT_PROCESSES = 1
 
+# Award species that are trout, the rest of MASTER_ANGLER_AWARD is never loaded
+TROUT_SPECIES = [
+    "Cutbow",
+    "Rainbow Trout",
+    "Brown Trout",
+    "Lake Trout",
+    "Brook Trout",
+    "Cutthroat (Native) Trout",
+    "Tiger Trout",
+    "Golden Trout",
+]
 
-def _clean_trout_species(df: pd.DataFrame) -> None:
-    """Trout species are stored in the Fishing Atlas as "<trout species> Trout"
-    so we need to remove " Trout" to so the species name is the same between both dataframes.
-    This will be helpful for indexing on trout name in a later function.
+# Matches kept per award, ranked by total score
+DEFAULT_TOP_K = 1
 
-    :param df: fishing atlas dataframe with trout column to clean
-    """
-    df["species_clean"] = df.species.str.replace(" Trout", "")
+# Total scores, out of 2, from which a match is likely the right water
+MATCH_THRESHOLD = 1.2
 
-    logger.info("Cleaned Atlas species name")
+# Best matches less than this ahead of the second best are logged as ambiguous
+AMBIGUOUS_MARGIN = 0.05
 
+# Each award is compared with the waters whose names sort this close to its location, must be odd
+DEFAULT_WINDOW = 11
 
-def _pattern_match_data(
-    master_angler_df: pd.DataFrame, species_df: pd.DataFrame
+
+def _compare_locations(
+    candidate_links: pd.MultiIndex,
+    master_angler_df: pd.DataFrame,
+    species_df: pd.DataFrame,
+    workers: int = DEFAULT_WORKERS,
 ) -> pd.DataFrame:
-    """Use recordlinge to create all possible matches between each tables ids where they have the same
-    value for the body of water and type of fish.
+    """Scores location_clean against water_clean for every candidate link. Many links share the same pair of names,
+    so each distinct pair is only scored once and the scores are copied back to the links.
 
-    :param master_angler_df: contains master angler data from the website
-    :param species_df: contains atlas data from the website.
+    :param candidate_links: (master_angler_award_id, all_species_id) pairs to compare
+    :param workers: threads to score with, -1 uses every core
 
+    :return: dataframe indexed by the candidate links with a column per scorer in SIMILARITY_SCORERS
     """
-    master_angler_df.set_index("master_angler_award_id", inplace=True)
-    species_df.set_index("all_species_id", inplace=True)
+    locations = master_angler_df["location_clean"].to_numpy(dtype=object)[
+        master_angler_df.index.get_indexer(candidate_links.get_level_values(0))
+    ]
+    waters = species_df["water_clean"].to_numpy(dtype=object)[
+        species_df.index.get_indexer(candidate_links.get_level_values(1))
+    ]
+
+    location_codes, location_names = pd.factorize(locations)
+    water_codes, water_names = pd.factorize(waters)
+
+    # One integer per pair of names, a missing name has a code of -1 so both codes are shifted up by one
+    pair_keys = (location_codes.astype(np.int64) + 1) * (len(water_names) + 1) + (
+        water_codes + 1
+    )
+
+    pair_of_link, distinct_pairs = pd.factorize(pair_keys)
+
+    # Missing and empty names score 0 like they did with recordlinkage
+    location_names = np.append("", np.asarray(location_names, dtype=object))
+    water_names = np.append("", np.asarray(water_names, dtype=object))
+
+    pair_locations = location_names[distinct_pairs // (len(water_names))]
+    pair_waters = water_names[distinct_pairs % (len(water_names))]
+
+    scored_pairs = (pair_locations != "") & (pair_waters != "")
+
+    compare_vectors = pd.DataFrame(index=candidate_links)
+    for label, scorer in SIMILARITY_SCORERS.items():
+        pair_scores = np.zeros(len(distinct_pairs))
+
+        if len(distinct_pairs):
+            pair_scores[scored_pairs] = process.cpdist(
+                pair_locations[scored_pairs],
+                pair_waters[scored_pairs],
+                scorer=scorer,
+                dtype=np.float64,
+                workers=workers,
+            )
+
+        compare_vectors[label] = pair_scores[pair_of_link]
+
+    logger.info(
+        f"Scored {len(distinct_pairs)} distinct name pairs for {len(candidate_links)} candidate links"
+    )
+
+    return compare_vectors
+
+
+def _sorted_neighbours(
+    awards_df: pd.DataFrame, waters_df: pd.DataFrame, window: int
+) -> pd.MultiIndex:
+    """Pairs each award with the waters whose names are closest to its location in the sorted list of water names.
+    Only water names are in the list, so the neighbours of an award do not depend on which other awards are
+    matched alongside it.
+
+    :param window: odd number of water names paired with each award, the ones just before and after its location
+
+    :return: (master_angler_award_id, all_species_id) pairs
+    """
+    sorted_names = np.sort(
+        waters_df["water_clean"].dropna().astype(object).unique().astype(object)
+    )
+    locations = awards_df["location_clean"].dropna().astype(object)
+
+    half_window = window // 2
+
+    # Where each location would go in the sorted names, an exact match sits at that position
+    name_positions = np.searchsorted(sorted_names, locations.to_numpy())[
+        :, None
+    ] + np.arange(-half_window, half_window + 1)
+
+    in_range = (name_positions >= 0) & (name_positions < len(sorted_names))
+
+    neighbours_df = pd.DataFrame(
+        {
+            "master_angler_award_id": np.repeat(
+                locations.index.to_numpy(), window
+            ).reshape(-1, window)[in_range],
+            "water_clean": sorted_names[name_positions[in_range]],
+        }
+    ).merge(
+        pd.DataFrame(
+            {
+                "water_clean": waters_df["water_clean"].astype(object).to_numpy(),
+                "all_species_id": waters_df.index.to_numpy(),
+            }
+        ),
+        on="water_clean",
+    )
+
+    return pd.MultiIndex.from_arrays(
+        [neighbours_df.master_angler_award_id, neighbours_df.all_species_id]
+    )
+
+
+def _block_candidates(
+    master_angler_df: pd.DataFrame,
+    species_df: pd.DataFrame,
+    window: int = DEFAULT_WINDOW,
+) -> pd.MultiIndex:
+    """Picks the pairs of awards and waters worth scoring. A pair is a candidate when the cleaned location exactly
+    matches the water or property name, or when the award's species is stocked in the water and the water's name is
+    one of the window names closest to the location in the sorted names of that species' waters. The window catches
+    near misses like "cheesman" and "cheesmn" without pairing every award with every water of its species. An award
+    gets the same candidates whether it is matched alone or with every other award.
+
+    :param master_angler_df: master angler data indexed by master_angler_award_id
+    :param species_df: atlas data indexed by all_species_id
+    :param window: odd number of sorted water names around each award's location that are compared with it
+
+    :return: (master_angler_award_id, all_species_id) pairs
+    """
+    # The window is centred on the location, an even one has no middle
+    if window < 1 or window % 2 == 0:
+        raise ValueError(f"The window must be a positive odd number, got {window}")
+
     indexer = recordlinkage.Index()
 
     indexer.block("location_clean", "water_clean")
     indexer.block("location_clean", "property_name_clean")
-    indexer.block("species_clean", "main_species")
 
-    candidate_links = indexer.index(master_angler_df, species_df)
+    candidate_links = [indexer.index(master_angler_df, species_df)]
 
-    compare = recordlinkage.Compare()
+    # The sorted names are per species so every award has neighbours among the waters of its own species
+    species_waters = species_df.groupby("main_species", observed=True)
+
+    for species, awards_df in master_angler_df.groupby("species_clean", observed=True):
+        if species not in species_waters.groups:
+            continue
+
+        candidate_links.append(
+            _sorted_neighbours(awards_df, species_waters.get_group(species), window)
+        )
 
-    compare.string(
-        "location_clean", "water_clean", method="jarowinkler", label="jaro_comparison"
+    candidate_links = (
+        candidate_links[0]
+        .append(candidate_links[1:])
+        .drop_duplicates()
+        .set_names([master_angler_df.index.name, species_df.index.name])
     )
-    compare.string(
-        "location_clean",
-        "water_clean",
-        method="damerau_levenshtein",
-        label="levenshtein_comparison",
+
+    possible_links = len(master_angler_df) * len(species_df)
+
+    reduction_ratio = 1 - len(candidate_links) / possible_links if possible_links else 0
+
+    logger.info(
+        f"Blocked {len(candidate_links)} candidate links out of {possible_links}, "
+        f"reduction ratio {reduction_ratio:.4f}"
     )
 
+    return candidate_links
+
+
+def _candidates_hash(
+    master_angler_df: pd.DataFrame,
+    species_df: pd.DataFrame,
+    window: int = DEFAULT_WINDOW,
+) -> np.ndarray:
+    """A digest of everything an award's matches depend on, its cleaned location and the waters it is blocked with.
+    An award whose digest is the same as on the last run gets the same matches, when a water is added to its species
+    or a water it matched is removed the digest changes.
+
+    :param master_angler_df: cleaned master angler data
+    :param species_df: cleaned atlas data with the water_hash of each water
+
+    :return: digest of each award, in the order of master_angler_df
+    """
+    awards_df = master_angler_df.set_index("master_angler_award_id")
+    waters_df = species_df.set_index("all_species_id")
+
+    candidate_links = _block_candidates(awards_df, waters_df, window)
+
+    links_df = pd.DataFrame(
+        {
+            "master_angler_award_id": candidate_links.get_level_values(0),
+            "water_hash": waters_df.water_hash.reindex(
+                candidate_links.get_level_values(1)
+            ).to_numpy(),
+        }
+    ).drop_duplicates()
+
+    # Summing the hashes gives the same digest whatever order the waters are blocked in
+    waters_digest = (
+        pd.Series(
+            pd.util.hash_array(links_df.water_hash.to_numpy()),
+            index=links_df.master_angler_award_id,
+        )
+        .groupby(level=0)
+        .sum()
+    )
+
+    digest = pd.util.hash_array(
+        awards_df.location_clean.astype(object).to_numpy()
+    ) + waters_digest.reindex(awards_df.index, fill_value=0).to_numpy(dtype="uint64")
+
+    # Signed like water_hash so it fits a NUMBER column
+    return digest.view("int64")
+
+
+def _pattern_match_data(
+    master_angler_df: pd.DataFrame,
+    species_df: pd.DataFrame,
+    workers: int = DEFAULT_WORKERS,
+    window: int = DEFAULT_WINDOW,
+) -> pd.DataFrame:
+    """Use recordlinge to create the possible matches between each tables ids where they have a similar
+    value for the body of water and the same type of fish, see _block_candidates.
+
+    :param master_angler_df: contains master angler data from the website
+    :param species_df: contains atlas data from the website.
+    :param workers: threads to score the matches with, -1 uses every core
+    :param window: odd number of neighbouring water names each award is compared with
+    """
+    master_angler_df.set_index("master_angler_award_id", inplace=True)
+    species_df.set_index("all_species_id", inplace=True)
+
+    candidate_links = _block_candidates(master_angler_df, species_df, window)
+
     # The comparison vectors
-    compare_vectors = compare.compute(candidate_links, master_angler_df, species_df)
+    compare_vectors = _compare_locations(
+        candidate_links, master_angler_df, species_df, workers
+    )
 
     logger.info("Successfully compared data")
 
     return compare_vectors
 
 
-def _select_best_match(compare_vectors: pd.DataFrame) -> pd.DataFrame:
+def _select_best_match(
+    compare_vectors: pd.DataFrame,
+    top_k: int = DEFAULT_TOP_K,
+    threshold: float = 0.0,
+) -> pd.DataFrame:
     """There can be more than 1 match between the two data sources. This function will first filter to all scores
-    over 1.2 which is likely to be a match. Then, will remove duplicate matches so only one is left over.
+    at or over the threshold, MATCH_THRESHOLD of 1.2 is likely to be a match. Then, will keep the top_k best matches
+    of each award ranked by total score.
+
+    Every row gets the award's match_margin, how far its best match scored ahead of the second best. A small margin
+    means the award could just as well be another water and is worth a look. An award with one candidate has a margin
+    of its whole score.
 
     :param compare_vectors: pattern match output from comparing two datasets
+    :param top_k: number of matches to keep per award, 1 keeps only the best
+    :param threshold: matches scoring under this are dropped, 0 keeps all of them
     """
-    comparison_df = compare_vectors.reset_index().copy()
+    comparison_df = compare_vectors.reset_index()
 
     comparison_df["total_score"] = (
         comparison_df.jaro_comparison + comparison_df.levenshtein_comparison
     )
 
-    best_match_index = (
-        comparison_df.groupby(by="master_angler_award_id")
-        .total_score.idxmax()
-        .to_list()
-    )
+    comparison_df = comparison_df.loc[comparison_df.total_score >= threshold]
+
+    award_ids = comparison_df.master_angler_award_id.to_numpy()
+    scores = comparison_df.total_score.to_numpy()
+
+    # One stable sort ranks the matches of every award, ties keep the order they were compared in
+    order = np.lexsort((-scores, award_ids))
+
+    award_ids = award_ids[order]
+    scores = scores[order]
+
+    positions = np.arange(len(order))
+
+    first_of_award = np.ones(len(order), dtype=bool)
+    first_of_award[1:] = award_ids[1:] != award_ids[:-1]
+
+    # Position of each row's best match, the first row of its award
+    best_position = np.maximum.accumulate(np.where(first_of_award, positions, 0))
+
+    match_rank = positions - best_position + 1
 
-    final_match_df = comparison_df.loc[best_match_index].copy()
+    # Score of the next row of the same award, 0 for an award's last row
+    next_score = np.zeros(len(order))
+    next_score[:-1] = np.where(first_of_award[1:], 0, scores[1:])
+
+    match_margin = (scores - next_score)[best_position]
+
+    kept = match_rank <= top_k
+
+    final_match_df = comparison_df.iloc[order[kept]].reset_index(drop=True)
+    final_match_df["match_rank"] = match_rank[kept]
+    final_match_df["match_margin"] = match_margin[kept]
+
+    logger.info(
+        f"Kept {len(final_match_df)} matches for {first_of_award.sum()} awards, "
+        f"{(final_match_df.match_margin[final_match_df.match_rank == 1] < AMBIGUOUS_MARGIN).sum()} "
+        f"with a margin under {AMBIGUOUS_MARGIN}"
+    )
 
     logger.info("Successfully created final pattern match output")
 
     return final_match_df
 
 
+def _to_arrow_ipc(df: pd.DataFrame) -> bytes:
+    """Serializes a dataframe, index and categories included, to hand it to another process"""
+    table = pa.Table.from_pandas(df)
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+
+    return sink.getvalue().to_pybytes()
+
+
+def _from_arrow_ipc(data: bytes) -> pd.DataFrame:
+    return pa.ipc.open_stream(data).read_all().to_pandas()
+
+
+# The cleaned atlas data in a scoring process, sent once when the process starts instead of with every shard
+_shard_species_df = None
+
+
+def _receive_species_data(species_data: bytes) -> None:
+    global _shard_species_df
+
+    _shard_species_df = _from_arrow_ipc(species_data)
+
+
+def _score_shard(
+    master_angler_data: bytes, window: int, top_k: int, threshold: float
+) -> bytes:
+    """Matches one shard of awards against all of the atlas data in a scoring process"""
+    master_angler_df = _from_arrow_ipc(master_angler_data).reset_index()
+
+    compare_vectors = _pattern_match_data(
+        master_angler_df, _shard_species_df.reset_index(), workers=1, window=window
+    )
+
+    return _to_arrow_ipc(_select_best_match(compare_vectors, top_k, threshold))
+
+
+def _score_matches(
+    master_angler_df: pd.DataFrame,
+    species_df: pd.DataFrame,
+    processes: int = DEFAULT_PROCESSES,
+    window: int = DEFAULT_WINDOW,
+    top_k: int = DEFAULT_TOP_K,
+    threshold: float = 0.0,
+) -> pd.DataFrame:
+    """Finds the best matches of every award. With more than one process the awards are split into shards by a hash of
+    their master_angler_award_id and each shard is scored in its own process. Every award is in exactly one shard, so
+    stacking the best matches of each shard gives the same result as scoring them all at once.
+
+    :param master_angler_df: cleaned master angler data
+    :param species_df: cleaned atlas data
+    :param processes: number of processes to score with, 1 scores in this process
+    :param window: odd number of neighbouring water names each award is compared with
+    :param top_k: number of matches to keep per award
+    :param threshold: matches scoring under this are dropped
+
+    :return: the best matches of each award, see _select_best_match
+    """
+    if processes <= 1:
+        compare_vectors = _pattern_match_data(
+            master_angler_df, species_df, window=window
+        )
+
+        return _select_best_match(compare_vectors, top_k, threshold)
+
+    master_angler_df.set_index("master_angler_award_id", inplace=True)
+    species_df.set_index("all_species_id", inplace=True)
+
+    shard_of_award = pd.util.hash_array(master_angler_df.index.to_numpy()) % processes
+
+    shards = [
+        _to_arrow_ipc(master_angler_df[shard_of_award == shard])
+        for shard in range(processes)
+    ]
+
+    with ProcessPoolExecutor(
+        max_workers=processes,
+        initializer=_receive_species_data,
+        initargs=(_to_arrow_ipc(species_df),),
+    ) as executor:
+        shard_matches = list(
+            executor.map(
+                _score_shard, shards, repeat(window), repeat(top_k), repeat(threshold)
+            )
+        )
+
+    final_match_df = pd.concat(
+        [_from_arrow_ipc(matches) for matches in shard_matches], ignore_index=True
+    )
+
+    logger.info(f"Scored {len(master_angler_df)} awards in {processes} shards")
+
+    return final_match_df
+
+
 def _add_location_columns(final_df, master_angler_df, species_df):
     """Adding in the columns that were compared. This will include the raw values and the
     cleaned value from each data set.
     """
     export_df = final_df.merge(
         master_angler_df.reset_index()[
-            ["master_angler_award_id", "location", "location_clean"]
+            ["master_angler_award_id", "location", "location_clean", "candidates_hash"]
         ],
         on="master_angler_award_id",
         how="right",
     ).merge(
         species_df.reset_index()[
-            ["all_species_id", "main_species", "water", "water_clean"]
+            ["all_species_id", "main_species", "water", "water_clean", "water_hash"]
         ],
         on="all_species_id",
         how="left",
@@ -171,9 +610,17 @@ def _add_location_columns(final_df, master_angler_df, species_df):
         }
     )
 
-    export_df[["jaro_comparison", "levenshtein_comparison", "total_score"]] = export_df[
-        ["jaro_comparison", "levenshtein_comparison", "total_score"]
-    ].fillna(0)
+    score_columns = [
+        "jaro_comparison",
+        "levenshtein_comparison",
+        "total_score",
+        "match_margin",
+    ]
+
+    export_df[score_columns] = export_df[score_columns].fillna(0)
+
+    # Awards without a match get a single row ranked first
+    export_df["match_rank"] = export_df.match_rank.fillna(1).astype("int64")
 
     return export_df
 
@@ -182,7 +629,7 @@ def _write_table(session: Session, df):
     """Writes a df to a specified table"""
     result = session.write_pandas(
         df,
-        table_name="PATTERN_MATCH_OUTPUT",
+        table_name=OUTPUT_TABLE,
         database="STORAGE_DATABASE",
         schema="CPW_DATA",
         parallel=4,
@@ -196,40 +643,266 @@ def _write_table(session: Session, df):
     logger.info(f"Successfully wrote final output to {table_name}")
 
 
-def match_fishing_data(session: Session) -> str:
-    """This function exists to orchestrate all the other functions."""
-    # Only want trout data
-    master_angler_df = session.sql(
-        """select
-            *
-        from STORAGE_DATABASE.CPW_DATA.MASTER_ANGLER_AWARD
-        where "species" in (
-        'Cutbow',
-        'Rainbow Trout',
-        'Brown Trout',
-        'Lake Trout',
-        'Brook Trout',
-        'Cutthroat (Native) Trout',
-        'Tiger Trout',
-        'Golden Trout'
-        )
-        """
-    ).to_pandas()
-    species_df = session.sql(
-        "select * from STORAGE_DATABASE.CPW_DATA.ALL_SPECIES"
+def _merge_table(session: Session, df):
+    """Updates or inserts the rows of a df into the output table, matched on master_angler_award_id and match_rank.
+    Lower ranked matches an award no longer has are removed.
+    """
+    batch_table = f"{OUTPUT_TABLE}_BATCH"
+
+    session.write_pandas(
+        df,
+        table_name=batch_table,
+        database="STORAGE_DATABASE",
+        schema="CPW_DATA",
+        parallel=4,
+        auto_create_table=True,
+        overwrite=True,
+        table_type="temporary",
+    )
+
+    quoted_columns = [f'"{column}"' for column in df.columns]
+
+    update_columns = ", ".join(
+        f"{column} = batch.{column}"
+        for column in quoted_columns
+        if column not in ('"master_angler_award_id"', '"match_rank"')
+    )
+
+    session.sql(
+        f"""
+    DELETE FROM STORAGE_DATABASE.CPW_DATA.{OUTPUT_TABLE} AS target
+    USING (
+        SELECT
+            "master_angler_award_id",
+            MAX("match_rank") as "match_rank"
+        FROM STORAGE_DATABASE.CPW_DATA.{batch_table}
+        GROUP BY "master_angler_award_id"
+    ) AS batch
+    WHERE target."master_angler_award_id" = batch."master_angler_award_id"
+    AND target."match_rank" > batch."match_rank"
+    """
+    ).collect()
+
+    merge_result = session.sql(
+        f"""
+    MERGE INTO STORAGE_DATABASE.CPW_DATA.{OUTPUT_TABLE} AS target
+    USING STORAGE_DATABASE.CPW_DATA.{batch_table} AS batch
+    ON target."master_angler_award_id" = batch."master_angler_award_id"
+    AND target."match_rank" = batch."match_rank"
+    WHEN MATCHED THEN UPDATE SET {update_columns}
+    WHEN NOT MATCHED THEN INSERT ({", ".join(quoted_columns)})
+    VALUES ({", ".join(f"batch.{column}" for column in quoted_columns)})
+    """
+    ).collect()
+
+    session.sql(
+        f"DROP TABLE IF EXISTS STORAGE_DATABASE.CPW_DATA.{batch_table}"
+    ).collect()
+
+    logger.info(
+        f"Merged into {OUTPUT_TABLE}: {merge_result[0][0]} inserted, {merge_result[0][1]} updated"
+    )
+
+
+def _can_merge_output(session: Session) -> bool:
+    """An incremental run needs an output table that already has the water_hash, match_rank and candidates_hash
+    columns
+    """
+    output_columns = session.sql(
+        f"""
+    SELECT
+        COLUMN_NAME
+    FROM storage_database.information_schema.COLUMNS
+    WHERE
+        TABLE_NAME = '{OUTPUT_TABLE}'
+        AND TABLE_SCHEMA = 'CPW_DATA'
+    """
     ).to_pandas()
 
+    return {"water_hash", "match_rank", "candidates_hash"} <= set(
+        output_columns.COLUMN_NAME
+    )
+
+
+def _refresh_output(session: Session) -> None:
+    """ALL_SPECIES is rebuilt with new ids each time, so previous matches are pointed at the current id of the
+    same water. Matches of awards that no longer exist are removed.
+    """
+    update_result = session.sql(
+        f"""
+    UPDATE STORAGE_DATABASE.CPW_DATA.{OUTPUT_TABLE} AS output
+    SET "all_species_id" = species."all_species_id"
+    FROM (
+        SELECT
+            {WATER_HASH} as "water_hash",
+            MIN("all_species_id") as "all_species_id"
+        FROM STORAGE_DATABASE.CPW_DATA.ALL_SPECIES
+        GROUP BY 1
+    ) AS species
+    WHERE output."water_hash" = species."water_hash"
+    """
+    ).collect()
+
+    delete_result = session.sql(
+        f"""
+    DELETE FROM STORAGE_DATABASE.CPW_DATA.{OUTPUT_TABLE}
+    WHERE "master_angler_award_id" NOT IN (
+        SELECT master_angler_award_id FROM STORAGE_DATABASE.CPW_DATA.MASTER_ANGLER_AWARD
+    )
+    """
+    ).collect()
+
+    logger.info(
+        f"Refreshed {update_result[0][0]} water ids and removed {delete_result[0][0]} deleted awards"
+    )
+
+
+def _load_frame(session: Session, query: str) -> pd.DataFrame:
+    """Reads the result of a query as Arrow. Each Arrow buffer is freed as soon as it is converted, so the procedure
+    only holds one copy of the data rather than an Arrow and a pandas copy at once.
+    """
+    df = session.sql(query).to_arrow().to_pandas(self_destruct=True, split_blocks=True)
+
+    logger.info(f"Loaded {len(df)} rows with columns {list(df.columns)}")
+
+    return df
+
+
+def _match(
+    session: Session,
+    incremental: bool,
+    processes: int,
+    top_k: int = DEFAULT_TOP_K,
+    threshold: float = 0.0,
+) -> str:
+    """Loads, matches and writes the awards.
+
+    :param incremental: only match awards that have no match yet or whose location or blocked waters changed, see
+                        _candidates_hash, and merge them into the output. Otherwise every award is matched again and
+                        the output is rewritten.
+    :param processes: number of processes to score the awards with, see _score_matches
+    :param top_k: number of matches to keep per award, see _select_best_match
+    :param threshold: matches scoring under this are dropped, MATCH_THRESHOLD keeps only likely matches
+    """
+    incremental = incremental and _can_merge_output(session)
+
+    if incremental:
+        _refresh_output(session)
+
+        # The digest of each award's last match, awards without a match yet never have a digest of 0
+        output_join = f"""
+        left join STORAGE_DATABASE.CPW_DATA.{OUTPUT_TABLE} as output
+        on output."master_angler_award_id" = award.master_angler_award_id
+        and output."match_rank" = 1
+        """
+        output_columns = (
+            ', coalesce(output."candidates_hash", 0) as "matched_candidates_hash"'
+        )
+    else:
+        output_join, output_columns = "", ""
+
+    # Only want trout data, and only the columns that are matched on
+    master_angler_df = _load_frame(
+        session,
+        f"""select
+            award.master_angler_award_id as "master_angler_award_id",
+            award."location" as "location",
+            replace(award."species", ' Trout', '') as "species_clean"
+            {output_columns}
+        from STORAGE_DATABASE.CPW_DATA.MASTER_ANGLER_AWARD as award
+        {output_join}
+        where "species" in ({", ".join(f"'{species}'" for species in TROUT_SPECIES)})
+        """,
+    )
+
+    species_df = _load_frame(
+        session,
+        f"""select
+            "all_species_id",
+            "main_species",
+            "water",
+            "property_name",
+            {WATER_HASH} as "water_hash"
+        from STORAGE_DATABASE.CPW_DATA.ALL_SPECIES
+        """,
+    )
+
     _clean_data(master_angler_df, ["location"])
     _clean_data(species_df, ["water", "property_name"])
 
-    _clean_trout_species(master_angler_df)
+    master_angler_df["candidates_hash"] = _candidates_hash(master_angler_df, species_df)
+
+    if incremental:
+        # Awards that are new, or whose location or blocked waters changed since they were matched
+        changed = master_angler_df.candidates_hash != master_angler_df.pop(
+            "matched_candidates_hash"
+        )
+
+        master_angler_df = master_angler_df.loc[changed].reset_index(drop=True)
 
-    compare_vectors = _pattern_match_data(master_angler_df, species_df)
+        if master_angler_df.empty:
+            logger.info("No new or changed awards to match")
 
-    final_df = _select_best_match(compare_vectors)
+            return "Successfully completed matching process with 0. Review Logs for details."
+
+        logger.info(f"Matching {len(master_angler_df)} new or changed awards")
+
+    final_df = _score_matches(
+        master_angler_df,
+        species_df,
+        processes=processes,
+        top_k=top_k,
+        threshold=threshold,
+    )
 
     export_df = _add_location_columns(final_df, master_angler_df, species_df)
 
-    _write_table(session, export_df)
+    if incremental:
+        _merge_table(session, export_df)
+    else:
+        _write_table(session, export_df)
 
     return f"Successfully completed matching process with {len(export_df)}. Review Logs for details."
+
+
+def match_fishing_data(
+    session: Session,
+    processes: int = DEFAULT_PROCESSES,
+    top_k: int = DEFAULT_TOP_K,
+    threshold: float = 0.0,
+) -> str:
+    """This function exists to orchestrate all the other functions. Every award is matched again.
+
+    :param processes: number of processes to score the awards with, 1 scores in the procedure's own process
+    :param top_k: number of matches to keep per award, more than 1 is handy to review ambiguous awards
+    :param threshold: matches scoring under this are dropped, 0 keeps all of them and 1.2 only likely matches
+    """
+    return _match(
+        session,
+        incremental=False,
+        processes=processes,
+        top_k=top_k,
+        threshold=threshold,
+    )
+
+
+def match_new_fishing_data(
+    session: Session,
+    processes: int = DEFAULT_PROCESSES,
+    top_k: int = DEFAULT_TOP_K,
+    threshold: float = 0.0,
+) -> str:
+    """Same as match_fishing_data, but only awards that were added, or whose location or blocked waters changed since
+    the last run, are matched and merged into the output. Falls back to a full run when there is no output to merge into yet.
+
+    :param processes: number of processes to score the awards with, 1 scores in the procedure's own process
+    :param top_k: number of matches to keep per award, more than 1 is handy to review ambiguous awards
+    :param threshold: matches scoring under this are dropped, 0 keeps all of them and 1.2 only likely matches
+    """
+    return _match(
+        session,
+        incremental=True,
+        processes=processes,
+        top_k=top_k,
+        threshold=threshold,
+    )
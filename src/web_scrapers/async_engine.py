@@ -0,0 +1,140 @@
+""" Shared building blocks for the scrapers so one asyncio event loop can drive many playwright pages at once.
+
+The general pattern is
+
+    async with launch_browser() as browser:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async with semaphore:
+            async with open_page(browser) as page:
+                ...
+
+Every unit of work that holds a page (a year tab, a species, a chunk of features) takes a permit from the
+semaphore, so the number of live pages never goes over the concurrency limit no matter how the work is nested.
+Only the code that holds a page should take a permit, waiting on other tasks while holding one can deadlock.
+
+Scrapers that stream their records take an async emit callback and await it for every record. iterate_in_thread
+runs such a scraper on an event loop in a background thread and hands the records to ordinary synchronous code as
+a generator, so records can be cleaned and written while the rest of the website is still being scraped.
+"""
+
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+
+from playwright.async_api import async_playwright
+
+# Pages that are open at the same time. Each page is a full map or table render so this is sized for
+# a 4 core / 8GB machine.
+DEFAULT_CONCURRENCY = 4
+
+# Records scraped ahead of the consumer before the scraper is paused
+DEFAULT_MAX_BUFFERED = 100
+
+_END_OF_STREAM = object()
+
+
+@asynccontextmanager
+async def launch_browser(headless: bool = True):
+    """Starts playwright and a single Chromium instance that is shared by every page.
+
+    :param headless: False will show the browser window
+    """
+    async with async_playwright() as playwright:
+        browser = await playwright.chromium.launch(
+            headless=headless, args=["--start-fullscreen"]
+        )
+
+        try:
+            yield browser
+        finally:
+            await browser.close()
+
+
+@asynccontextmanager
+async def open_page(browser):
+    """Opens a page in its own browser context so cookies and popups are not shared with other pages.
+
+    :param browser: browser from launch_browser
+    """
+    context = await browser.new_context()
+
+    try:
+        yield await context.new_page()
+    finally:
+        await context.close()
+
+
+async def gather_bounded(coroutines: list, limit: int) -> list:
+    """Runs coroutines concurrently with at most limit running at once. Results are returned in the same order
+    as the coroutines were passed in.
+
+    :param coroutines: coroutines that should not take a permit from another semaphore themselves
+    :param limit: max number of coroutines running at the same time
+    """
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run_with_permit(coroutine):
+        async with semaphore:
+            return await coroutine
+
+    return await asyncio.gather(
+        *[run_with_permit(coroutine) for coroutine in coroutines]
+    )
+
+
+def iterate_in_thread(produce, max_buffered: int = DEFAULT_MAX_BUFFERED):
+    """Runs a producer on its own event loop in a background thread and yields what it emits. The producer is
+    paused whenever max_buffered items are waiting, so memory stays bounded when the consumer is slower than the
+    scraper. An exception raised by the producer is raised here once the items before it have been yielded.
+
+        async def produce(emit):
+            for i in range(3):
+                await emit(i)
+
+        for i in iterate_in_thread(produce):
+            ...
+
+    :param produce: coroutine function that takes an async emit callback and awaits it for every item
+    :param max_buffered: max number of items emitted but not yet yielded
+    """
+    loop = asyncio.new_event_loop()
+
+    buffer = asyncio.Queue(max_buffered)
+
+    producer_error, producer_finished = [], threading.Event()
+
+    async def run_producer():
+        try:
+            await produce(buffer.put)
+        except Exception as e:
+            producer_error.append(e)
+        finally:
+            producer_finished.set()
+
+        await buffer.put(_END_OF_STREAM)
+
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+
+    producer_future = asyncio.run_coroutine_threadsafe(run_producer(), loop)
+
+    try:
+        while True:
+            item = asyncio.run_coroutine_threadsafe(buffer.get(), loop).result()
+
+            if item is _END_OF_STREAM:
+                break
+
+            yield item
+    finally:
+        # The consumer stopped early, cancel the producer and let it clean up so the browser is closed
+        producer_future.cancel()
+        producer_finished.wait()
+
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+    if producer_error:
+        raise producer_error[0]
@@ -0,0 +1,239 @@
+""" The Colorado Fishing Atlas web app is backed by an ArcGIS feature service. Instead of clicking through the map
+popups like fishing_atlas_scraper, this module asks the service's query endpoint for every feature of a species
+directly, one page of results at a time.
+
+    GET <query url>?where=...&outFields=*&f=json&resultOffset=0&resultRecordCount=1000
+
+The response is already structured, so there is no popup text to split apart. Each feature is turned into a
+record with the same columns and text the popup parser produces. schema.apply_schema(df, schema.ATLAS_SCHEMA) then
+gives the typed columns of clean_atlas_data.process_all_location_data, which is how main.py writes them when
+ATLAS_FETCH_MODE is "feature_service".
+
+The HTTP client is any callable that takes a url and a dictionary of query parameters and returns the decoded
+json. requests is used by default, tests pass in their own to hit a local server.
+"""
+
+import sys
+import logging
+
+import pandas as pd
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(filename)s] [%(funcName)20s()] [%(levelname)s] - %(message)s",
+    stream=sys.stdout,
+)
+logger = logging.getLogger(__name__)
+
+FEATURE_SERVICE_QUERY_URL = "https://ndismaps.nrel.colostate.edu/arcgis/rest/services/FishingAtlas/CPW_FishingAtlas/MapServer/0/query"
+
+# Most ArcGIS services cap a page at 1,000 or 2,000 features
+DEFAULT_PAGE_SIZE = 1_000
+
+# Feature service attribute -> column name produced by process_all_location_data
+DEFAULT_FIELD_MAP = {
+    "FISH_SPECIES": "Fish Species ",
+    "WATER": "Water",
+    "COUNTY": "County",
+    "PROPERTY_NAME": "Property name",
+    "EASE_OF_ACCESS": "Ease of access",
+    "BOATING": "Boating",
+    "FISHING_PRESSURE": "Fishing pressure",
+    "STOCKED": "Stocked",
+    "ELEVATION": "Elevation(ft)",
+}
+
+DEFAULT_SPECIES_FIELD = "FISH_SPECIES"
+
+DEFAULT_ORDER_BY_FIELD = "OBJECTID"
+
+
+def requests_get_json(url: str, params: dict) -> dict:
+    """Default HTTP client, sends a GET request and decodes the json response"""
+    import requests
+
+    response = requests.get(url, params=params, timeout=60)
+
+    response.raise_for_status()
+
+    return response.json()
+
+
+def format_species(raw_species) -> str:
+    """The service lists species as "Trout: Cutthroat, Trout: Golden" or one per line. The popup text is cleaned
+    into "Cutthroat, Golden" so the same is done here.
+    """
+    if not raw_species:
+        return ""
+
+    species_names = [
+        species_name.split(":")[-1].strip()
+        for species_name in str(raw_species)
+        .replace("\n", ",")
+        .replace(";", ",")
+        .split(",")
+    ]
+
+    return ", ".join(species_name for species_name in species_names if species_name)
+
+
+def format_coordinates(latitude: float, longitude: float) -> (str, str):
+    """Formats coordinates the way the atlas coordinate display does. Example: ("38.60092 N", "-106.32702 W")"""
+    latitude_text = f"{latitude:.5f} {'N' if latitude >= 0 else 'S'}"
+
+    longitude_text = f"{longitude:.5f} {'W' if longitude < 0 else 'E'}"
+
+    return latitude_text, longitude_text
+
+
+def format_elevation(elevation) -> str:
+    """Elevation shows up in the popup with a thousands separator. Example: 1000 -> "1,000" """
+    if elevation is None:
+        return None
+
+    try:
+        return f"{int(float(elevation)):,}"
+    except ValueError:
+        return str(elevation)
+
+
+class AtlasFeatureServiceClient:
+    def __init__(
+        self,
+        http_get=requests_get_json,
+        query_url: str = FEATURE_SERVICE_QUERY_URL,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        output_format: str = "json",
+        field_map: dict = DEFAULT_FIELD_MAP,
+        species_field: str = DEFAULT_SPECIES_FIELD,
+        order_by_field: str = DEFAULT_ORDER_BY_FIELD,
+    ):
+        """
+        :param http_get: callable(url, params) that returns the decoded json response
+        :param query_url: the layers query endpoint
+        :param page_size: number of features asked for in each request
+        :param output_format: "json" for esri json or "geojson"
+        :param field_map: feature attribute name -> output column name
+        :param species_field: the attribute that lists the fish species of a feature
+        :param order_by_field: attribute used to give pages a stable order, usually the object id
+        """
+        if output_format not in ("json", "geojson"):
+            raise ValueError(
+                f"output_format must be json or geojson. Received {output_format}"
+            )
+
+        self.http_get = http_get
+        self.query_url = query_url
+        self.page_size = page_size
+        self.output_format = output_format
+        self.field_map = field_map
+        self.species_field = species_field
+        self.order_by_field = order_by_field
+
+    def build_where_clause(self, fish_species: str) -> str:
+        """Filters to features that list the species. Example: "Trout: Brook" -> FISH_SPECIES LIKE '%Trout: Brook%'"""
+        escaped_species = fish_species.replace("'", "''")
+
+        return f"{self.species_field} LIKE '%{escaped_species}%'"
+
+    def query_page(self, where: str, offset: int) -> dict:
+        """Requests a single page of features starting at offset"""
+        params = {
+            "where": where,
+            "outFields": "*",
+            "returnGeometry": "true",
+            "outSR": 4326,
+            "orderByFields": self.order_by_field,
+            "resultOffset": offset,
+            "resultRecordCount": self.page_size,
+            "f": self.output_format,
+        }
+
+        response = self.http_get(self.query_url, params)
+
+        if "error" in response:
+            raise RuntimeError(
+                f"Feature service query failed: {response['error'].get('message', response['error'])}"
+            )
+
+        return response
+
+    def query_features(self, where: str) -> list:
+        """Pages through the query with resultOffset until the service says there are no more features.
+
+        :return: list of features as returned by the service
+        """
+        features, offset = [], 0
+
+        while True:
+            response = self.query_page(where, offset)
+
+            page_features = response.get("features", [])
+
+            features += page_features
+
+            logger.debug(f"Received {len(page_features)} features at offset {offset}")
+
+            # geojson puts the flag in properties, esri json puts it at the top level
+            exceeded_transfer_limit = response.get(
+                "exceededTransferLimit",
+                response.get("properties", {}).get("exceededTransferLimit", False),
+            )
+
+            if not page_features or not exceeded_transfer_limit:
+                break
+
+            offset += len(page_features)
+
+        return features
+
+    def feature_to_record(self, feature: dict) -> dict:
+        """Turns a single feature into a record with the process_all_location_data columns"""
+        if self.output_format == "geojson":
+            attributes = feature.get("properties") or {}
+
+            longitude, latitude = feature["geometry"]["coordinates"][:2]
+        else:
+            attributes = feature.get("attributes") or {}
+
+            longitude, latitude = feature["geometry"]["x"], feature["geometry"]["y"]
+
+        record = {}
+        for field, column in self.field_map.items():
+            value = attributes.get(field)
+
+            if field == self.species_field:
+                value = format_species(value)
+            elif column == "Elevation(ft)":
+                value = format_elevation(value)
+            # Values split out of the popup text keep the space after the colon, match it so both sources line up
+            record[column] = "NA" if value is None else " " + str(value)
+
+        record["Latitude"], record["Longitude"] = [
+            " " + coordinate for coordinate in format_coordinates(latitude, longitude)
+        ]
+
+        return record
+
+    def fetch_species(self, fish_species: str) -> list:
+        """Fetches every feature for a species as a list of records.
+
+        :param fish_species: species search term, Example: "Trout: Brook"
+        """
+        features = self.query_features(self.build_where_clause(fish_species))
+
+        records = [
+            self.feature_to_record(feature)
+            for feature in features
+            if feature.get("geometry")
+        ]
+
+        logger.info(f"Fetched {len(records)} features for {fish_species}")
+
+        return records
+
+    def fetch_species_dataframe(self, fish_species: str) -> pd.DataFrame:
+        """Same as fetch_species but returns the records as a dataframe of text, see schema.apply_schema"""
+        columns = list(self.field_map.values()) + ["Latitude", "Longitude"]
+
+        return pd.DataFrame(self.fetch_species(fish_species), columns=columns)
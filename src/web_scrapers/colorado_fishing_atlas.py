@@ -1,10 +1,23 @@
 import sys
+import asyncio
 import logging
-import time
-from datetime import datetime
 
+from playwright.async_api import Error as PlaywrightError
 
-from playwright.sync_api import sync_playwright
+from .async_engine import (
+    DEFAULT_CONCURRENCY,
+    iterate_in_thread,
+    launch_browser,
+    open_page,
+)
+from .page_waits import (
+    AdaptiveTimeout,
+    FeatureWaitTimings,
+    is_identify_response,
+    scroll_to_grid_row,
+    wait_for_popup_text,
+)
+from .scrape_journal import ScrapeJournal
 
 logging.basicConfig(
     level=logging.DEBUG,
@@ -13,68 +26,105 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+ATLAS_URL = "https://ndismaps.nrel.colostate.edu/index.html?app=FishingAtlas"
 
-class fishing_atlas_scraper:
-    def __init__(self, fish_species):
-        self.fish_species = fish_species
+# Features scraped one after another in a single page before the rest of a species is split off into more pages
+DEFAULT_FEATURES_PER_PAGE = 50
 
-    def scrape_website(self, playwright: sync_playwright):
-        chromium = playwright.chromium
+LOCATION_COORDINATE_DISPLAY_XPATH = '//*[@id="xycoords"]'
 
-        browser = chromium.launch(headless=True, args=["--start-fullscreen"])
+# The search results, its rows have ids like dgrid_1-row-12
+RESULTS_GRID_ID = "dgrid_1"
 
-        page = browser.new_page()
+POPUP_XPATH = '//*[@id="mapDiv_root"]/div[3]/div[1]'
 
-        url = "https://ndismaps.nrel.colostate.edu/index.html?app=FishingAtlas"
 
-        page.goto(url)
+class fishing_atlas_scraper:
+    def __init__(
+        self,
+        fish_species,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        features_per_page: int = DEFAULT_FEATURES_PER_PAGE,
+        journal: ScrapeJournal = None,
+    ):
+        """
+        :param fish_species: species search term, Example: "Trout: Brook"
+        :param concurrency: max number of pages open at once when scraping on its own with execute
+        :param features_per_page: number of features scraped in a page before another page is opened
+        :param journal: when passed, every scraped feature is saved to it and features already in it are skipped
+        """
+        self.fish_species = fish_species
+        self.concurrency = concurrency
+        self.features_per_page = features_per_page
+        self.journal = journal
+        self.popup_timeout = AdaptiveTimeout()
+        self.wait_timings = FeatureWaitTimings(fish_species)
+
+    async def prepare_page(self, page):
+        """Opens the Fishing Atlas on a page, accepts the terms of service and switches the
+        coordinate display to decimal degrees so the page is ready to search.
 
-        all_records = []
+        :param page: the playwright page object we are using to interact with the website
+        """
+        await page.goto(ATLAS_URL)
 
         # Click Agree on terms of service
-        page.wait_for_selector(
-            '//*[@id="dijit_form_Button_0_label"]', timeout=5_000
+        await (
+            await page.wait_for_selector(
+                '//*[@id="dijit_form_Button_0_label"]', timeout=5_000
+            )
         ).click()
 
         # Change the Location coordinates to units we can use with geopandas or google maps
-        location_coordinate_display_xpath = '//*[@id="xycoords"]'
-
-        page.wait_for_selector(location_coordinate_display_xpath, timeout=5_000).click()
+        await (
+            await page.wait_for_selector(
+                LOCATION_COORDINATE_DISPLAY_XPATH, timeout=5_000
+            )
+        ).click()
 
         decimal_degrees_xpath = '//*[@id="xycoords_combo"]/option[2]'
 
-        page.wait_for_selector(decimal_degrees_xpath, timeout=5_000).click()
+        await (
+            await page.wait_for_selector(decimal_degrees_xpath, timeout=5_000)
+        ).click()
+
+    async def search_species(self, page) -> int:
+        """Searches a prepared Fishing Atlas page for the fish species.
 
+        :param page: a page that has already been through prepare_page
+
+        :return: the number of features found for the species
+        """
         search_bar_text = "None"
 
         species_search_bar_xpath = '//*[@id="searchText"]'
 
         while search_bar_text != self.fish_species:
-            time.sleep(0.5)
+            await asyncio.sleep(0.5)
 
             logger.debug(
                 f"Search bar does not contain: {self.fish_species}. Current text {search_bar_text}. Will try entering text again..."
             )
 
             # Select Trout speciese
-            page.wait_for_selector(species_search_bar_xpath, timeout=5_000).fill(
-                self.fish_species
-            )
+            await (
+                await page.wait_for_selector(species_search_bar_xpath, timeout=5_000)
+            ).fill(self.fish_species)
 
-            search_bar_text = page.wait_for_selector(
-                species_search_bar_xpath, timeout=5_000
+            search_bar_text = await (
+                await page.wait_for_selector(species_search_bar_xpath, timeout=5_000)
             ).input_value()
 
         logger.debug(f"Successfully typed {self.fish_species}")
 
         # having trouble with enter need to make sure it goes through or else it will error out on the first run and then pull the same data if its a 2nd or third run
-        page.keyboard.press("Enter")
+        await page.keyboard.press("Enter")
 
         features_found_number_xpath = '//*[@id="searchTools"]'
 
         # Text will look like: Features Found: N, where N is any number
-        features_found = page.wait_for_selector(
-            features_found_number_xpath, timeout=5_000
+        features_found = await (
+            await page.wait_for_selector(features_found_number_xpath, timeout=5_000)
         ).inner_text()
 
         features_number = int(features_found.split(":")[1])
@@ -83,100 +133,381 @@ class fishing_atlas_scraper:
             f"There are {features_number} results for search term {self.fish_species}"
         )
 
-        for i in range(0, features_number):
-            result_location_xpath = (
-                '//*[@id="dgrid_1-row-int_placeholder"]/table/tr/td[1]'.replace(
-                    "int_placeholder", str(i)
-                )
+        return features_number
+
+    async def scrape_feature(self, page, i: int) -> str:
+        """Clicks a feature in the search results and reads the location popup on the map.
+
+        :param page: a page that has already been through search_species
+        :param i: row number of the feature in the search results
+
+        :return: the location name, popup text and coordinates in the format expected by process_all_location_data
+        """
+        result_location_xpath = (
+            '//*[@id="dgrid_1-row-int_placeholder"]/table/tr/td[1]'.replace(
+                "int_placeholder", str(i)
             )
+        )
 
-            page.wait_for_selector(result_location_xpath, timeout=10_000).click()
+        # Only the rows near the top of the results are rendered in a freshly searched page
+        await scroll_to_grid_row(page, RESULTS_GRID_ID, i, timeout_ms=10_000)
 
-            location_name = page.wait_for_selector(
-                result_location_xpath, timeout=10_000
-            ).inner_text()
+        result_location = await page.wait_for_selector(
+            result_location_xpath, timeout=10_000
+        )
 
-            logger.debug(f"Grabbing data for {location_name}")
+        location_name = await result_location.inner_text()
 
-            time.sleep(3)
+        logger.debug(f"Grabbing data for {location_name}")
 
-            box = page.wait_for_selector(
-                '//*[@id="mapDiv"]', timeout=5_000
-            ).bounding_box()
+        box = await (
+            await page.wait_for_selector('//*[@id="mapDiv"]', timeout=5_000)
+        ).bounding_box()
 
-            pop_up_visble = page.query_selector(
-                '//*[@id="mapDiv_root"]/div[3]/div[1]'
-            ).is_visible()
-            while pop_up_visble == False:
-                time.sleep(1)
+        # The popup still shows the last feature, the wait is over once its text changes
+        previous_location_data = await self._popup_text(page)
 
-                logger.debug(
-                    "The location popup did not appear, waiting 2 seconds then trying again"
-                )
+        wait_start = self.wait_timings.start()
 
-                page.mouse.move(
-                    box["x"] + box["width"] / 2, box["y"] + box["height"] / 2
-                )
+        await result_location.click()
 
-                page.mouse.click(
-                    box["x"] + box["width"] / 2, box["y"] + box["height"] / 2
-                )
+        location_data = await self._wait_for_location_data(page, previous_location_data)
 
-                time.sleep(1)
+        attempts = 0
+        while location_data is None and attempts != 5:
+            attempts += 1
 
-                pop_up_visble = page.query_selector(
-                    '//*[@id="mapDiv_root"]/div[3]/div[1]'
-                ).is_visible()
+            logger.debug(
+                f"The location popup did not appear for {location_name}, clicking the map. Attempt {attempts}"
+            )
 
-            loaction_data_xpath = '//*[@id="mapDiv_root"]/div[3]/div[1]'
+            try:
+                async with page.expect_response(
+                    is_identify_response, timeout=self.popup_timeout.timeout_ms
+                ):
+                    await page.mouse.click(
+                        box["x"] + box["width"] / 2, box["y"] + box["height"] / 2
+                    )
+            except PlaywrightError:
+                logger.debug("The map click did not send an identify request")
+
+            location_data = await self._wait_for_location_data(
+                page, previous_location_data
+            )
+
+        elapsed_seconds = self.wait_timings.stop(wait_start)
 
-            location_data = page.wait_for_selector(
-                loaction_data_xpath, timeout=5_000
-            ).inner_text()
+        if location_data is None:
+            logger.warning(f"Data did not load for {location_name} after 5 attempts")
 
-            if "Loading..." in location_data:
-                attempts = 0
+            # Keep whatever is showing, process_all_location_data skips popups that are still loading
+            location_data = await self._popup_text(page)
+        else:
+            self.popup_timeout.observe(elapsed_seconds * 1_000)
 
-                logger.warning(
-                    f"Data did not load for {location_name}, waiting then trying again"
+            if attempts:
+                logger.info(
+                    f"Data successfully loaded for {location_name} after {attempts} attempts"
                 )
 
-                while "Loading..." in location_data and attempts != 5:
-                    time.sleep(1)
+        coordinate_data = await (
+            await page.wait_for_selector(
+                LOCATION_COORDINATE_DISPLAY_XPATH, timeout=5_000
+            )
+        ).inner_text()
 
-                    location_data = page.wait_for_selector(
-                        loaction_data_xpath, timeout=5_000
-                    ).inner_text()
+        # Adding fish species so we can differentiate data when there is more than one body of water
+        combined_data = location_name + "XXXX" + location_data + coordinate_data
 
-                    attempts += 1
+        # close the popup
+        await page.mouse.click(
+            box["x"] + box["width"] / 2, box["y"] + box["height"] / 2
+        )
 
-                if attempts == 5:
-                    logger.warning(
-                        f"Data did not load for {location_name} after 5 attempts"
-                    )
-                else:
-                    logger.info(
-                        f"Data successfully loaded for {location_name} after {attempts} attempts"
-                    )
+        return combined_data
+
+    async def _popup_text(self, page) -> str:
+        """Returns the text of the location popup, or an empty string when it is not showing"""
+        popup = await page.query_selector(POPUP_XPATH)
+
+        if popup is None or not await popup.is_visible():
+            return ""
+
+        return await popup.inner_text()
+
+    async def _wait_for_location_data(self, page, previous_location_data: str):
+        """Waits for the popup to show new, fully loaded text.
+
+        :return: the popup text, or None if it did not show up before the timeout
+        """
+        try:
+            return await wait_for_popup_text(
+                page,
+                POPUP_XPATH,
+                previous_location_data,
+                self.popup_timeout.timeout_ms,
+            )
+        except PlaywrightError as e:
+            logger.debug(f"Gave up waiting on the popup: {e}")
+
+            return None
+
+    def _completed_features(self) -> dict:
+        """Features already in the journal, keyed by row number"""
+        if self.journal is None:
+            return {}
+
+        return self.journal.completed_features(self.fish_species)
+
+    async def scrape_features(self, page, feature_numbers: range, emit=None) -> list:
+        """Scrapes a range of features one after another on a single page. Features already in the journal
+        are taken from it instead of the page.
+
+        :param page: a page that has already been through search_species
+        :param feature_numbers: row numbers of the features to scrape
+        :param emit: optional async callback, awaited with every record as soon as it is scraped
+        """
+        completed_features = self._completed_features()
+
+        records = []
+        for i in feature_numbers:
+            if i in completed_features:
+                record = completed_features[i]
+            else:
+                record = await self.scrape_feature(page, i)
+
+                # Popups that never loaded are left out of the journal so a rerun tries them again
+                if self.journal is not None and "Loading..." not in record:
+                    self.journal.record_feature(self.fish_species, i, record)
+
+            if emit is not None:
+                await emit(record)
+
+            records.append(record)
+
+        return records
 
-            coordinate_data = page.wait_for_selector(
-                location_coordinate_display_xpath, timeout=5_000
-            ).inner_text()
+    async def _scrape_features_in_new_page(
+        self, browser, semaphore: asyncio.Semaphore, feature_numbers: range, emit=None
+    ) -> list:
+        completed_features = self._completed_features()
 
-            # Adding fish species so we can differentiate data when there is more than one body of water
-            combined_data = location_name + "XXXX" + location_data + coordinate_data
+        if all(i in completed_features for i in feature_numbers):
+            logger.info(
+                f"Features {feature_numbers.start} to {feature_numbers.stop - 1} of {self.fish_species} are already in the journal"
+            )
+
+            records = [completed_features[i] for i in feature_numbers]
+
+            if emit is not None:
+                for record in records:
+                    await emit(record)
+
+            return records
+
+        async with semaphore:
+            async with open_page(browser) as page:
+                await self.prepare_page(page)
+
+                await self.search_species(page)
+
+                return await self.scrape_features(page, feature_numbers, emit)
+
+    async def scrape_website(
+        self, browser, semaphore: asyncio.Semaphore, emit=None
+    ) -> list:
+        """Searches the Fishing Atlas for the fish species and scrapes every feature found. The first page
+        finds out how many features there are and scrapes the first features_per_page of them, the rest are
+        split into chunks that are each scraped in their own page. Every page takes a permit from the semaphore.
+
+        :param browser: browser shared by every page
+        :param semaphore: bounds how many pages are open at once
+        :param emit: optional async callback, awaited with every record as soon as it is scraped
+
+        :return: list of strings, one per location, in the order of the search results
+        """
+        if self.journal is not None and self.journal.is_species_complete(
+            self.fish_species
+        ):
+            logger.info(f"{self.fish_species} is already complete in the journal")
+
+            records = self.journal.species_records(self.fish_species)
+
+            if emit is not None:
+                for record in records:
+                    await emit(record)
+
+            return records
 
-            all_records.append(combined_data)
+        async with semaphore:
+            async with open_page(browser) as page:
+                await self.prepare_page(page)
 
-            # close the popup
-            page.mouse.click(box["x"] + box["width"] / 2, box["y"] + box["height"] / 2)
+                features_number = await self.search_species(page)
+
+                first_chunk = range(0, min(self.features_per_page, features_number))
+
+                all_records = await self.scrape_features(page, first_chunk, emit)
+
+        remaining_chunks = [
+            range(start, min(start + self.features_per_page, features_number))
+            for start in range(
+                self.features_per_page, features_number, self.features_per_page
+            )
+        ]
+
+        # Let every chunk finish before raising so the journal has as much progress as possible
+        chunk_records = await asyncio.gather(
+            *[
+                self._scrape_features_in_new_page(browser, semaphore, chunk, emit)
+                for chunk in remaining_chunks
+            ],
+            return_exceptions=True,
+        )
+
+        for records in chunk_records:
+            if isinstance(records, BaseException):
+                raise records
+
+            all_records += records
+
+        if self.journal is not None:
+            self.journal.record_species_complete(self.fish_species, features_number)
+
+        self.wait_timings.log_summary()
 
         logger.info(f"Successfully pulled all the data for {self.fish_species}")
 
         return all_records
 
-    def execute(self):
-        with sync_playwright() as playwright:
-            raw_data = self.scrape_website(playwright)
+    async def execute_async(self) -> list:
+        """Launches a browser and scrapes the fish species with up to concurrency pages at once."""
+        async with launch_browser() as browser:
+            raw_data = await self.scrape_website(
+                browser, asyncio.Semaphore(self.concurrency)
+            )
 
         return raw_data
+
+    def execute(self) -> list:
+        """Synchronous entry point, runs execute_async on a new event loop"""
+        return asyncio.run(self.execute_async())
+
+    def iter_records(self):
+        """Same as execute but yields every record as soon as it is scraped instead of returning all of them at
+        the end. Chunks are scraped at the same time, so records come in the order they finish rather than the
+        order of the search results.
+        """
+
+        async def produce(emit):
+            async with launch_browser() as browser:
+                await self.scrape_website(
+                    browser, asyncio.Semaphore(self.concurrency), emit
+                )
+
+        return iterate_in_thread(produce)
+
+
+class FishingAtlasScraperPool:
+    """Scrapes several fish species from the Fishing Atlas with a single browser. Every species and every
+    chunk of features is scraped in its own isolated browser context, and all of them share one semaphore so
+    at most pool_size pages are open at once. Waiting pages are let in first come first served, which makes the
+    semaphore the work queue. This avoids a cold browser start per species and lets the slow map popups of
+    different species load at the same time.
+    """
+
+    def __init__(
+        self,
+        fish_species: list,
+        pool_size: int = DEFAULT_CONCURRENCY,
+        features_per_page: int = DEFAULT_FEATURES_PER_PAGE,
+        journal: ScrapeJournal = None,
+    ):
+        """
+        :param fish_species: species search terms, Example: ["Trout: Brook", "Trout: Brown"]
+        :param pool_size: max number of pages open at once
+        :param features_per_page: number of features scraped in a page before another page is opened
+        :param journal: shared by every species so a rerun resumes where the last run stopped
+        """
+        self.fish_species = fish_species
+        self.pool_size = max(1, pool_size)
+        self.features_per_page = features_per_page
+        self.journal = journal
+
+    async def _scrape_species(
+        self, browser, semaphore: asyncio.Semaphore, fish_species: str
+    ):
+        """Scrapes one species. A failed species is logged and returns None so the rest of the species
+        still get scraped.
+        """
+        scraper = fishing_atlas_scraper(
+            fish_species,
+            features_per_page=self.features_per_page,
+            journal=self.journal,
+        )
+
+        try:
+            return await scraper.scrape_website(browser, semaphore)
+        except Exception:
+            logger.exception(f"Failed to scrape {fish_species}")
+
+            return None
+
+    async def scrape_website(self, browser) -> dict:
+        """Scrapes every species at once, bounded by the pool size."""
+        semaphore = asyncio.Semaphore(self.pool_size)
+
+        logger.info(
+            f"Scraping {len(self.fish_species)} species with {self.pool_size} pages at a time"
+        )
+
+        results = await asyncio.gather(
+            *[
+                self._scrape_species(browser, semaphore, fish_species)
+                for fish_species in self.fish_species
+            ]
+        )
+
+        # Keep the order the species were requested in
+        return {
+            fish_species: records
+            for fish_species, records in zip(self.fish_species, results)
+            if records is not None
+        }
+
+    async def execute_async(self) -> dict:
+        """Launches one browser and scrapes every species with it."""
+        async with launch_browser() as browser:
+            raw_data = await self.scrape_website(browser)
+
+        return raw_data
+
+    def execute(self) -> dict:
+        """Scrapes every species and returns the raw records keyed by species."""
+        return asyncio.run(self.execute_async())
+
+    def iter_species(self):
+        """Same as execute but yields (species, records) as soon as each species is done instead of waiting on
+        every species. Failed species are skipped.
+        """
+
+        async def produce(emit):
+            async with launch_browser() as browser:
+                semaphore = asyncio.Semaphore(self.pool_size)
+
+                async def scrape_and_emit(fish_species):
+                    records = await self._scrape_species(
+                        browser, semaphore, fish_species
+                    )
+
+                    if records is not None:
+                        await emit((fish_species, records))
+
+                await asyncio.gather(
+                    *[
+                        scrape_and_emit(fish_species)
+                        for fish_species in self.fish_species
+                    ]
+                )
+
+        return iterate_in_thread(produce, max_buffered=1)
@@ -15,15 +15,27 @@ _____________________________________________________________
 
 The functions are dedication paginating through all the data and storing it within a list. From there the list of data can be passed on to 
 other functions to process and store the data.
+
+Every years table is in the html of the page, the pager only hides rows. So there is also an "http" fetch mode that downloads
+the page once and reads each thisTable-{year} <tbody> with MasterAnglerTableParser instead of clicking through the pages.
 """
 
 import re
 import sys
+import asyncio
 import logging
 from datetime import datetime
+from html.parser import HTMLParser
+
+from playwright.async_api import Page
 
-import playwright
-from playwright.sync_api import sync_playwright
+from .async_engine import (
+    DEFAULT_CONCURRENCY,
+    gather_bounded,
+    iterate_in_thread,
+    launch_browser,
+    open_page,
+)
 
 logging.basicConfig(
     level=logging.INFO,
@@ -32,11 +44,145 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+MASTER_ANGLER_URL = "https://cpw.state.co.us/learn/Pages/MasterAngler.aspx"
+
+FETCH_MODES = ("browser", "http")
+
+
+def requests_get_text(url: str) -> str:
+    """Default HTTP client, sends a GET request and returns the response body"""
+    import requests
+
+    response = requests.get(url, timeout=60)
+
+    response.raise_for_status()
+
+    return response.text
+
+
+class MasterAnglerTableParser(HTMLParser):
+    """Single pass over the page html that collects the body rows of every thisTable-{year} table. Rows and cells
+    are joined the same way the browser's inner_text does for a <tbody>, cells with tabs and rows with new lines,
+    so the output can go to process_master_angler_data as is.
+
+        parser = MasterAnglerTableParser()
+        parser.feed(html)
+        parser.tables  # {"2023": "John\tCatfish\t23\tWash Park\tJune/2023\tYes\n..."}
+    """
+
+    TABLE_ID_PREFIX = "thisTable-"
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.tables = {}
+        self._rows_by_year = {}
+        self._table_depth = 0
+        self._current_year = None
+        self._in_body = False
+        self._current_row = None
+        self._current_cell = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "table":
+            if self._current_year is not None:
+                # A table inside one of the year tables, its text still belongs to the current cell
+                self._table_depth += 1
+                return
+
+            table_id = dict(attrs).get("id") or ""
+
+            if table_id.startswith(self.TABLE_ID_PREFIX):
+                self._current_year = table_id[len(self.TABLE_ID_PREFIX) :]
+                self._rows_by_year.setdefault(self._current_year, [])
+
+        elif self._current_year is None or self._table_depth:
+            return
+
+        elif tag == "tbody":
+            self._in_body = True
+
+        elif tag == "tr" and self._in_body:
+            self._current_row = []
+
+        elif tag in ("td", "th") and self._current_row is not None:
+            self._current_cell = []
+
+        elif tag == "br" and self._current_cell is not None:
+            self._current_cell.append(" ")
+
+    def handle_endtag(self, tag):
+        if self._current_year is None:
+            return
+
+        if tag == "table":
+            if self._table_depth:
+                self._table_depth -= 1
+            else:
+                self.tables[self._current_year] = "\n".join(
+                    self._rows_by_year.pop(self._current_year)
+                )
+                self._current_year = None
+                self._in_body = False
+
+        elif self._table_depth:
+            return
+
+        elif tag == "tbody":
+            self._in_body = False
+
+        elif tag in ("td", "th") and self._current_cell is not None:
+            self._current_row.append(" ".join("".join(self._current_cell).split()))
+            self._current_cell = None
+
+        elif tag == "tr" and self._current_row is not None:
+            self._rows_by_year[self._current_year].append("\t".join(self._current_row))
+            self._current_row = None
+
+    def handle_data(self, data):
+        if self._current_cell is not None:
+            self._current_cell.append(data)
+
+
+def parse_master_angler_html(html: str) -> list:
+    """Reads every year table out of the Master Angler page html.
+
+    :param html: the page source
+    :return: one string per year in the order the tables appear on the page, in the format expected by
+             process_master_angler_data
+    """
+    parser = MasterAnglerTableParser()
+
+    parser.feed(html)
+    parser.close()
+
+    logger.info(f"Found tables for years: {list(parser.tables)}")
+
+    return list(parser.tables.values())
+
 
 class MasterAnglerScraper:
-    def adjust_xpath(
-        self, xpath: str, page: playwright.sync_api._generated.Page
-    ) -> str:
+    def __init__(
+        self,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        fetch_mode: str = "browser",
+        http_get=requests_get_text,
+    ):
+        """
+        :param concurrency: number of year tabs scraped at the same time, each in its own page
+        :param fetch_mode: "browser" clicks through every page of every year, "http" downloads the page once and
+                           parses the tables. If "http" does not find any tables it falls back to the browser.
+        :param http_get: callable(url) that returns the page html, only used by the "http" fetch mode
+        """
+        if fetch_mode not in FETCH_MODES:
+            raise ValueError(
+                f"fetch_mode must be one of {FETCH_MODES}. Received {fetch_mode}"
+            )
+
+        self.concurrency = concurrency
+        self.fetch_mode = fetch_mode
+        self.http_get = http_get
+
+    async def adjust_xpath(self, xpath: str, page: Page) -> str:
         """Given an xpath for the master angler next page tab. This function will chech the xpath text.
         If it's a number it will check to the right, if it's a non digit it will check left.
 
@@ -57,7 +203,7 @@ class MasterAnglerScraper:
 
         try:
             # Get the text of our xpath
-            xpath_text = page.query_selector(xpath).inner_text()
+            xpath_text = await (await page.query_selector(xpath)).inner_text()
 
             if xpath_text == "›":
                 logger.info(f"Found correct xpath: {xpath}")
@@ -74,130 +220,227 @@ class MasterAnglerScraper:
                     f"index = {number}, Next xpath = {next_xpath}, xpath_text={xpath_text}"
                 )
 
-            return self.adjust_xpath(next_xpath, page)
+            return await self.adjust_xpath(next_xpath, page)
 
         except AttributeError:
             # if it's none we need to restart, otherwise script checks for nothing and misses data
             next_xpath = xpath.replace(elt, "[3]")
 
-            return self.adjust_xpath(next_xpath, page)
-
-    def scrape_website(self, playwright: sync_playwright) -> list:
-        """Opens Master angler website and scrapes data from each page. This will iterate through each year and then
-        iterate through each page of results within each year.
-        """
-        chromium = playwright.chromium
-
-        browser = chromium.launch(headless=False, args=["--start-fullscreen"])
+            return await self.adjust_xpath(next_xpath, page)
 
-        page = browser.new_page()
+    async def find_year_tabs(self, page: Page) -> list:
+        """Reads the year tabs at the top of the page, starting with the first tab and stopping at the
+        current year.
 
-        url = "https://cpw.state.co.us/learn/Pages/MasterAngler.aspx"
-
-        page.goto(url)
+        :return: list of (tab number, tab year). Example: [(1, "2021"), (2, "2022"), (3, "2023")]
+        """
+        await page.goto(MASTER_ANGLER_URL)
 
-        # Start with the first tab
         next_year_exists, year_tab, current_year = (
             True,
             1,
             datetime.today().strftime("%Y"),
         )
 
-        records = []
+        year_tabs = []
         # As long as we find a year that exists...
         while next_year_exists == True:
             # Check that the page loads, xpath notes the tab number
-            element = page.wait_for_selector(
+            element = await page.wait_for_selector(
                 f'//*[@id="ui-id-{year_tab}"]', timeout=30_000
             )
 
-            tab_year = element.inner_text()
+            tab_year = await element.inner_text()
+
+            year_tabs.append((year_tab, tab_year))
+
+            # Move on to the next tab
+            year_tab += 1
+            if current_year == tab_year:
+                next_year_exists = False
+            else:
+                next_year_exists = True
+
+        logger.info(f"Found year tabs: {[tab_year for _, tab_year in year_tabs]}")
 
-            logger.info(f"Scraping data for year {tab_year}")
+        return year_tabs
 
-            element.click()
+    async def scrape_year(
+        self, page: Page, year_tab: int, tab_year: str, emit=None
+    ) -> list:
+        """Opens a year tab and iterates through each page of results within the year.
 
-            next_element_exists, page_number = True, 1
+        :param page: the playwright page object we are using to interact with the website
+        :param year_tab: the tab number, used for the tabs xpath
+        :param tab_year: the text of the tab, used for the table xpaths
+        :param emit: optional async callback, awaited with the text of every table page as soon as it is read
 
-            start_xpath, data_xpath, row_tabs = (
-                f'//*[@id="thisTable-{tab_year}"]/tfoot/tr/td/div/ul/li[11]/a',
-                f'//*[@id="thisTable-{tab_year}"]/tbody',
-                f'//*[@id="thisTable-{tab_year}"]/tfoot/tr/td/div/ul',
-            )
+        :return: the text of each table page for the year
+        """
+        records = []
 
-            while next_element_exists == True:
-                # Get the table data
-                page_records = page.query_selector(data_xpath).inner_text()
-                records.append(page_records)
+        await page.goto(MASTER_ANGLER_URL)
 
-                try:
-                    next_page_icon = page.query_selector(start_xpath).inner_text()
+        element = await page.wait_for_selector(
+            f'//*[@id="ui-id-{year_tab}"]', timeout=30_000
+        )
 
-                    next_page_exist = next_page_icon == "›"
+        logger.info(f"Scraping data for year {tab_year}")
 
-                except AttributeError as e:
-                    logger.warning(f"Experiencing an AttributeError: {e}")
+        await element.click()
 
-                    logger.info("Attempting to recolve by adjusting xpath...")
+        next_element_exists, page_number = True, 1
 
-                    start_xpath = self.adjust_xpath(start_xpath, page)
+        start_xpath, data_xpath, row_tabs = (
+            f'//*[@id="thisTable-{tab_year}"]/tfoot/tr/td/div/ul/li[11]/a',
+            f'//*[@id="thisTable-{tab_year}"]/tbody',
+            f'//*[@id="thisTable-{tab_year}"]/tfoot/tr/td/div/ul',
+        )
 
-                    next_page_exist = (
-                        page.query_selector(start_xpath).inner_text() == "›"
-                    )
+        while next_element_exists == True:
+            # Get the table data
+            page_records = await (await page.query_selector(data_xpath)).inner_text()
+            records.append(page_records)
 
-                    logger.info("Successfully resolved by adjusting xpath!")
+            if emit is not None:
+                await emit(page_records)
 
-                if next_page_exist:
-                    page.query_selector(start_xpath).click()
+            try:
+                next_page_icon = await (
+                    await page.query_selector(start_xpath)
+                ).inner_text()
 
-                    logging.debug(
-                        f"Page Number {page_number}, Next Page Icon {next_page_icon} Correct Icon? {next_page_exist}"
-                    )
+                next_page_exist = next_page_icon == "›"
 
-                    page_number += 1
-                # the > character has shifted we want to adjust the xpath so we can continue paginating
-                else:
-                    next_element_same_row = (
-                        str(page_number + 1)
-                        in page.query_selector(row_tabs).inner_text()
-                    )
+            except AttributeError as e:
+                logger.warning(f"Experiencing an AttributeError: {e}")
 
-                    logging.debug(
-                        f"Does the next element ({page_number}) exist on the same row? {next_element_same_row}"
-                    )
+                logger.info("Attempting to recolve by adjusting xpath...")
 
-                    if next_element_same_row:
-                        logging.warning(
-                            "Cannot find next page tab with current xpath, trying to resolved by adjusting xpath..."
-                        )
-                        start_xpath = self.adjust_xpath(start_xpath, page)
-                    else:
-                        next_element_exists = False
+                start_xpath = await self.adjust_xpath(start_xpath, page)
 
-                next_page_check = (
-                    str(page_number) in page.query_selector(row_tabs).inner_text()
-                )
-                logging.debug(f"Next number exist? {next_page_check}")
-                if not next_page_check:
-                    next_element_exists = False
+                next_page_icon = await (
+                    await page.query_selector(start_xpath)
+                ).inner_text()
 
-            logger.info(f"There were {page_number-1} pages for year {tab_year}")
+                next_page_exist = next_page_icon == "›"
 
-            # Move on to the next tab
-            year_tab += 1
-            if current_year == tab_year:
-                next_year_exists = False
+                logger.info("Successfully resolved by adjusting xpath!")
+
+            if next_page_exist:
+                await (await page.query_selector(start_xpath)).click()
+
+                logging.debug(
+                    f"Page Number {page_number}, Next Page Icon {next_page_icon} Correct Icon? {next_page_exist}"
+                )
+
+                page_number += 1
+            # the > character has shifted we want to adjust the xpath so we can continue paginating
             else:
-                next_year_exists = True
+                next_element_same_row = (
+                    str(page_number + 1)
+                    in await (await page.query_selector(row_tabs)).inner_text()
+                )
 
-        browser.close()
+                logging.debug(
+                    f"Does the next element ({page_number}) exist on the same row? {next_element_same_row}"
+                )
+
+                if next_element_same_row:
+                    logging.warning(
+                        "Cannot find next page tab with current xpath, trying to resolved by adjusting xpath..."
+                    )
+                    start_xpath = await self.adjust_xpath(start_xpath, page)
+                else:
+                    next_element_exists = False
+
+            next_page_check = (
+                str(page_number)
+                in await (await page.query_selector(row_tabs)).inner_text()
+            )
+            logging.debug(f"Next number exist? {next_page_check}")
+            if not next_page_check:
+                next_element_exists = False
+
+        logger.info(f"There were {page_number-1} pages for year {tab_year}")
 
         return records
 
-    def execute(self):
-        """Creates a playwright instance and passes that into scrape website"""
-        with sync_playwright() as playwright:
-            raw_data = self.scrape_website(playwright)
+    async def _scrape_year_in_new_page(
+        self, browser, year_tab: int, tab_year: str, emit=None
+    ):
+        async with open_page(browser) as page:
+            return await self.scrape_year(page, year_tab, tab_year, emit)
+
+    async def scrape_website(self, browser, emit=None) -> list:
+        """Opens Master angler website and scrapes data from each page. Every year tab is scraped in its own
+        page, up to concurrency years at a time. Records are returned in year order.
+
+        :param emit: optional async callback, awaited with the text of every table page as soon as it is read
+        """
+        async with open_page(browser) as page:
+            year_tabs = await self.find_year_tabs(page)
+
+        records_by_year = await gather_bounded(
+            [
+                self._scrape_year_in_new_page(browser, year_tab, tab_year, emit)
+                for year_tab, tab_year in year_tabs
+            ],
+            self.concurrency,
+        )
+
+        return [
+            page_records
+            for year_records in records_by_year
+            for page_records in year_records
+        ]
+
+    def fetch_website(self) -> list:
+        """Downloads the Master Angler page once and parses every years table out of the html"""
+        return parse_master_angler_html(self.http_get(MASTER_ANGLER_URL))
+
+    async def execute_async(self) -> list:
+        """Fetches the tables over http when fetch_mode is "http", otherwise launches a browser and passes that
+        into scrape website.
+        """
+        if self.fetch_mode == "http":
+            raw_data = self.fetch_website()
+
+            if raw_data:
+                return raw_data
+
+            logger.warning(
+                "Did not find any tables in the page html, falling back to the browser"
+            )
+
+        async with launch_browser(headless=False) as browser:
+            raw_data = await self.scrape_website(browser)
 
         return raw_data
+
+    def execute(self) -> list:
+        """Synchronous entry point, runs execute_async on a new event loop"""
+        return asyncio.run(self.execute_async())
+
+    def iter_pages(self):
+        """Same as execute but yields the text of every table page as soon as it is read instead of returning
+        all of them at the end. Years are scraped at the same time in the browser, so pages come in the order they
+        finish rather than year order.
+        """
+        if self.fetch_mode == "http":
+            raw_data = self.fetch_website()
+
+            if raw_data:
+                yield from raw_data
+
+                return
+
+            logger.warning(
+                "Did not find any tables in the page html, falling back to the browser"
+            )
+
+        async def produce(emit):
+            async with launch_browser(headless=False) as browser:
+                await self.scrape_website(browser, emit)
+
+        yield from iterate_in_thread(produce)
@@ -0,0 +1,293 @@
+""" Waits that block on what the page is doing instead of sleeping for a fixed amount of time.
+
+The Fishing Atlas popup goes through the following states after a feature is clicked
+
+    [previous popup text] -> [Loading...] -> [Water: Arthur Lake ...]
+
+so rather than sleeping and checking, a MutationObserver watches the popup and resolves as soon as the text is new
+and no longer "Loading...". How long that took is fed back into an AdaptiveTimeout so slow sessions get longer
+timeouts and fast ones fail fast, and into FeatureWaitTimings which logs a histogram of the waits for a species.
+
+The search results are a dgrid that only renders the rows near where its list is scrolled to, so scroll_to_grid_row
+scrolls it until a row is in the page before the row is waited on.
+"""
+
+import time
+import logging
+from bisect import bisect_left
+
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+logger = logging.getLogger(__name__)
+
+# The per feature sleep the atlas scraper used before it waited on page signals
+FIXED_SLEEP_SECONDS = 3
+
+LOADING_TEXT = "Loading..."
+
+# Resolves with the popup text once the popup is visible, its text changed from previous_text and it is not loading
+WAIT_FOR_POPUP_TEXT_JS = """
+([xpath, previousText, loadingText, timeoutMs]) => new Promise((resolve, reject) => {
+    const readPopup = () => {
+        const popup = document.evaluate(
+            xpath, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null
+        ).singleNodeValue;
+
+        if (!popup || popup.offsetParent === null) {
+            return null;
+        }
+
+        const text = popup.innerText;
+
+        if (!text || text === previousText || text.includes(loadingText)) {
+            return null;
+        }
+
+        return text;
+    };
+
+    const text = readPopup();
+
+    if (text !== null) {
+        resolve(text);
+        return;
+    }
+
+    const observer = new MutationObserver(() => {
+        const text = readPopup();
+
+        if (text !== null) {
+            observer.disconnect();
+            clearTimeout(timer);
+            resolve(text);
+        }
+    });
+
+    const timer = setTimeout(() => {
+        observer.disconnect();
+        reject(new Error(`Popup text did not change within ${timeoutMs}ms`));
+    }, timeoutMs);
+
+    observer.observe(document.body, {
+        childList: true,
+        subtree: true,
+        characterData: true,
+        attributes: true,
+    });
+})
+"""
+
+
+# Row numbers of the rows a dgrid has in the page, rows have ids like dgrid_1-row-12
+GRID_ROWS_JS = """
+(gridId) => Array.from(document.querySelectorAll(`[id^="${gridId}-row-"]`))
+    .map((row) => Number(row.id.slice(gridId.length + "-row-".length)))
+    .filter((row) => Number.isInteger(row))
+"""
+
+# Scrolls the dgrid's list a screen up or down and resolves with its row numbers once the rendered rows change, or
+# with the same rows once the timeout is up
+SCROLL_GRID_JS = """
+([gridId, direction, timeoutMs]) => new Promise((resolve) => {
+    const readRows = () => Array.from(document.querySelectorAll(`[id^="${gridId}-row-"]`))
+        .map((row) => Number(row.id.slice(gridId.length + "-row-".length)))
+        .filter((row) => Number.isInteger(row));
+
+    const previousRows = readRows().join();
+
+    const scroller = document.querySelector(`#${gridId} .dgrid-scroller`);
+
+    const observer = new MutationObserver(() => {
+        if (readRows().join() !== previousRows) {
+            observer.disconnect();
+            clearTimeout(timer);
+            resolve(readRows());
+        }
+    });
+
+    const timer = setTimeout(() => {
+        observer.disconnect();
+        resolve(readRows());
+    }, timeoutMs);
+
+    // Before the results are shown there is nothing to scroll, the wait is for the first rows
+    observer.observe(scroller || document.body, { childList: true, subtree: true });
+
+    if (scroller) {
+        scroller.scrollTop += direction * scroller.clientHeight;
+    }
+})
+"""
+
+# How long one scroll of the grid waits for rows to be rendered
+GRID_RENDER_TIMEOUT_MS = 1_000
+
+
+def is_identify_response(response) -> bool:
+    """The map sends an ArcGIS identify request when it is clicked, the popup is filled in from its response."""
+    return "/identify" in response.url
+
+
+async def wait_for_popup_text(
+    page, xpath: str, previous_text: str, timeout_ms: float
+) -> str:
+    """Waits for the popup to show text that is new and has finished loading.
+
+    :param page: the playwright page object we are using to interact with the website
+    :param xpath: xpath of the popup
+    :param previous_text: text of the popup before the click, the wait ends once the text is different
+    :param timeout_ms: how long to wait before raising an error
+
+    :return: the popup text
+    """
+    return await page.evaluate(
+        WAIT_FOR_POPUP_TEXT_JS, [xpath, previous_text, LOADING_TEXT, timeout_ms]
+    )
+
+
+async def scroll_to_grid_row(page, grid_id: str, row: int, timeout_ms: float) -> None:
+    """Scrolls a dgrid a screen at a time towards a row until the row is rendered. A page that was just searched only
+    has the first rows of the results, the rest are added as the list is scrolled down.
+
+    :param page: the playwright page object we are using to interact with the website
+    :param grid_id: id of the grid, Example: "dgrid_1"
+    :param row: row number in the grid
+    :param timeout_ms: how long to scroll for before raising an error
+    """
+    deadline = time.perf_counter() + timeout_ms / 1_000
+
+    rendered_rows = await page.evaluate(GRID_ROWS_JS, grid_id)
+
+    while row not in rendered_rows:
+        if time.perf_counter() > deadline:
+            raise PlaywrightTimeoutError(
+                f"Row {row} of {grid_id} was not rendered within {timeout_ms}ms"
+            )
+
+        # Back up when every rendered row comes after the row, rows far above the list are removed as it scrolls
+        direction = -1 if rendered_rows and min(rendered_rows) > row else 1
+
+        rendered_rows = await page.evaluate(
+            SCROLL_GRID_JS, [grid_id, direction, GRID_RENDER_TIMEOUT_MS]
+        )
+
+
+class AdaptiveTimeout:
+    """A timeout that follows how long recent waits took. The timeout is a multiple of the 95th percentile of the
+    most recent waits, kept between a minimum and a maximum. Until there are any waits the initial timeout is used.
+    """
+
+    def __init__(
+        self,
+        initial_ms: float = 10_000,
+        minimum_ms: float = 2_000,
+        maximum_ms: float = 30_000,
+        multiplier: float = 3.0,
+        window: int = 50,
+    ):
+        """
+        :param initial_ms: timeout used before any waits have been observed
+        :param minimum_ms: the timeout never goes below this
+        :param maximum_ms: the timeout never goes above this
+        :param multiplier: how many times the 95th percentile wait the timeout is
+        :param window: number of recent waits that are considered
+        """
+        self.initial_ms = initial_ms
+        self.minimum_ms = minimum_ms
+        self.maximum_ms = maximum_ms
+        self.multiplier = multiplier
+        self.window = window
+        self.recent_waits = []
+
+    def observe(self, elapsed_ms: float) -> None:
+        """Adds a successful wait so future timeouts are based on it."""
+        self.recent_waits.append(elapsed_ms)
+
+        if len(self.recent_waits) > self.window:
+            self.recent_waits.pop(0)
+
+    @property
+    def timeout_ms(self) -> float:
+        if not self.recent_waits:
+            return self.initial_ms
+
+        timeout = self.multiplier * percentile(self.recent_waits, 95)
+
+        return min(self.maximum_ms, max(self.minimum_ms, timeout))
+
+
+def percentile(values: list, percent: float) -> float:
+    """Nearest rank percentile of a list of numbers"""
+    ordered_values = sorted(values)
+
+    rank = max(1, -(-len(ordered_values) * percent // 100))
+
+    return ordered_values[int(rank) - 1]
+
+
+class FeatureWaitTimings:
+    """Collects how long each feature waited for the page and logs a histogram, so the time saved compared
+    to the old fixed sleeps can be measured.
+    """
+
+    # Upper bound of each histogram bucket in seconds, anything slower goes into the last bucket
+    BUCKETS_SECONDS = (0.25, 0.5, 1, 2, 3, 5, 10)
+
+    def __init__(self, name: str):
+        """
+        :param name: what the timings are for, used in the logs. Example: "Trout: Brook"
+        """
+        self.name = name
+        self.waits = []
+
+    def start(self) -> float:
+        """Returns a start time to pass into stop"""
+        return time.perf_counter()
+
+    def stop(self, start_time: float) -> float:
+        """Records the time since start_time and returns it in seconds"""
+        elapsed_seconds = time.perf_counter() - start_time
+
+        self.waits.append(elapsed_seconds)
+
+        return elapsed_seconds
+
+    def histogram(self) -> dict:
+        """Counts the waits in each bucket.
+
+        :return: bucket label and count, Example: {"<=0.25s": 0, "<=0.5s": 3, ..., ">10s": 0}
+        """
+        labels = [f"<={bucket}s" for bucket in self.BUCKETS_SECONDS] + [
+            f">{self.BUCKETS_SECONDS[-1]}s"
+        ]
+
+        counts = [0] * len(labels)
+
+        for wait in self.waits:
+            counts[bisect_left(self.BUCKETS_SECONDS, wait)] += 1
+
+        return dict(zip(labels, counts))
+
+    def log_summary(self) -> None:
+        """Logs the histogram and how the total wait compares to the old fixed sleep per feature."""
+        if not self.waits:
+            logger.info(f"No feature waits were recorded for {self.name}")
+            return
+
+        total_wait = sum(self.waits)
+
+        fixed_sleep_total = FIXED_SLEEP_SECONDS * len(self.waits)
+
+        logger.info(
+            f"Feature waits for {self.name}: {len(self.waits)} features, total {total_wait:.1f}s, "
+            f"p50 {percentile(self.waits, 50):.2f}s, p95 {percentile(self.waits, 95):.2f}s, "
+            f"max {max(self.waits):.2f}s. The fixed {FIXED_SLEEP_SECONDS}s sleep alone would have taken "
+            f"{fixed_sleep_total:.1f}s, saved {fixed_sleep_total - total_wait:.1f}s"
+        )
+
+        largest_count = max(self.histogram().values())
+
+        for label, count in self.histogram().items():
+            bar = "#" * round(40 * count / largest_count) if largest_count else ""
+
+            logger.info(f"{label:>8} | {count:>5} | {bar}")
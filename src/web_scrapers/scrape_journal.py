@@ -0,0 +1,123 @@
+""" An append only journal of scraped Fishing Atlas features so a run that fails part way through can pick up where it
+stopped instead of starting the species over from the first feature.
+
+Every line of the file is a json object, one of
+
+    {"species": "Trout: Brook", "index": 12, "record": "Arthur LakeXXXX..."}   a scraped feature
+    {"species": "Trout: Brook", "complete": true, "features": 200}            every feature of the species is scraped
+
+Lines are only ever appended, so a crash can at worst leave a partial last line. The next load cuts it off the file
+before anything else is appended, the feature on it is scraped again.
+"""
+
+import os
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ScrapeJournal:
+    def __init__(self, path: str):
+        """
+        :param path: location of the journal file, it is created on the first write
+        """
+        self.path = path
+        self.features = {}
+        self.complete_species = set()
+        self.load()
+
+    def load(self) -> None:
+        """Reads every entry already in the journal file. A partial last line left by a crash is cut off the file, so
+        the next entry appended starts on a line of its own.
+        """
+        self.features, self.complete_species = {}, set()
+
+        if not os.path.exists(self.path):
+            return
+
+        with open(self.path, "rb+") as journal_file:
+            content = journal_file.read()
+
+            if content and not content.endswith(b"\n"):
+                last_line_start = content.rfind(b"\n") + 1
+
+                if self._read_entry(content[last_line_start:]) is None:
+                    logger.warning(
+                        f"Removing the partial last line of {self.path}, the last run likely stopped while writing it"
+                    )
+                    content = content[:last_line_start]
+                    journal_file.truncate(last_line_start)
+                else:
+                    # The entry is whole, only its line end is missing
+                    journal_file.write(b"\n")
+
+        for line_number, line in enumerate(content.splitlines(), start=1):
+            entry = self._read_entry(line)
+
+            if entry is None:
+                logger.warning(f"Skipping unreadable line {line_number} in {self.path}")
+                continue
+
+            if entry.get("complete"):
+                self.complete_species.add(entry["species"])
+            else:
+                species_features = self.features.setdefault(entry["species"], {})
+                species_features[entry["index"]] = entry["record"]
+
+        logger.info(
+            f"Loaded {sum(len(features) for features in self.features.values())} features "
+            f"and {len(self.complete_species)} complete species from {self.path}"
+        )
+
+    @staticmethod
+    def _read_entry(line: bytes):
+        """The entry on a line of the journal, None when the line can not be read"""
+        try:
+            return json.loads(line.decode("utf-8"))
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            return None
+
+    def _append(self, entry: dict) -> None:
+        with open(self.path, "a", encoding="utf-8") as journal_file:
+            journal_file.write(json.dumps(entry) + "\n")
+            journal_file.flush()
+
+    def record_feature(self, fish_species: str, index: int, record: str) -> None:
+        """Saves a scraped feature.
+
+        :param fish_species: species search term, Example: "Trout: Brook"
+        :param index: row number of the feature in the search results
+        :param record: the scraped text for the feature
+        """
+        self._append({"species": fish_species, "index": index, "record": record})
+
+        self.features.setdefault(fish_species, {})[index] = record
+
+    def record_species_complete(self, fish_species: str, features_number: int) -> None:
+        """Marks every feature of the species as scraped"""
+        self._append(
+            {"species": fish_species, "complete": True, "features": features_number}
+        )
+
+        self.complete_species.add(fish_species)
+
+    def completed_features(self, fish_species: str) -> dict:
+        """Features of the species already in the journal, keyed by row number"""
+        return self.features.get(fish_species, {})
+
+    def is_species_complete(self, fish_species: str) -> bool:
+        return fish_species in self.complete_species
+
+    def species_records(self, fish_species: str) -> list:
+        """Records of the species in the order of the search results"""
+        features = self.completed_features(fish_species)
+
+        return [features[index] for index in sorted(features)]
+
+    def clear(self) -> None:
+        """Removes the journal once a run has finished so the next run starts fresh"""
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+        self.features, self.complete_species = {}, set()
@@ -53,6 +53,37 @@ def test_parse_location_data():
                             'Longitude: -106.32702 W'
                         ]
     
+def test_parse_location_fields():
+
+    current_directory = os.getcwd()
+
+    data_directory = os.path.join(current_directory, 'tests', 'data')
+
+    with open(os.path.join(data_directory, "parse_location.txt"), 'r') as file:
+        fishing_location_string = file.read()
+
+    with open(os.path.join(data_directory, "parse_coordinates.txt"), 'r') as file:
+        coordinates_string = file.read()
+
+    fishing_location_string = fishing_location_string.replace("Trout: Golden", "Walleye")
+
+    clean_data = clean_atlas_data.parse_location_fields(fishing_location_string, coordinates_string)
+
+    assert clean_data == {
+                            'Fish Species ': ' Cutthroat,Walleye',
+                            'Water': ' Arthur Lake',
+                            'County': ' Chaffee',
+                            'Property name': ' San Isabel National Forest',
+                            'Ease of access': ' Difficult',
+                            'Boating': ' None',
+                            'Fishing pressure': ' Low',
+                            'Stocked': ' No',
+                            'Elevation(ft)': ' 1,000',
+                            'Latitude': ' 38.60092 N',
+                            'Longitude': ' -106.32702 W'
+                        }
+
+
 def test_align_lists_add_na():
     start_dict = {
         'A' : [1],
@@ -83,25 +114,24 @@ def test_align_lists_no_change():
 
 
 @patch('src.data_processing.clean_atlas_data.split_location_data')
-@patch('src.data_processing.clean_atlas_data.parse_location_data')
-@patch('src.data_processing.clean_atlas_data.align_lists')
-# assert what was passed into clean_atlas()
-def test_process_all_location_data(mock_align_lists, mock_parse_location_data, mock_split_location_data):
+@patch('src.data_processing.clean_atlas_data.parse_location_fields')
+# assert what came out of process_all_location_data()
+def test_process_all_location_data(mock_parse_location_fields, mock_split_location_data):
 
     mock_split_location_data.return_value = ('A', 'B')
-    mock_parse_location_data.return_value = [   
-                                                'Fish Species: Cutthroat, Golden',
-                                                'Water: Arthur Lake',
-                                                'County: Chaffee',
-                                                'Property name: San Isabel National Forest',
-                                                'Ease of access: Difficult',
-                                                'Boating: None',
-                                                'Fishing pressure: Low',
-                                                'Stocked: No',
-                                                'Elevation(ft): 1,000',
-                                                'Latitude: 38.60092 N',
-                                                'Longitude: -106.32702 W'
-                                            ]
+    mock_parse_location_fields.return_value = {
+                                                'Fish Species': ' Cutthroat, Golden',
+                                                'Water': ' Arthur Lake',
+                                                'County': ' Chaffee',
+                                                'Property name': ' San Isabel National Forest',
+                                                'Ease of access': ' Difficult',
+                                                'Boating': ' None',
+                                                'Fishing pressure': ' Low',
+                                                'Stocked': ' No',
+                                                'Elevation(ft)': ' 1,000',
+                                                'Latitude': ' 38.60092 N',
+                                                'Longitude': ' -106.32702 W'
+                                            }
 
     correct_dict = {
             'Fish Species' : [' Cutthroat, Golden'],
@@ -112,12 +142,38 @@ def test_process_all_location_data(mock_align_lists, mock_parse_location_data, m
             'Boating': [' None'],
             'Fishing pressure': [' Low'],
             'Stocked': [' No'],
-            'Elevation(ft)': [' 1,000'],
-            'Latitude': [' 38.60092 N'],
-            'Longitude':[' -106.32702 W'],
+            'Elevation(ft)': [1000],
+            'Latitude': [38.60092],
+            'Longitude':[-106.32702],
         }
 
-    clean_atlas_data.process_all_location_data(["Starter StringXXXX"])
+    df = clean_atlas_data.process_all_location_data(["Starter StringXXXX"])
+
+    assert correct_dict == df.to_dict(orient='list')
+
+
+def test_columnar_record_builder():
+
+    builder = clean_atlas_data.ColumnarRecordBuilder()
+
+    builder.add_row({'A': 1, 'B': 2})
+    builder.add_row({'A': 3})
+    builder.add_row({'C': 4, 'A': 5})
+
+    assert builder.to_dict() == {
+        'A' : [1, 3, 5],
+        'B' : [2, 'NA', 'NA'],
+        'C' : ['NA', 'NA', 4]
+    }
+
+    assert list(builder.to_dataframe().columns) == ['A', 'B', 'C']
+
+
+def test_columnar_record_builder_empty():
+
+    builder = clean_atlas_data.ColumnarRecordBuilder()
+
+    assert builder.to_dict() == {}
 
-    assert correct_dict == mock_align_lists.call_args[0][0]
+    assert builder.to_dataframe().empty
     
@@ -22,14 +22,61 @@ def test_process_master_angler_data():
         {
             "Angler" : ["Trey", "Tanner"],
             "Species" : ["Catfish", "Catfish"],
-            "Length" : ["23", "38"],
+            "Length" : pd.array([23, 38], dtype="Int8"),
             "Location" : ["Lon Hagler", "Boyd Lake"],
-            "Date" : ["July\\2023", "June\\2023"],
+            "Date" : pd.to_datetime(["2023-07-01", "2023-06-01"]),
             "Released" : ["Yes", "No"],
         }
-    )
+    ).astype({"Species": "category", "Location": "category", "Released": "category"})
 
     column_order = correct_df.columns 
 
-    assert correct_df[column_order].equals(processed_df[column_order])
-    
\ No newline at end of file
+    pd.testing.assert_frame_equal(correct_df[column_order], processed_df[column_order])
+    
+
+@mock.patch('src.data_processing.clean_master_angler_data.logging')
+def test_process_master_angler_data_incomplete_rows(mock_logging):
+
+    raw_data = [
+        "Trey\tCatfish\t23\tLon Hagler\tJuly\\2023\tYes\nTanner\tCatfish\t38",
+        "\n\tBrown\nNA\tWalleye\t27\t\"Boyd\" Lake\tJune\\2023\tNo\n",
+    ]
+
+    processed_df = clean_master_angler_data.process_master_angler_data(raw_data)
+
+    assert processed_df.to_dict(orient='list') == {
+        "Angler" : ["Trey", "NA"],
+        "Species" : ["Catfish", "Walleye"],
+        "Length" : [23, 27],
+        "Location" : ["Lon Hagler", "\"Boyd\" Lake"],
+        "Date" : [pd.Timestamp("2023-07-01"), pd.Timestamp("2023-06-01")],
+        "Released" : ["Yes", "No"],
+    }
+
+    # Empty rows and rows starting with a tab are dropped without a warning
+    assert [call.args[0] for call in mock_logging.warning.call_args_list] == [
+        "Incomplete record with 3 item(s). Length of first element: 6"
+    ]
+
+
+def test_process_master_angler_data_no_rows():
+
+    processed_df = clean_master_angler_data.process_master_angler_data(["", "Trey"])
+
+    assert list(processed_df.columns) == ["Angler", "Species", "Length", "Location", "Date", "Released"]
+
+    assert processed_df.empty
+
+
+def test_iter_master_angler_batches():
+
+    raw_data = (
+        "\n".join(f"Angler {i}\tCatfish\t23\tBoyd Lake\tJune\\2023\tNo" for i in range(page, page + 3))
+        for page in range(0, 12, 3)
+    )
+
+    batches = list(clean_master_angler_data.iter_master_angler_batches(raw_data, batch_size=5))
+
+    assert [len(batch) for batch in batches] == [6, 6]
+
+    assert pd.concat(batches).Angler.to_list() == [f"Angler {i}" for i in range(12)]
@@ -0,0 +1,61 @@
+import os
+from unittest.mock import patch
+from src.data_processing import raw_page_cache, clean_atlas_data
+
+
+def test_diff_and_mark_uploaded(tmp_path):
+
+    cache = raw_page_cache.RawPageCache(str(tmp_path))
+
+    added_records, removed_keys = cache.diff("Trout: Brook", ["A", "B"])
+
+    assert added_records == ["A", "B"]
+    assert removed_keys == []
+    assert not cache.has_uploaded("Trout: Brook")
+
+    cache.mark_uploaded("Trout: Brook", ["A", "B"])
+    cache.save()
+
+    reloaded_cache = raw_page_cache.RawPageCache(str(tmp_path))
+
+    added_records, removed_keys = reloaded_cache.diff("Trout: Brook", ["B", "C"])
+
+    assert added_records == ["C"]
+    assert removed_keys == [raw_page_cache.RawPageCache.key("A")]
+    assert reloaded_cache.has_uploaded("Trout: Brook")
+
+
+def test_store_and_evict(tmp_path):
+
+    cache = raw_page_cache.RawPageCache(str(tmp_path), max_entries=2)
+
+    for raw_record in ["A", "B", "C"]:
+        cache.store(cache.key(raw_record), raw_record, {"Water": raw_record})
+
+    # Using A makes B the least recently used
+    assert cache.parsed_row(cache.key("A")) == {"Water": "A"}
+
+    cache.save()
+
+    assert cache.parsed_row(cache.key("B")) is None
+    assert cache.rows([cache.key("A"), cache.key("C")]) == [{"Water": "A"}, {"Water": "C"}]
+    assert cache.rows([cache.key("A"), cache.key("B")]) is None
+    assert not os.path.exists(cache._object_path(cache.key("B")))
+
+    with open(cache._object_path(cache.key("C")), "r") as object_file:
+        assert object_file.read() == "C"
+
+
+@patch("src.data_processing.clean_atlas_data.parse_raw_record")
+def test_process_all_location_data_uses_cache(mock_parse_raw_record, tmp_path):
+
+    mock_parse_raw_record.side_effect = lambda raw_record: {"Water": raw_record}
+
+    cache = raw_page_cache.RawPageCache(str(tmp_path))
+
+    clean_atlas_data.process_all_location_data(["A", "B"], cache)
+
+    df = clean_atlas_data.process_all_location_data(["A", "B", "C"], cache)
+
+    assert [call[0][0] for call in mock_parse_raw_record.call_args_list] == ["A", "B", "C"]
+    assert df.Water.to_list() == ["A", "B", "C"]
@@ -0,0 +1,62 @@
+import pandas as pd
+from src.data_processing import schema
+
+
+def test_to_coordinate():
+
+    coordinates = schema.to_coordinate(pd.Series([" 38.60092 N", " -106.32702 W", " 106.32702 W", "NA"]))
+
+    assert coordinates.dtype == "float64"
+
+    assert coordinates[:3].to_list() == [38.60092, -106.32702, -106.32702]
+
+    assert pd.isna(coordinates[3])
+
+
+def test_to_elevation():
+
+    elevations = schema.to_elevation(pd.Series([" 1,000", " 10,152", "NA"]))
+
+    assert elevations.dtype == "Int32"
+
+    assert elevations.to_list() == [1000, 10152, pd.NA]
+
+
+def test_to_length():
+
+    lengths = schema.to_length(pd.Series(["23", " 38", "abc", "150"]))
+
+    assert lengths.dtype == "Int8"
+
+    assert lengths.to_list() == [23, 38, pd.NA, pd.NA]
+
+
+def test_to_month():
+
+    dates = schema.to_month(pd.Series(["July\\2023", "June/2022 ", "Unknown"]))
+
+    assert dates[:2].to_list() == [pd.Timestamp("2023-07-01"), pd.Timestamp("2022-06-01")]
+
+    assert pd.isna(dates[2])
+
+
+def test_apply_schema():
+
+    df = pd.DataFrame(
+        {
+            "Water": [" Arthur Lake", " Boyd Lake"],
+            "County": [" Chaffee", " Chaffee"],
+            "Elevation(ft)": [" 1,000", "NA"],
+        }
+    )
+
+    typed_df = schema.apply_schema(df, schema.ATLAS_SCHEMA)
+
+    assert typed_df.dtypes.to_dict() == {
+        "Water": "object",
+        "County": "category",
+        "Elevation(ft)": "Int32",
+    }
+
+    # Columns in the schema but not in the dataframe are skipped
+    assert "Latitude" not in typed_df.columns
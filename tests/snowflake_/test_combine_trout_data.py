@@ -1,23 +1,29 @@
 import os
+import toml
 import pytest
 import pandas as pd
 from unittest.mock import Mock
-from src.snowflake_ import combine_trout_data
+from src.snowflake_ import combine_trout_data, snowflake_writer, storage
 
 def test_combine_trout_tables():
 
     mock_session = Mock()
 
+    all_columns = list(combine_trout_data.ALL_SPECIES_COLUMNS)
+
     mock_dict = {"""
     SELECT
-        TABLE_NAME
-    FROM storage_database.information_schema.TABLES
+        TABLE_NAME,
+        COLUMN_NAME
+    FROM storage_database.information_schema.COLUMNS
     WHERE
-        TABLE_NAME like 'Trout%' 
+        TABLE_NAME like 'Trout%'
         AND TABLE_SCHEMA = 'CPW_DATA'
+    ORDER BY TABLE_NAME
     """ : pd.DataFrame(
             {
-                "TABLE_NAME" : ["Trout: Brook"]
+                "TABLE_NAME" : ["Trout: Brook"] * len(all_columns) + ["Trout: Golden"] * (len(all_columns) - 1),
+                "COLUMN_NAME" : all_columns + [column for column in all_columns if column != "Property name"],
             }
         )
     }
@@ -28,22 +34,23 @@ def test_combine_trout_tables():
 
         def collect(self):
             return self.value
-        
+
         def to_pandas(self):
             return self.value
 
-    mock_session.sql.return_value = "test" 
-
     def mock_sql(query):
-        result_value = mock_dict.get(query, "test")
+        if "COUNT(*)" in query:
+            return SQLResult([("Brook", 2), ("Golden", 1)])
+
+        result_value = mock_dict.get(query, [(3,)])
         return SQLResult(result_value)
 
     mock_session.sql.side_effect = mock_sql
 
     combine_trout_data.combine_trout_tables(mock_session)
 
-    second_call = """
-        INSERT INTO STORAGE_DATABASE.CPW_DATA.ALL_SPECIES (
+    insert_call = """
+        INSERT INTO {shadow_table} (
             "main_species",
             "fish_species",
             "water",
@@ -59,7 +66,7 @@ def test_combine_trout_tables():
         )
 
         select
-            'Brook' as "main_species",          
+            'Brook' as "main_species",
             "Fish Species ",
             "Water",
             "County",
@@ -72,12 +79,122 @@ def test_combine_trout_tables():
             "Latitude",
             "Longitude"
         FROM STORAGE_DATABASE.CPW_DATA."Trout: Brook"
+        UNION ALL
+        select
+            'Golden' as "main_species",
+            "Fish Species ",
+            "Water",
+            "County",
+            NULL as "Property name",
+            "Ease of access",
+            "Boating",
+            "Fishing pressure",
+            "Stocked",
+            "Elevation(ft)",
+            "Latitude",
+            "Longitude"
+        FROM STORAGE_DATABASE.CPW_DATA."Trout: Golden"
         """
 
     def remove_newline_and_tab_chars(x: str):
         return ' '.join(x.split())
-    
-    print(remove_newline_and_tab_chars(second_call))
-    print(remove_newline_and_tab_chars(mock_session.sql.call_args_list[2][0][0]))
 
-    assert remove_newline_and_tab_chars(mock_session.sql.call_args_list[2][0][0]) == remove_newline_and_tab_chars(second_call)
+    queries = [call[0][0] for call in mock_session.sql.call_args_list]
+
+    # One round trip per step, the insert covers every table
+    assert [remove_newline_and_tab_chars(query).split()[0] for query in queries] == [
+        "SELECT",
+        "CREATE",
+        "INSERT",
+        "SELECT",
+        "SELECT",
+        "ALTER",
+        "DROP",
+    ]
+
+    shadow_table = queries[1].split()[4]
+
+    assert shadow_table.startswith("STORAGE_DATABASE.CPW_DATA.ALL_SPECIES_SHADOW_")
+
+    assert remove_newline_and_tab_chars(queries[2]) == remove_newline_and_tab_chars(
+        insert_call.format(shadow_table=shadow_table)
+    )
+
+    assert queries[5] == f"ALTER TABLE STORAGE_DATABASE.CPW_DATA.ALL_SPECIES SWAP WITH {shadow_table}"
+
+
+def test_combine_trout_tables_keeps_all_species_when_counts_differ():
+
+    mock_session = Mock()
+
+    class SQLResult:
+        def __init__(self, query):
+            self.query = query
+
+        def collect(self):
+            if "GROUP BY" in self.query:
+                # A row went missing from the shadow table
+                return [("Brook", 1)]
+
+            if "COUNT(*)" in self.query:
+                return [("Brook", 2)]
+
+            return [(2,)]
+
+        def to_pandas(self):
+            return pd.DataFrame({"TABLE_NAME": ["Trout: Brook"], "COLUMN_NAME": ["Water"]})
+
+    mock_session.sql.side_effect = SQLResult
+
+    with pytest.raises(ValueError):
+        combine_trout_data.combine_trout_tables(mock_session)
+
+    queries = [call[0][0] for call in mock_session.sql.call_args_list]
+
+    assert not any(query.startswith("ALTER") for query in queries)
+
+    assert queries[-1].startswith("DROP TABLE IF EXISTS STORAGE_DATABASE.CPW_DATA.ALL_SPECIES_SHADOW_")
+
+
+def test_combine_trout_tables_on_duckdb():
+
+    session = storage.DuckDBStorage().session()
+
+    setup_file = toml.load(os.path.join(os.getcwd(), "snowflake_setup.toml"))
+
+    session.sql(
+        next(table["ddl"] for table in setup_file["tables"] if table["table_name"] == "all_species_table")
+    ).collect()
+
+    for species, rows in [("Brook", 2), ("Brown", 3)]:
+        df = pd.DataFrame({"Water": [f"{species} Lake"] * rows, "Elevation(ft)": [9000] * rows})
+
+        session.write_pandas(
+            df, table_name=f"Trout: {species}", database="STORAGE_DATABASE", schema="CPW_DATA", auto_create_table=True
+        )
+
+    session.sql('insert into STORAGE_DATABASE.CPW_DATA.ALL_SPECIES ("water") values (\'Stale Lake\')').collect()
+
+    combine_trout_data.combine_trout_tables(session)
+
+    all_species_df = session.sql(
+        'select "main_species", "water" from STORAGE_DATABASE.CPW_DATA.ALL_SPECIES order by "water"'
+    ).to_pandas()
+
+    assert all_species_df.main_species.tolist() == ["Brook", "Brook", "Brown", "Brown", "Brown"]
+
+    # The shadow table is gone and ALL_SPECIES kept its autoincrement id
+    tables = session.sql(
+        "SELECT TABLE_NAME FROM storage_database.information_schema.TABLES WHERE TABLE_NAME like 'ALL_SPECIES%'"
+    ).to_pandas()
+
+    assert tables.TABLE_NAME.tolist() == ["ALL_SPECIES"]
+
+    assert session.sql(
+        'select count("all_species_id") from STORAGE_DATABASE.CPW_DATA.ALL_SPECIES'
+    ).collect()[0][0] == 5
+
+    # The writer's version creates ALL_SPECIES from the columns of the Trout tables
+    snowflake_writer.combine_trout_tables(session)
+
+    assert session.sql('select count(*) from STORAGE_DATABASE.CPW_DATA.ALL_SPECIES').collect()[0][0] == 5
@@ -0,0 +1,132 @@
+import threading
+
+import pytest
+from src.snowflake_ import session_pool
+
+
+class FakeSession:
+    def __init__(self, number):
+        self.number = number
+        self.closed = False
+        self.healthy = True
+
+    def close(self):
+        self.closed = True
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+def build_pool(**pool_settings):
+    created_sessions = []
+
+    def fake_session_factory():
+        created_sessions.append(FakeSession(len(created_sessions)))
+        return created_sessions[-1]
+
+    pool = session_pool.SessionPool(
+        fake_session_factory, health_check=lambda session: session.healthy, **pool_settings
+    )
+
+    return pool, created_sessions
+
+
+def test_session_is_reused():
+
+    pool, created_sessions = build_pool()
+
+    for _ in range(10):
+        with pool.session() as session:
+            assert session.number == 0
+
+    assert len(created_sessions) == 1
+
+
+def test_max_size():
+
+    pool, created_sessions = build_pool(max_size=2)
+
+    first_session, second_session = pool.acquire(), pool.acquire()
+
+    with pytest.raises(TimeoutError):
+        pool.acquire(timeout=0.01)
+
+    # A waiting caller gets the session as soon as it is released
+    threading.Timer(0.05, pool.release, args=(first_session,)).start()
+
+    assert pool.acquire(timeout=5) is first_session
+
+    assert len(created_sessions) == 2
+
+
+def test_idle_timeout():
+
+    clock = FakeClock()
+
+    pool, created_sessions = build_pool(idle_timeout_seconds=600, clock=clock)
+
+    with pool.session():
+        pass
+
+    clock.now = 601
+
+    with pool.session() as session:
+        assert session.number == 1
+
+    assert created_sessions[0].closed
+
+
+def test_health_check():
+
+    clock = FakeClock()
+
+    pool, created_sessions = build_pool(health_check_after_seconds=60, clock=clock)
+
+    with pool.session() as session:
+        session.healthy = False
+
+    # Recently used sessions are not checked
+    clock.now = 30
+
+    with pool.session() as session:
+        assert session.number == 0
+
+    clock.now = 100
+
+    with pool.session() as session:
+        assert session.number == 1
+
+    assert created_sessions[0].closed
+
+
+def test_unhealthy_session_after_error():
+
+    pool, created_sessions = build_pool()
+
+    with pytest.raises(RuntimeError):
+        with pool.session() as session:
+            session.healthy = False
+            raise RuntimeError("Connection dropped")
+
+    assert created_sessions[0].closed
+
+    assert pool.open_sessions == 0
+
+
+def test_close_all():
+
+    pool, created_sessions = build_pool()
+
+    with pool.session():
+        pass
+
+    pool.close_all()
+
+    assert created_sessions[0].closed
+
+    assert pool.open_sessions == 0
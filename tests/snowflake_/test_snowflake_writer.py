@@ -0,0 +1,251 @@
+import os
+import re
+import toml
+import pandas as pd
+from unittest.mock import Mock
+from src.snowflake_ import session_pool, snowflake_writer, storage
+
+
+def test_write_table_reuses_session():
+
+    created_sessions = []
+
+    def fake_session_factory():
+        created_sessions.append(Mock())
+        return created_sessions[-1]
+
+    writer = snowflake_writer.SnowflakeDfWriter(pool=session_pool.SessionPool(fake_session_factory))
+
+    df = pd.DataFrame({"Water": ["Arthur Lake"]})
+
+    for table in ["Trout: Brook", "Trout: Brown"]:
+        writer.write_table(df=df, fully_qualified_table_name=f"STORAGE_DATABASE.CPW_DATA.{table}", overwrite=True)
+
+    assert len(created_sessions) == 1
+
+    assert [call.kwargs["table_name"] for call in created_sessions[0].write_pandas.call_args_list] == [
+        "Trout: Brook",
+        "Trout: Brown",
+    ]
+
+
+def build_writer(created_sessions):
+
+    def fake_session_factory():
+        created_sessions.append(Mock())
+        return created_sessions[-1]
+
+    return snowflake_writer.SnowflakeDfWriter(pool=session_pool.SessionPool(fake_session_factory, max_size=2))
+
+
+def test_write_tables():
+
+    created_sessions = []
+
+    writer = build_writer(created_sessions)
+
+    tables = {
+        f"STORAGE_DATABASE.CPW_DATA.Trout: {species}": pd.DataFrame({"Water": ["Arthur Lake"] * rows})
+        for species, rows in [("Brook", 1), ("Brown", 2), ("Golden", 3)]
+    }
+
+    results = writer.write_tables(tables, overwrite=True)
+
+    assert {fqn: result["rows"] for fqn, result in results.items()} == {
+        "STORAGE_DATABASE.CPW_DATA.Trout: Brook": 1,
+        "STORAGE_DATABASE.CPW_DATA.Trout: Brown": 2,
+        "STORAGE_DATABASE.CPW_DATA.Trout: Golden": 3,
+    }
+
+    assert all(result["error"] is None for result in results.values())
+
+    # Never more sessions than the pool allows
+    assert len(created_sessions) <= 2
+
+    written_tables = [
+        call.kwargs["table_name"] for session in created_sessions for call in session.write_pandas.call_args_list
+    ]
+
+    assert sorted(written_tables) == ["Trout: Brook", "Trout: Brown", "Trout: Golden"]
+
+
+def test_write_tables_error():
+
+    created_sessions = []
+
+    writer = build_writer(created_sessions)
+
+    tables = {
+        "STORAGE_DATABASE.CPW_DATA.Trout: Brook": pd.DataFrame({"Water": ["Arthur Lake"]}),
+        "STORAGE_DATABASE.CPW_DATA.Trout: Brown": pd.DataFrame({"Water": []}),
+    }
+
+    original_write_pandas = writer._write_pandas
+
+    def failing_write_pandas(session, df, fully_qualified_table_name, *args):
+        if fully_qualified_table_name.endswith("Brown"):
+            raise RuntimeError("Table does not exist")
+
+        return original_write_pandas(session, df, fully_qualified_table_name, *args)
+
+    writer._write_pandas = failing_write_pandas
+
+    results = writer.write_tables(tables)
+
+    assert results["STORAGE_DATABASE.CPW_DATA.Trout: Brook"]["rows"] == 1
+
+    assert isinstance(results["STORAGE_DATABASE.CPW_DATA.Trout: Brown"]["error"], RuntimeError)
+
+
+def test_write_tables_shared_stage():
+
+    created_sessions = []
+
+    writer = build_writer(created_sessions)
+
+    tables = {
+        "STORAGE_DATABASE.CPW_DATA.Trout: Brook": pd.DataFrame({"Water": ["Arthur Lake"]}),
+        "STORAGE_DATABASE.CPW_DATA.Trout: Brown": pd.DataFrame({"Water": ["Boyd Lake"]}),
+    }
+
+    put_files = []
+
+    # Open the session the PUT will use so it can record what was uploaded
+    writer.pool.release(writer.pool.acquire())
+
+    created_sessions[0].file.put.side_effect = lambda local_files, stage_path, **kwargs: put_files.append(local_files) or [1, 1]
+
+    writer.write_tables(tables, overwrite=True, stage="STORAGE_DATABASE.CPW_DATA.TEST_STAGE")
+
+    # Every table goes up in one PUT
+    assert len(put_files) == 1
+
+    statements = [call.args[0] for session in created_sessions for call in session.sql.call_args_list]
+
+    copy_statements = [statement for statement in statements if "COPY INTO" in statement]
+
+    assert len(copy_statements) == 2
+    assert any('"Trout: Brook"' in statement and "table_0_" in statement for statement in copy_statements)
+    assert any('"Trout: Brown"' in statement and "table_1_" in statement for statement in copy_statements)
+
+    assert any(statement.startswith("REMOVE @STORAGE_DATABASE.CPW_DATA.TEST_STAGE/elt_") for statement in statements)
+
+
+def test_write_upsert():
+
+    created_sessions = []
+
+    writer = build_writer(created_sessions)
+
+    writer.pool.release(writer.pool.acquire())
+
+    created_sessions[0].sql.return_value.collect.return_value = [(3, 1)]
+
+    df = pd.DataFrame(
+        {
+            "Angler": ["Trey", "Tanner"],
+            "Species": ["Catfish", "Catfish"],
+            "Length": [23, 38],
+            "Location": ["Lon Hagler", "Boyd Lake"],
+            "Date": pd.to_datetime(["2023-07-01", "2023-06-01"]),
+            "Released": ["Yes", "No"],
+        }
+    )
+
+    counts = writer.write_upsert(
+        df,
+        "STORAGE_DATABASE.CPW_DATA.MASTER_ANGLER_AWARD",
+        key_columns=["angler", "species", "length", "location", "date"],
+        column_map={column: column.lower() for column in df.columns},
+    )
+
+    assert counts == {"inserted": 3, "updated": 1}
+
+    batch_df = created_sessions[0].write_pandas.call_args.args[0]
+
+    assert list(batch_df.columns) == ["angler", "species", "length", "location", "date", "released"]
+    assert created_sessions[0].write_pandas.call_args.kwargs["table_type"] == "temporary"
+
+    merge_statement = created_sessions[0].sql.call_args.args[0]
+
+    assert 'MERGE INTO STORAGE_DATABASE.CPW_DATA."MASTER_ANGLER_AWARD"' in merge_statement
+    assert 'EQUAL_NULL(target."date", batch."date")' in merge_statement
+    assert 'UPDATE SET "released" = batch."released"' in merge_statement
+
+
+def test_delete_duplicate_awards():
+
+    session = storage.DuckDBStorage().session()
+
+    sql_folder = os.path.join(os.getcwd(), "fishing_trip_planning_sql_files", "4_typed_columns")
+
+    # The dedupe runs with the typed columns migration, the deploy only runs the newest folder
+    sprint_folders = os.listdir(os.path.dirname(sql_folder))
+
+    assert max(sprint_folders, key=lambda folder_name: int(folder_name.split("_", 1)[0])) == "4_typed_columns"
+
+    setup_file = toml.load(os.path.join(os.getcwd(), "snowflake_setup.toml"))
+
+    session.sql(setup_file["tables"][0]["ddl"]).collect()
+
+    session.sql(
+        """insert into STORAGE_DATABASE.CPW_DATA.MASTER_ANGLER_AWARD ("angler", "species", "length", "location", "date")
+        values
+            ('Trey', 'Brown Trout', 20, 'Boyd Lake', '2023-05-01'),
+            ('Trey', 'Brown Trout', 20, 'Boyd Lake', '2023-05-01'),
+            ('Tanner', 'Brown Trout', 20, 'Boyd Lake', '2023-05-01')"""
+    ).collect()
+
+    with open(os.path.join(sql_folder, "7_delete_duplicate_awards.sql")) as dml:
+        session.sql(dml.read()).collect()
+
+    awards = session.sql(
+        'select master_angler_award_id, "angler" from STORAGE_DATABASE.CPW_DATA.MASTER_ANGLER_AWARD order by 1'
+    ).collect()
+
+    # The first award of each key is kept
+    assert [tuple(award) for award in awards] == [(0, "Trey"), (2, "Tanner")]
+
+
+def test_typed_columns_ids_start_after_copied_ids():
+
+    session = storage.DuckDBStorage().session()
+
+    sql_folder = os.path.join(os.getcwd(), "fishing_trip_planning_sql_files", "4_typed_columns")
+
+    for file_name, table, id_column, text_column in [
+        ("2_create_master_angler_table.sql", "MASTER_ANGLER_AWARD", "master_angler_award_id", "species"),
+        ("5_create_all_species_table.sql", "ALL_SPECIES", '"all_species_id"', "water"),
+    ]:
+        # The clone of the table before the migration
+        session.sql(
+            f"create table STORAGE_DATABASE.CPW_DATA.{table}_TEMP ({id_column} NUMBER(38,0), name varchar)"
+        ).collect()
+        session.sql(
+            f"insert into STORAGE_DATABASE.CPW_DATA.{table}_TEMP values (0, 'a'), (1, 'b'), (2, 'c')"
+        ).collect()
+
+        with open(os.path.join(sql_folder, file_name)) as ddl:
+            script = ddl.read()
+
+        # Run the Snowflake Scripting block a statement at a time
+        next_id_query = re.search(r"SELECT (.+) INTO :next_id (FROM [\w.]+);", script)
+        next_id = session.sql(f"SELECT {next_id_query.group(1)} {next_id_query.group(2)}").collect()[0][0]
+
+        assert next_id == 3
+
+        create_table = re.search(r"create_table := '(.+?)';", script, re.DOTALL).group(1)
+        session.sql(create_table.replace("' || next_id || '", str(next_id))).collect()
+
+        # The insert from the clone copies the ids, new rows are numbered after them
+        session.sql(
+            f"insert into STORAGE_DATABASE.CPW_DATA.{table} ({id_column}) "
+            f"select {id_column} from STORAGE_DATABASE.CPW_DATA.{table}_TEMP"
+        ).collect()
+        session.sql(
+            f"insert into STORAGE_DATABASE.CPW_DATA.{table} (\"{text_column}\") values ('new')"
+        ).collect()
+
+        ids = session.sql(f"select {id_column} from STORAGE_DATABASE.CPW_DATA.{table} order by 1").collect()
+
+        assert [row[0] for row in ids] == [0, 1, 2, 3]
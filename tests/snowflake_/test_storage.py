@@ -0,0 +1,210 @@
+import os
+import toml
+import pandas as pd
+from src.snowflake_ import session_pool, snowflake_writer, storage, combine_trout_data
+
+
+def read_ddl(table_name):
+    setup_file = toml.load(os.path.join(os.getcwd(), "snowflake_setup.toml"))
+
+    return next(table["ddl"] for table in setup_file["tables"] if table["table_name"] == table_name)
+
+
+def test_duckdb_session_sql():
+
+    session = storage.DuckDBStorage().session()
+
+    session.sql("create table STORAGE_DATABASE.CPW_DATA.LAKES (name varchar, depth NUMBER(3, 0))").collect()
+
+    insert_result = session.sql(
+        "insert into STORAGE_DATABASE.CPW_DATA.LAKES values ('Arthur Lake', 20), ('Boyd Lake', 15)"
+    ).collect()
+
+    assert insert_result[0][0] == 2
+
+    rows = session.sql("select name, depth from STORAGE_DATABASE.CPW_DATA.LAKES order by name").collect()
+
+    assert rows[0]["name"] == "Arthur Lake"
+    assert rows[0].depth == 20
+    assert rows[1].as_dict() == {"name": "Boyd Lake", "depth": 15}
+
+    arrow_table = session.sql("select * from STORAGE_DATABASE.CPW_DATA.LAKES").to_arrow()
+
+    assert arrow_table.num_rows == 2
+
+    batches = list(session.sql("select * from STORAGE_DATABASE.CPW_DATA.LAKES").to_pandas_batches())
+
+    assert sum(len(batch) for batch in batches) == 2
+
+
+def test_duckdb_session_translates_snowflake_sql():
+
+    session = storage.DuckDBStorage().session()
+
+    session.sql(read_ddl("all_species_table")).collect()
+
+    session.sql(
+        """insert into STORAGE_DATABASE.CPW_DATA.ALL_SPECIES ("water") values ('Arthur Lake'), ('Boyd Lake')"""
+    ).collect()
+
+    ids = session.sql('select "all_species_id" from STORAGE_DATABASE.CPW_DATA.ALL_SPECIES').to_pandas()
+
+    assert ids["all_species_id"].tolist() == [0, 1]
+
+    tables = session.sql(
+        """
+    SELECT
+        TABLE_NAME
+    FROM storage_database.information_schema.TABLES
+    WHERE TABLE_SCHEMA = 'CPW_DATA'
+    """
+    ).to_pandas()
+
+    assert tables.TABLE_NAME.tolist() == ["ALL_SPECIES"]
+
+    session.sql("create table STORAGE_DATABASE.CPW_DATA.ALL_SPECIES_SHADOW as select 1 as a").collect()
+
+    session.sql(
+        "ALTER TABLE STORAGE_DATABASE.CPW_DATA.ALL_SPECIES SWAP WITH STORAGE_DATABASE.CPW_DATA.ALL_SPECIES_SHADOW"
+    ).collect()
+
+    assert session.sql("select a from STORAGE_DATABASE.CPW_DATA.ALL_SPECIES").collect()[0][0] == 1
+
+
+def test_duckdb_session_write_pandas():
+
+    duckdb_storage = storage.DuckDBStorage()
+
+    session = duckdb_storage.session()
+
+    df = pd.DataFrame({"Water": ["Arthur Lake", "Boyd Lake"], "County": pd.Categorical(["Larimer", "Larimer"])})
+
+    result = session.write_pandas(
+        df, table_name="Trout: Brook", database="STORAGE_DATABASE", schema="CPW_DATA", auto_create_table=True
+    )
+
+    assert result.table_name == "Trout: Brook"
+
+    session.write_pandas(
+        df[["County", "Water"]], table_name="Trout: Brook", database="STORAGE_DATABASE", schema="CPW_DATA"
+    )
+
+    # Other sessions of the same storage see the table
+    other_session = duckdb_storage.session()
+
+    assert other_session.sql('select count(*) from STORAGE_DATABASE.CPW_DATA."Trout: Brook"').collect()[0][0] == 4
+
+    session.write_pandas(
+        df.head(1), table_name="Trout: Brook", database="STORAGE_DATABASE", schema="CPW_DATA", overwrite=True
+    )
+
+    assert other_session.sql('select count(*) from STORAGE_DATABASE.CPW_DATA."Trout: Brook"').collect()[0][0] == 1
+
+
+def test_writer_and_procedure_on_duckdb():
+
+    duckdb_storage = storage.DuckDBStorage()
+
+    writer = snowflake_writer.SnowflakeDfWriter(pool=session_pool.SessionPool(duckdb_storage.session))
+
+    with writer.pool.session() as session:
+        session.sql(read_ddl("master_angler_table")).collect()
+        session.sql(read_ddl("all_species_table")).collect()
+
+    awards = pd.DataFrame(
+        {
+            "angler": ["Angler 1", "Angler 2"],
+            "species": ["Brook Trout", "Brook Trout"],
+            "length": [20, 18],
+            "location": ["Arthur Lake", "Boyd Lake"],
+            "date": pd.to_datetime(["2023-07-01", "2023-08-01"]),
+            "released": ["Yes", "No"],
+        }
+    )
+
+    key_columns = ["angler", "species", "length", "location", "date"]
+
+    assert writer.write_upsert(awards, "STORAGE_DATABASE.CPW_DATA.MASTER_ANGLER_AWARD", key_columns) == {
+        "inserted": 2,
+        "updated": 0,
+    }
+
+    awards.loc[0, "released"] = "No"
+
+    assert writer.write_upsert(awards, "STORAGE_DATABASE.CPW_DATA.MASTER_ANGLER_AWARD", key_columns) == {
+        "inserted": 0,
+        "updated": 1,
+    }
+
+    atlas = pd.DataFrame(
+        {
+            column: ["Arthur Lake"]
+            for column in [
+                "Fish Species ",
+                "Water",
+                "County",
+                "Property name",
+                "Ease of access",
+                "Boating",
+                "Fishing pressure",
+                "Stocked",
+            ]
+        }
+        | {"Elevation(ft)": [7000], "Latitude": [40.1], "Longitude": [-105.2]}
+    )
+
+    writer.write_table(atlas, "STORAGE_DATABASE.CPW_DATA.Trout: Brook", overwrite=True, auto_create_table=True)
+
+    with writer.pool.session() as session:
+        combine_trout_data.combine_trout_tables(session)
+
+        assert session.sql("select count(*) from STORAGE_DATABASE.CPW_DATA.ALL_SPECIES").collect()[0][0] == 1
+
+
+def test_write_tables_through_local_stage():
+
+    duckdb_storage = storage.DuckDBStorage()
+
+    writer = snowflake_writer.SnowflakeDfWriter(pool=session_pool.SessionPool(duckdb_storage.session))
+
+    tables = {
+        "STORAGE_DATABASE.CPW_DATA.Trout: Brook": pd.DataFrame({"Water": ["Arthur Lake", "Boyd Lake"], "Elevation(ft)": [9000, 5000]}),
+        "STORAGE_DATABASE.CPW_DATA.Trout: Brown": pd.DataFrame({"Water": ["Cheesman Reservoir"], "Elevation(ft)": [6800]}),
+    }
+
+    # The same call main makes with the atlas tables
+    results = writer.write_tables(tables, overwrite=True, auto_create_table=True, stage="STORAGE_DATABASE.CPW_DATA.TEST_STAGE")
+
+    assert {name: (result["rows"], result["error"]) for name, result in results.items()} == {
+        "STORAGE_DATABASE.CPW_DATA.Trout: Brook": (2, None),
+        "STORAGE_DATABASE.CPW_DATA.Trout: Brown": (1, None),
+    }
+
+    # Loading into the existing tables truncates them first
+    tables["STORAGE_DATABASE.CPW_DATA.Trout: Brook"] = pd.DataFrame({"Elevation(ft)": [7000], "Water": ["Blue River"]})
+
+    results = writer.write_tables(tables, overwrite=True, stage="STORAGE_DATABASE.CPW_DATA.TEST_STAGE")
+
+    assert all(result["error"] is None for result in results.values())
+
+    with writer.pool.session() as session:
+        brook = session.sql('select "Water", "Elevation(ft)" from STORAGE_DATABASE.CPW_DATA."Trout: Brook"').collect()
+        brown = session.sql('select count(*) from STORAGE_DATABASE.CPW_DATA."Trout: Brown"').collect()
+
+    assert [tuple(row) for row in brook] == [("Blue River", 7000)]
+    assert brown[0][0] == 1
+
+    # The uploaded files are removed from the stage once the tables are loaded
+    assert os.listdir(os.path.join(duckdb_storage.stage_directory, "STORAGE_DATABASE.CPW_DATA.TEST_STAGE")) == []
+
+
+def test_create_session_factory():
+
+    session_factory = storage.create_session_factory({"backend": "duckdb"})
+
+    first_session = session_factory()
+    second_session = session_factory()
+
+    first_session.sql("create table STORAGE_DATABASE.CPW_DATA.LAKES as select 1 as a").collect()
+
+    assert second_session.sql("select a from STORAGE_DATABASE.CPW_DATA.LAKES").collect()[0][0] == 1
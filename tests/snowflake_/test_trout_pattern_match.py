@@ -1,5 +1,8 @@
+import os
+import toml
+import pytest
 import pandas as pd
-from src.snowflake_ import trout_pattern_match
+from src.snowflake_ import storage, trout_pattern_match
 
 def test_clean_data():
     test = pd.DataFrame(
@@ -12,4 +15,262 @@ def test_clean_data():
     trout_pattern_match._clean_data(test, cols=['wrong'])
 
     for row in test.itertuples():
-        assert row.right == row.wrong_clean
\ No newline at end of file
+        assert row.right == row.wrong_clean
+
+
+def test_normalize_location():
+    expected = {
+        # Spelling aliases, applied in turn
+        'Chessman': 'cheesman',
+        'Cheeseman Reservoir': 'cheesman',
+        'Boyd Lake': 'boyd',
+        'Boyd Pond': 'boyd',
+        '11-Mile Reservior': 'elevenmile',
+        '11 Lakemile': 'elevenmile',
+        # Water aliases replace the whole name
+        'Dream Stream (below Spinney)': 'south platte river',
+        'Deckers.': 'south platte river',
+        'North Fork South Platte': 'south platte river',
+        # Exact aliases are checked before punctuation and spaces are removed
+        'Spinney': 'spinney mountain',
+        'Spinney Reservoir': 'spinney mountain',
+        'Spinney.': 'spinney',
+        ' spinney': 'spinney',
+        'spinney  ': 'spinney',
+        # Punctuation and surrounding spaces
+        'Arthur Lake #2': 'arthur  2',
+        '  Lon Hagler. ': 'lon hagler',
+        'Blue River!': 'blue river',
+    }
+
+    for location, clean_location in expected.items():
+        assert trout_pattern_match._normalize_location(location) == clean_location, location
+
+
+def test_clean_data_missing_names():
+    test = pd.DataFrame({'location': ['Boyd Lake', None, float('nan'), 'boyd']})
+
+    trout_pattern_match._clean_data(test, cols=['location'])
+
+    assert test.location_clean.tolist()[0] == 'boyd'
+    assert test.location_clean.isna().tolist() == [False, True, True, False]
+
+    # Names that clean to the same value share one category
+    assert test.location_clean.cat.categories.tolist() == ['boyd']
+
+
+def test_compare_locations():
+    master_angler_df = pd.DataFrame(
+        {'location_clean': ['cheesman', 'boyd', '', None]},
+        index=pd.Index([1, 2, 3, 4], name='master_angler_award_id'),
+    )
+    species_df = pd.DataFrame(
+        {'water_clean': ['cheesmn', 'boyd', '']},
+        index=pd.Index([7, 8, 9], name='all_species_id'),
+    )
+
+    candidate_links = pd.MultiIndex.from_tuples(
+        [(1, 7), (2, 8), (2, 7), (1, 7), (3, 9), (4, 8)], names=['master_angler_award_id', 'all_species_id']
+    )
+
+    compare_vectors = trout_pattern_match._compare_locations(candidate_links, master_angler_df, species_df)
+
+    assert compare_vectors.index.equals(candidate_links)
+
+    assert compare_vectors.jaro_comparison.round(3).tolist() == [0.975, 1.0, 0.0, 0.975, 0.0, 0.0]
+    assert compare_vectors.levenshtein_comparison.round(3).tolist() == [0.875, 1.0, 0.0, 0.875, 0.0, 0.0]
+
+
+def test_block_candidates():
+    master_angler_df = pd.DataFrame(
+        {'location_clean': ['cheesman', 'boyd'], 'species_clean': ['Brown', 'Rainbow']},
+        index=pd.Index([1, 2], name='master_angler_award_id'),
+    )
+
+    waters = ['cheesmn', 'antero', 'boyd', 'zapata'] + [f'pond {i}' for i in range(20)]
+
+    species_df = pd.DataFrame(
+        {
+            'water_clean': waters,
+            'property_name_clean': ['', '', 'boyd', ''] + [''] * 20,
+            'main_species': ['Brown', 'Brown', 'Brook', 'Rainbow'] + ['Brown'] * 20,
+        },
+        index=pd.Index(range(len(waters)), name='all_species_id'),
+    )
+
+    candidate_links = trout_pattern_match._block_candidates(master_angler_df, species_df, window=3)
+
+    assert candidate_links.names == ['master_angler_award_id', 'all_species_id']
+
+    links = set(candidate_links)
+
+    # Near miss of the same species
+    assert (1, 0) in links
+
+    # Exact name of another species
+    assert (2, 2) in links
+
+    # Rainbow awards are never paired with Brown only waters by the window
+    assert not any(award == 2 and species_df.main_species[water] == 'Brown' for award, water in links)
+
+    assert len(links) < len(master_angler_df) * len(species_df) / 4
+
+    for window in [0, -3, 4]:
+        with pytest.raises(ValueError):
+            trout_pattern_match._block_candidates(master_angler_df, species_df, window=window)
+
+    # A window of 1 is only the water the location sorts to
+    assert len(trout_pattern_match._block_candidates(master_angler_df, species_df, window=1)) >= 2
+
+
+def test_match_new_fishing_data():
+    session = storage.DuckDBStorage().session()
+
+    for table in toml.load(os.path.join(os.getcwd(), 'snowflake_setup.toml'))['tables']:
+        session.sql(table['ddl']).collect()
+
+    session.sql(
+        """insert into STORAGE_DATABASE.CPW_DATA.ALL_SPECIES ("main_species", "water", "property_name")
+        values ('Brown', 'Cheesman Reservoir', 'Cheesman'), ('Brown', 'Boyd Lake', 'Boyd Lake State Park')"""
+    ).collect()
+
+    def add_award(location):
+        session.sql(
+            f"""insert into STORAGE_DATABASE.CPW_DATA.MASTER_ANGLER_AWARD ("angler", "species", "location")
+            values ('Angler', 'Brown Trout', '{location}')"""
+        ).collect()
+
+    add_award('Cheeseman')
+
+    # No output yet, so every award is matched
+    assert 'with 1.' in trout_pattern_match.match_new_fishing_data(session)
+
+    add_award('Boyd')
+
+    assert 'with 1.' in trout_pattern_match.match_new_fishing_data(session)
+    assert 'with 0.' in trout_pattern_match.match_new_fishing_data(session)
+
+    # The matched water is gone, both awards had it in their window so both are matched again
+    session.sql("""delete from STORAGE_DATABASE.CPW_DATA.ALL_SPECIES where "water" = 'Boyd Lake'""").collect()
+
+    assert 'with 2.' in trout_pattern_match.match_new_fishing_data(session)
+
+    output_df = session.sql(
+        'select "master_location", "species_water" from STORAGE_DATABASE.CPW_DATA.PATTERN_MATCH_OUTPUT order by 1'
+    ).to_pandas()
+
+    assert output_df.master_location.tolist() == ['Boyd', 'Cheeseman']
+    assert output_df.species_water.tolist() == ['Cheesman Reservoir', 'Cheesman Reservoir']
+
+
+def test_match_new_fishing_data_with_new_water():
+    session = storage.DuckDBStorage().session()
+
+    for table in toml.load(os.path.join(os.getcwd(), 'snowflake_setup.toml'))['tables']:
+        session.sql(table['ddl']).collect()
+
+    session.sql(
+        """insert into STORAGE_DATABASE.CPW_DATA.ALL_SPECIES ("main_species", "water", "property_name")
+        values ('Brown', 'Cheesman Reservoir', 'Cheesman'), ('Rainbow', 'Spinney Mountain', 'Spinney')"""
+    ).collect()
+    session.sql(
+        """insert into STORAGE_DATABASE.CPW_DATA.MASTER_ANGLER_AWARD ("angler", "species", "location")
+        values ('Angler', 'Brown Trout', 'Boyd'), ('Angler', 'Brown Trout', 'Cheeseman'), ('Angler', 'Rainbow Trout', 'Spinney')"""
+    ).collect()
+
+    assert 'with 3.' in trout_pattern_match.match_new_fishing_data(session)
+
+    def read_output():
+        return session.sql(
+            """select "master_angler_award_id", "species_water", "total_score"
+            from STORAGE_DATABASE.CPW_DATA.PATTERN_MATCH_OUTPUT order by 1"""
+        ).to_pandas()
+
+    # Boyd only had Cheesman Reservoir to match
+    assert read_output().species_water.tolist() == ['Cheesman Reservoir', 'Cheesman Reservoir', 'Spinney Mountain']
+
+    # A better water for Boyd, only the Brown awards can be blocked with it
+    session.sql(
+        """insert into STORAGE_DATABASE.CPW_DATA.ALL_SPECIES ("main_species", "water", "property_name")
+        values ('Brown', 'Boyd Lake', 'Boyd Lake State Park')"""
+    ).collect()
+
+    assert 'with 2.' in trout_pattern_match.match_new_fishing_data(session)
+
+    incremental_df = read_output()
+
+    assert incremental_df.species_water.tolist() == ['Boyd Lake', 'Cheesman Reservoir', 'Spinney Mountain']
+
+    trout_pattern_match.match_fishing_data(session)
+
+    pd.testing.assert_frame_equal(incremental_df, read_output())
+
+
+def test_score_matches_in_shards():
+    locations = ['Cheeseman', 'Boyd', 'Spinney', '11 Mile', 'Dream Stream', 'Arthur Lake', 'Antero']
+
+    def cleaned_frames():
+        master_angler_df = pd.DataFrame(
+            {
+                'master_angler_award_id': range(len(locations)),
+                'location': locations,
+                'species': ['Brown Trout'] * len(locations),
+                'species_clean': ['Brown'] * len(locations),
+            }
+        )
+        species_df = pd.DataFrame(
+            {
+                'all_species_id': range(5),
+                'main_species': ['Brown'] * 5,
+                'water': ['Cheesman Reservoir', 'Boyd Lake', 'Spinney Mountain', 'Elevenmile', 'Antero Reservoir'],
+                'property_name': ['Cheesman', 'Boyd Lake State Park', 'Spinney', '', 'Antero'],
+            }
+        )
+
+        trout_pattern_match._clean_data(master_angler_df, ['location'])
+        trout_pattern_match._clean_data(species_df, ['water', 'property_name'])
+
+        return master_angler_df, species_df
+
+    serial_df = trout_pattern_match._score_matches(*cleaned_frames(), processes=1)
+    sharded_df = trout_pattern_match._score_matches(*cleaned_frames(), processes=3)
+
+    columns = ['master_angler_award_id', 'all_species_id', 'total_score']
+
+    pd.testing.assert_frame_equal(
+        serial_df[columns].sort_values('master_angler_award_id').reset_index(drop=True),
+        sharded_df[columns].sort_values('master_angler_award_id').reset_index(drop=True),
+    )
+
+
+def test_select_best_match():
+    compare_vectors = pd.DataFrame(
+        {
+            'jaro_comparison': [0.9, 1.0, 0.5, 0.7, 0.8, 0.6],
+            'levenshtein_comparison': [0.8, 1.0, 0.4, 0.7, 0.6, 0.6],
+        },
+        index=pd.MultiIndex.from_tuples(
+            [(1, 10), (1, 11), (1, 12), (2, 10), (2, 11), (3, 12)],
+            names=['master_angler_award_id', 'all_species_id'],
+        ),
+    )
+
+    best_df = trout_pattern_match._select_best_match(compare_vectors)
+
+    assert best_df.all_species_id.tolist() == [11, 10, 12]
+    assert best_df.match_rank.tolist() == [1, 1, 1]
+    assert best_df.match_margin.round(2).tolist() == [0.3, 0.0, 1.2]
+
+    # Ties go to the first link compared, like idxmax
+    assert best_df.loc[best_df.master_angler_award_id == 2].all_species_id.item() == 10
+
+    top_df = trout_pattern_match._select_best_match(compare_vectors, top_k=2)
+
+    assert top_df.all_species_id.tolist() == [11, 10, 10, 11, 12]
+    assert top_df.match_rank.tolist() == [1, 2, 1, 2, 1]
+    assert top_df.match_margin.round(2).tolist() == [0.3, 0.3, 0.0, 0.0, 1.2]
+
+    likely_df = trout_pattern_match._select_best_match(compare_vectors, top_k=2, threshold=1.5)
+
+    assert likely_df.master_angler_award_id.tolist() == [1, 1]
+    assert likely_df.all_species_id.tolist() == [11, 10]
@@ -0,0 +1,58 @@
+import asyncio
+
+import pytest
+from src.web_scrapers import async_engine
+
+
+def test_iterate_in_thread():
+
+    emitted = []
+
+    async def produce(emit):
+        for i in range(10):
+            emitted.append(i)
+            await emit(i)
+            await asyncio.sleep(0)
+
+    records = async_engine.iterate_in_thread(produce, max_buffered=2)
+
+    assert next(records) == 0
+
+    # The producer is paused once the buffer is full
+    assert len(emitted) <= 4
+
+    assert list(records) == list(range(1, 10))
+
+
+def test_iterate_in_thread_stops_producer():
+
+    cleaned_up = []
+
+    async def produce(emit):
+        try:
+            for i in range(1_000):
+                await emit(i)
+        finally:
+            cleaned_up.append(True)
+
+    records = async_engine.iterate_in_thread(produce, max_buffered=1)
+
+    assert [next(records), next(records)] == [0, 1]
+
+    records.close()
+
+    assert cleaned_up == [True]
+
+
+def test_iterate_in_thread_error():
+
+    async def produce(emit):
+        await emit("first")
+        raise ValueError("Scrape failed")
+
+    records = async_engine.iterate_in_thread(produce)
+
+    assert next(records) == "first"
+
+    with pytest.raises(ValueError):
+        next(records)
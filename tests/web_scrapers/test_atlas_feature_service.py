@@ -0,0 +1,150 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import pytest
+from src.data_processing import schema
+from src.web_scrapers import atlas_feature_service
+
+FEATURES = [
+    {
+        "attributes": {
+            "OBJECTID": i,
+            "FISH_SPECIES": "Trout: Cutthroat, Trout: Golden",
+            "WATER": f"Lake {i}",
+            "COUNTY": "Chaffee",
+            "PROPERTY_NAME": "San Isabel National Forest",
+            "EASE_OF_ACCESS": "Difficult",
+            "BOATING": "None",
+            "FISHING_PRESSURE": "Low",
+            "STOCKED": "No",
+            "ELEVATION": 1000,
+        },
+        "geometry": {"x": -106.32702, "y": 38.60092},
+    }
+    for i in range(5)
+]
+
+
+class StubFeatureService(BaseHTTPRequestHandler):
+    """Serves FEATURES two at a time the way an ArcGIS query endpoint pages results"""
+
+    requests_received = []
+
+    def do_GET(self):
+        params = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+
+        self.requests_received.append(params)
+
+        offset, count = int(params["resultOffset"]), int(params["resultRecordCount"])
+
+        page = FEATURES[offset : offset + count]
+
+        exceeded_transfer_limit = offset + count < len(FEATURES)
+
+        if params["f"] == "geojson":
+            body = {
+                "type": "FeatureCollection",
+                "features": [
+                    {
+                        "properties": feature["attributes"],
+                        "geometry": {
+                            "type": "Point",
+                            "coordinates": [
+                                feature["geometry"]["x"],
+                                feature["geometry"]["y"],
+                            ],
+                        },
+                    }
+                    for feature in page
+                ],
+                "properties": {"exceededTransferLimit": exceeded_transfer_limit},
+            }
+        else:
+            body = {
+                "features": page,
+                "exceededTransferLimit": exceeded_transfer_limit,
+            }
+
+        encoded_body = json.dumps(body).encode()
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(encoded_body)))
+        self.end_headers()
+        self.wfile.write(encoded_body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stub_query_url():
+    server = HTTPServer(("127.0.0.1", 0), StubFeatureService)
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    StubFeatureService.requests_received = []
+
+    yield f"http://127.0.0.1:{server.server_port}/arcgis/rest/services/FishingAtlas/MapServer/0/query"
+
+    server.shutdown()
+
+
+@pytest.mark.parametrize("output_format", ["json", "geojson"])
+def test_fetch_species_dataframe(stub_query_url, output_format):
+
+    client = atlas_feature_service.AtlasFeatureServiceClient(
+        query_url=stub_query_url, page_size=2, output_format=output_format
+    )
+
+    df = client.fetch_species_dataframe("Trout: Golden")
+
+    assert [params["resultOffset"] for params in StubFeatureService.requests_received] == ["0", "2", "4"]
+    assert StubFeatureService.requests_received[0]["where"] == "FISH_SPECIES LIKE '%Trout: Golden%'"
+
+    assert df.Water.to_list() == [f" Lake {i}" for i in range(5)]
+
+    assert df.iloc[0].to_dict() == {
+        "Fish Species ": " Cutthroat, Golden",
+        "Water": " Lake 0",
+        "County": " Chaffee",
+        "Property name": " San Isabel National Forest",
+        "Ease of access": " Difficult",
+        "Boating": " None",
+        "Fishing pressure": " Low",
+        "Stocked": " No",
+        "Elevation(ft)": " 1,000",
+        "Latitude": " 38.60092 N",
+        "Longitude": " -106.32702 W",
+    }
+
+
+def test_fetch_species_dataframe_schema(stub_query_url):
+
+    client = atlas_feature_service.AtlasFeatureServiceClient(query_url=stub_query_url, page_size=2)
+
+    df = schema.apply_schema(client.fetch_species_dataframe("Trout: Golden"), schema.ATLAS_SCHEMA)
+
+    # The same types the popup records get from process_all_location_data
+    assert str(df["Elevation(ft)"].dtype) == "Int32"
+    assert df["Latitude"].dtype == "float64"
+    assert df["Longitude"].dtype == "float64"
+    assert df["County"].dtype == "category"
+
+    assert df["Elevation(ft)"].tolist() == [1000] * 5
+    assert df["Latitude"].tolist() == [38.60092] * 5
+    assert df["Longitude"].tolist() == [-106.32702] * 5
+
+
+def test_pluggable_http_client_error():
+
+    def failing_http_get(url, params):
+        return {"error": {"code": 400, "message": "Invalid query"}}
+
+    client = atlas_feature_service.AtlasFeatureServiceClient(http_get=failing_http_get)
+
+    with pytest.raises(RuntimeError):
+        client.fetch_species("Trout: Brook")
@@ -0,0 +1,69 @@
+import os
+import pytest
+from src.web_scrapers import master_angler
+from src.data_processing import clean_master_angler_data
+
+
+def read_master_angler_page():
+
+    current_directory = os.getcwd()
+
+    data_directory = os.path.join(current_directory, "tests", "data")
+
+    with open(os.path.join(data_directory, "master_angler_page.html"), "r", encoding="utf-8") as file:
+        return file.read()
+
+
+def test_parse_master_angler_html():
+
+    raw_data = master_angler.parse_master_angler_html(read_master_angler_page())
+
+    assert raw_data == [
+        "Trey\tCatfish\t23\tLon Hagler\tJuly\\2022\tYes\nTanner\tBrown Trout\t21\tEleven Mile & Spinney\tJune\\2022\tNo",
+        "Sam\tRainbow Trout\t25\tBoyd Lake\tMay\\2023\tYes",
+    ]
+
+
+def test_parse_master_angler_html_processes():
+
+    raw_data = master_angler.parse_master_angler_html(read_master_angler_page())
+
+    processed_df = clean_master_angler_data.process_master_angler_data(raw_data)
+
+    assert processed_df.Angler.to_list() == ["Trey", "Tanner", "Sam"]
+    assert processed_df.Location.to_list() == ["Lon Hagler", "Eleven Mile & Spinney", "Boyd Lake"]
+
+
+def test_http_fetch_mode():
+
+    requested_urls = []
+
+    def fake_http_get(url):
+        requested_urls.append(url)
+        return read_master_angler_page()
+
+    scraper = master_angler.MasterAnglerScraper(fetch_mode="http", http_get=fake_http_get)
+
+    raw_data = scraper.execute()
+
+    assert requested_urls == [master_angler.MASTER_ANGLER_URL]
+    assert len(raw_data) == 2
+
+
+def test_http_iter_pages():
+
+    scraper = master_angler.MasterAnglerScraper(fetch_mode="http", http_get=lambda url: read_master_angler_page())
+
+    pages = scraper.iter_pages()
+
+    assert next(pages).startswith("Trey")
+    assert next(pages).startswith("Sam")
+
+    with pytest.raises(StopIteration):
+        next(pages)
+
+
+def test_invalid_fetch_mode():
+
+    with pytest.raises(ValueError):
+        master_angler.MasterAnglerScraper(fetch_mode="ftp")
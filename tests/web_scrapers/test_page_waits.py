@@ -0,0 +1,176 @@
+import asyncio
+
+import pytest
+from playwright.async_api import Error as PlaywrightError, async_playwright
+from src.web_scrapers import colorado_fishing_atlas, page_waits
+
+
+def test_adaptive_timeout_initial():
+
+    timeout = page_waits.AdaptiveTimeout(initial_ms=10_000)
+
+    assert timeout.timeout_ms == 10_000
+
+
+def test_adaptive_timeout_follows_waits():
+
+    timeout = page_waits.AdaptiveTimeout(
+        minimum_ms=1_000, maximum_ms=30_000, multiplier=3.0
+    )
+
+    for elapsed_ms in [500, 600, 700, 800]:
+        timeout.observe(elapsed_ms)
+
+    assert timeout.timeout_ms == 2_400
+
+
+def test_adaptive_timeout_bounds():
+
+    timeout = page_waits.AdaptiveTimeout(minimum_ms=2_000, maximum_ms=30_000)
+
+    timeout.observe(10)
+
+    assert timeout.timeout_ms == 2_000
+
+    timeout.observe(60_000)
+
+    assert timeout.timeout_ms == 30_000
+
+
+def test_adaptive_timeout_window():
+
+    timeout = page_waits.AdaptiveTimeout(
+        minimum_ms=0, maximum_ms=100_000, multiplier=1.0, window=2
+    )
+
+    for elapsed_ms in [50_000, 100, 200]:
+        timeout.observe(elapsed_ms)
+
+    assert timeout.recent_waits == [100, 200]
+    assert timeout.timeout_ms == 200
+
+
+def test_feature_wait_timings_histogram():
+
+    timings = page_waits.FeatureWaitTimings("Trout: Brook")
+
+    timings.waits = [0.1, 0.25, 0.3, 1.5, 2.5, 12]
+
+    assert timings.histogram() == {
+        "<=0.25s": 2,
+        "<=0.5s": 1,
+        "<=1s": 0,
+        "<=2s": 1,
+        "<=3s": 1,
+        "<=5s": 0,
+        "<=10s": 0,
+        ">10s": 1,
+    }
+
+
+class LazyGridPage:
+    """A page with a dgrid of 200 rows that, like the atlas results, only renders the rows around where it is
+    scrolled to
+    """
+
+    def __init__(self, rows=200, rows_per_screen=10):
+        self.rows = rows
+        self.rows_per_screen = rows_per_screen
+        self.top = 0
+
+    def rendered_rows(self):
+        return list(range(max(0, self.top - 5), min(self.rows, self.top + self.rows_per_screen + 5)))
+
+    async def evaluate(self, script, argument):
+        if script == page_waits.SCROLL_GRID_JS:
+            grid_id, direction, timeout_ms = argument
+
+            self.top = min(max(0, self.top + direction * self.rows_per_screen), self.rows - self.rows_per_screen)
+
+        return self.rendered_rows()
+
+
+def test_scroll_to_grid_row():
+
+    page = LazyGridPage()
+
+    # A freshly searched page only has the first rows
+    assert 120 not in page.rendered_rows()
+
+    asyncio.run(page_waits.scroll_to_grid_row(page, "dgrid_1", 120, timeout_ms=1_000))
+
+    assert 120 in page.rendered_rows()
+
+    # The first rows were removed on the way down, the grid is scrolled back up for them
+    assert 3 not in page.rendered_rows()
+
+    asyncio.run(page_waits.scroll_to_grid_row(page, "dgrid_1", 3, timeout_ms=1_000))
+
+    assert 3 in page.rendered_rows()
+
+    with pytest.raises(PlaywrightError):
+        asyncio.run(page_waits.scroll_to_grid_row(page, "dgrid_1", 500, timeout_ms=50))
+
+
+# Search results that render 20 rows around the scrolled position a moment after each scroll, like dgrid does
+LAZY_GRID_HTML = """
+<div id="dgrid_1">
+    <div class="dgrid-scroller" style="height: 200px; overflow-y: auto">
+        <div class="dgrid-content" style="position: relative; height: 4000px"></div>
+    </div>
+</div>
+<script>
+    const scroller = document.querySelector(".dgrid-scroller");
+    const content = document.querySelector(".dgrid-content");
+
+    const render = () => {
+        const first = Math.max(0, Math.floor(scroller.scrollTop / 20) - 5);
+
+        content.replaceChildren();
+
+        for (let i = first; i < Math.min(200, first + 20); i++) {
+            const row = document.createElement("div");
+            row.id = `dgrid_1-row-${i}`;
+            row.style.cssText = `position: absolute; top: ${i * 20}px; height: 20px`;
+
+            const table = row.appendChild(document.createElement("table"));
+            table.appendChild(document.createElement("tr")).appendChild(document.createElement("td")).textContent = `Water ${i}`;
+
+            content.appendChild(row);
+        }
+    };
+
+    scroller.addEventListener("scroll", () => setTimeout(render, 20));
+
+    render();
+</script>
+"""
+
+
+def test_scroll_to_grid_row_in_browser():
+
+    async def read_row(i):
+        async with async_playwright() as playwright:
+            try:
+                browser = await playwright.chromium.launch()
+            except PlaywrightError as e:
+                pytest.skip(f"No browser installed for playwright: {e}")
+
+            page = await browser.new_page()
+
+            await page.set_content(LAZY_GRID_HTML)
+
+            row_xpath = f'//*[@id="{colorado_fishing_atlas.RESULTS_GRID_ID}-row-{i}"]/table/tr/td[1]'
+
+            assert await page.query_selector(row_xpath) is None
+
+            await page_waits.scroll_to_grid_row(page, colorado_fishing_atlas.RESULTS_GRID_ID, i, timeout_ms=5_000)
+
+            text = await (await page.wait_for_selector(row_xpath, timeout=1_000)).inner_text()
+
+            await browser.close()
+
+            return text
+
+    # The first row of the second chunk of features
+    assert asyncio.run(read_row(colorado_fishing_atlas.DEFAULT_FEATURES_PER_PAGE)) == "Water 50"
@@ -0,0 +1,113 @@
+import asyncio
+from src.web_scrapers import scrape_journal, colorado_fishing_atlas
+
+
+def test_journal_reload(tmp_path):
+
+    journal_path = str(tmp_path / "journal.jsonl")
+
+    journal = scrape_journal.ScrapeJournal(journal_path)
+
+    journal.record_feature("Trout: Brook", 1, "Lake BXXXX")
+    journal.record_feature("Trout: Brook", 0, "Lake AXXXX")
+    journal.record_feature("Trout: Brown", 0, "Lake CXXXX")
+    journal.record_species_complete("Trout: Brown", 1)
+
+    reloaded_journal = scrape_journal.ScrapeJournal(journal_path)
+
+    assert reloaded_journal.completed_features("Trout: Brook") == {
+        0: "Lake AXXXX",
+        1: "Lake BXXXX",
+    }
+    assert reloaded_journal.species_records("Trout: Brook") == ["Lake AXXXX", "Lake BXXXX"]
+    assert reloaded_journal.is_species_complete("Trout: Brown")
+    assert not reloaded_journal.is_species_complete("Trout: Brook")
+
+
+def test_journal_partial_last_line(tmp_path):
+
+    journal_path = tmp_path / "journal.jsonl"
+
+    journal_path.write_text(
+        '{"species": "Trout: Brook", "index": 0, "record": "Lake AXXXX"}\n{"species": "Trout: Bro'
+    )
+
+    journal = scrape_journal.ScrapeJournal(str(journal_path))
+
+    assert journal.completed_features("Trout: Brook") == {0: "Lake AXXXX"}
+
+
+def test_journal_appends_after_partial_last_line(tmp_path):
+
+    journal_path = tmp_path / "journal.jsonl"
+
+    journal_path.write_text(
+        '{"species": "Trout: Brook", "index": 0, "record": "Lake AXXXX"}\n{"species": "Trout: Bro'
+    )
+
+    journal = scrape_journal.ScrapeJournal(str(journal_path))
+
+    journal.record_feature("Trout: Brook", 1, "Lake BXXXX")
+    journal.record_feature("Trout: Brook", 2, "Lake CXXXX")
+
+    reloaded_journal = scrape_journal.ScrapeJournal(str(journal_path))
+
+    assert reloaded_journal.completed_features("Trout: Brook") == {
+        0: "Lake AXXXX",
+        1: "Lake BXXXX",
+        2: "Lake CXXXX",
+    }
+
+
+def test_journal_appends_after_missing_line_end(tmp_path):
+
+    journal_path = tmp_path / "journal.jsonl"
+
+    journal_path.write_text('{"species": "Trout: Brook", "index": 0, "record": "Lake AXXXX"}')
+
+    journal = scrape_journal.ScrapeJournal(str(journal_path))
+
+    journal.record_feature("Trout: Brook", 1, "Lake BXXXX")
+
+    reloaded_journal = scrape_journal.ScrapeJournal(str(journal_path))
+
+    assert reloaded_journal.completed_features("Trout: Brook") == {0: "Lake AXXXX", 1: "Lake BXXXX"}
+
+
+def test_journal_clear(tmp_path):
+
+    journal_path = tmp_path / "journal.jsonl"
+
+    journal = scrape_journal.ScrapeJournal(str(journal_path))
+
+    journal.record_feature("Trout: Brook", 0, "Lake AXXXX")
+    journal.clear()
+
+    assert not journal_path.exists()
+    assert journal.completed_features("Trout: Brook") == {}
+
+
+def test_scrape_features_resumes_from_journal(tmp_path):
+
+    journal = scrape_journal.ScrapeJournal(str(tmp_path / "journal.jsonl"))
+
+    journal.record_feature("Trout: Brook", 0, "Lake AXXXX")
+    journal.record_feature("Trout: Brook", 1, "Lake BXXXX")
+
+    scraper = colorado_fishing_atlas.fishing_atlas_scraper("Trout: Brook", journal=journal)
+
+    scraped_features = []
+
+    async def fake_scrape_feature(page, i):
+        scraped_features.append(i)
+        return "Loading..." if i == 3 else f"Lake {i}XXXX"
+
+    scraper.scrape_feature = fake_scrape_feature
+
+    records = asyncio.run(scraper.scrape_features(None, range(0, 4)))
+
+    assert scraped_features == [2, 3]
+    assert records == ["Lake AXXXX", "Lake BXXXX", "Lake 2XXXX", "Loading..."]
+
+    # The feature that never loaded is left for the next run
+    assert sorted(journal.completed_features("Trout: Brook")) == [0, 1, 2]